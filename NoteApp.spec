@@ -1,4 +1,8 @@
 # -*- mode: python ; coding: utf-8 -*-
+# Start-up: a one-folder build (EXE + COLLECT) starts without unpacking the
+# whole application to a temporary directory on every launch, and binaries
+# are not UPX-compressed, so Qt's DLLs load without being decompressed.
+# Measure with: python -m benchmarks.startup --skip-cli --gui-command dist/NoteApp/NoteApp
 
 
 a = Analysis(
@@ -10,25 +14,23 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Only the command-line interface (main.py) uses these
+    excludes=['rich', 'typer', 'click', 'tkinter'],
     noarchive=False,
-    optimize=0,
+    optimize=1,
 )
 pyz = PYZ(a.pure)
 
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='NoteApp',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +38,13 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='NoteApp',
+)
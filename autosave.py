@@ -0,0 +1,145 @@
+"""Autosave for the note editor: debounced, coalesced group commits.
+
+The window stages an edit (NoteEdit) whenever the editor has unsaved
+changes and is about to show something else, or when the autosave timer
+fires. Staged edits are keyed by note, so repeated edits of one note
+collapse into one, and all staged notes are written by
+NoteManager.save_notes in a single transaction on a worker thread. The
+timer fires once typing pauses for IDLE_MS, and at the latest MAX_DELAY_MS
+after the first unsaved change. Only one flush is in flight at a time;
+edits staged meanwhile go out with the next one. flush_blocking() writes
+everything before returning and is meant for shutdown and explicit moves.
+"""
+from typing import Callable, Dict, Optional
+
+from PyQt5.QtCore import QObject, QThreadPool, QTimer, pyqtSignal
+
+from gui_tasks import BackgroundTask
+from note_manager import NoteEdit, NoteManager
+
+IDLE_MS = 1500
+MAX_DELAY_MS = 10000
+
+# Values of Autosaver.state_changed
+DIRTY = 'dirty'
+SAVING = 'saving'
+SAVED = 'saved'
+FAILED = 'failed'
+
+
+class Autosaver(QObject):
+    state_changed = pyqtSignal(str, str) # (state, error message)
+    saved = pyqtSignal(object) # List[NoteEdit] that were just written
+
+    def __init__(self, manager: NoteManager, collect: Callable[[], None], parent=None,
+                 idle_ms: int = IDLE_MS, max_delay_ms: int = MAX_DELAY_MS):
+        """manager is the GUI thread's NoteManager; collect() is called before
+        every flush to stage the editor's unsaved changes."""
+        super().__init__(parent)
+        self.manager = manager
+        self.collect = collect
+        self._staged: Dict[int, NoteEdit] = {}
+        self._in_flight: Dict[int, NoteEdit] = {}
+        self._task: Optional[BackgroundTask] = None
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1) # Flushes are written in order
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(idle_ms)
+        self._idle_timer.timeout.connect(self.flush)
+        self._max_timer = QTimer(self)
+        self._max_timer.setSingleShot(True)
+        self._max_timer.setInterval(max_delay_ms)
+        self._max_timer.timeout.connect(self.flush)
+
+    def touch(self):
+        """Notes that the editor changed; schedules a flush."""
+        self._idle_timer.start()
+        if not self._max_timer.isActive():
+            self._max_timer.start()
+        self.state_changed.emit(DIRTY, '')
+
+    def stage(self, edit: NoteEdit):
+        """Queues an edit for the next flush, replacing an older one of the same note."""
+        self._staged[edit.note_id] = edit
+        if not self._max_timer.isActive():
+            self._max_timer.start()
+
+    def discard(self, note_id: int):
+        """Drops the staged edit of a note, e.g. because it is being deleted."""
+        self._staged.pop(note_id, None)
+
+    def pending_edit(self, note_id: int) -> Optional[NoteEdit]:
+        """The newest edit of a note that is not in the database yet."""
+        return self._staged.get(note_id) or self._in_flight.get(note_id)
+
+    def has_pending(self) -> bool:
+        return bool(self._staged or self._in_flight)
+
+    def flush(self):
+        """Writes all staged edits in the background."""
+        self._idle_timer.stop()
+        self._max_timer.stop()
+        self.collect()
+        if self._task is not None or not self._staged:
+            return # The flush in flight starts the next one when it is done
+        self._in_flight, self._staged = self._staged, {}
+        edits = list(self._in_flight.values())
+        task = BackgroundTask(lambda manager, progress: manager.save_notes(edits))
+        task.signals.finished.connect(lambda result: self._flushed(task))
+        task.signals.failed.connect(lambda message: self._flush_failed(task, message))
+        self._task = task
+        self.state_changed.emit(SAVING, '')
+        self._pool.start(task)
+
+    def flush_blocking(self) -> bool:
+        """Writes everything on the calling thread; returns False on failure."""
+        self._idle_timer.stop()
+        self._max_timer.stop()
+        self.collect()
+        self._pool.waitForDone()
+        # The signals of the flush in flight are not delivered yet (and will
+        # be ignored as superseded); the task itself tells how it ended
+        task, in_flight = self._task, self._in_flight
+        self._in_flight, self._task = {}, None
+        if task is not None and task.succeeded:
+            self.manager.forget_notes(in_flight.keys()) # Written by the worker's session
+            self.saved.emit(list(in_flight.values()))
+            in_flight = {}
+        # Edits of a failed flush are written again; newer staged edits win
+        pending = {**in_flight, **self._staged}
+        self._staged = {}
+        if not pending:
+            if task is not None:
+                self.state_changed.emit(SAVED, '')
+            return True
+        try:
+            self.manager.save_notes(pending.values())
+        except Exception as e:
+            self._staged = pending
+            self.state_changed.emit(FAILED, str(e))
+            return False
+        self.saved.emit(list(pending.values()))
+        self.state_changed.emit(SAVED, '')
+        return True
+
+    def _flushed(self, task: BackgroundTask):
+        if task is not self._task:
+            return # Superseded by flush_blocking
+        edits = list(self._in_flight.values())
+        self._in_flight, self._task = {}, None
+        self.manager.forget_notes(edit.note_id for edit in edits) # Written by the worker's session
+        self.saved.emit(edits)
+        if self._staged:
+            self.flush()
+        else:
+            self.state_changed.emit(SAVED, '')
+
+    def _flush_failed(self, task: BackgroundTask, message: str):
+        if task is not self._task:
+            return
+        for note_id, edit in self._in_flight.items():
+            self._staged.setdefault(note_id, edit)
+        self._in_flight, self._task = {}, None
+        self.state_changed.emit(FAILED, message)
+        self._max_timer.start() # Try again later
@@ -0,0 +1,7 @@
+"""Reproducible performance benchmarks for NoteManager.
+
+    python -m benchmarks.run --size 10k --out baseline.json
+    python -m benchmarks.run --size 10k --baseline baseline.json
+
+See corpus.py for the synthetic data and run.py for the measured operations.
+"""
@@ -0,0 +1,60 @@
+"""Compares two benchmark result files.
+
+    python -m benchmarks.compare baseline.json current.json [--threshold 0.2]
+"""
+import argparse
+import json
+import sys
+from typing import List
+
+# Differences below this are timer noise, whatever the ratio says.
+MIN_SIGNIFICANT_MS = 1.0
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.20) -> List[dict]:
+    """Pairs up benchmarks by name and flags p95 slowdowns beyond threshold."""
+    rows = []
+    for name, new in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        ratio = new['p95_ms'] / old['p95_ms'] if old['p95_ms'] else float('inf')
+        regressed = (ratio > 1 + threshold
+                     and new['p95_ms'] - old['p95_ms'] > MIN_SIGNIFICANT_MS)
+        rows.append({
+            'name': name,
+            'baseline_p95_ms': old['p95_ms'],
+            'current_p95_ms': new['p95_ms'],
+            'ratio': ratio,
+            'baseline_peak_kib': old['peak_kib'],
+            'current_peak_kib': new['peak_kib'],
+            'regressed': regressed,
+        })
+    return rows
+
+
+def print_comparison(rows: List[dict]):
+    print(f"{'benchmark':40s} {'base p95':>10s} {'now p95':>10s} {'ratio':>7s}")
+    for row in rows:
+        flag = "  REGRESSION" if row['regressed'] else ""
+        print(f"{row['name']:40s} {row['baseline_p95_ms']:10.3f} {row['current_p95_ms']:10.3f} "
+              f"{row['ratio']:7.2f}{flag}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.20)
+    args = parser.parse_args(argv)
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+    print_comparison(rows)
+    return 1 if any(row['regressed'] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
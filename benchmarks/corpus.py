@@ -0,0 +1,93 @@
+"""Seeded synthetic corpus generator.
+
+generate_records yields import records (see NoteManager.bulk_import) for a
+corpus of any size spread over many categories. Text mixes Chinese and
+Latin words, and body lengths follow a log-normal distribution (many short
+notes, a long tail of pasted documents), so the corpus resembles a real
+notebook. The same seed always produces the same corpus.
+"""
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Iterator
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+CJK_WORDS = [
+    "项目", "计划", "会议", "记录", "总结", "学习", "笔记", "数据库", "性能", "优化",
+    "需求", "设计", "测试", "发布", "问题", "方案", "进度", "周报", "读书", "心得",
+    "旅行", "预算", "健康", "运动", "菜谱", "购物", "清单", "想法", "灵感", "日记",
+    "算法", "接口", "部署", "服务器", "客户端", "索引", "查询", "缓存", "线程", "事务",
+    "文档", "翻译", "课程", "考试", "复习", "资料", "合同", "报销", "电影", "音乐",
+]
+LATIN_WORDS = [
+    "project", "plan", "meeting", "notes", "summary", "python", "sqlite", "index",
+    "query", "cache", "thread", "release", "design", "review", "todo", "draft",
+    "search", "benchmark", "latency", "memory", "server", "client", "deploy", "bug",
+    "fix", "feature", "docs", "api", "schema", "migration", "backup", "export",
+]
+
+# Log-normal body length in characters: median ~ e^6 = 400, long tail.
+BODY_LENGTH_MU = 6.0
+BODY_LENGTH_SIGMA = 1.2
+MAX_BODY_LENGTH = 200_000
+CJK_RATIO = 0.7
+
+
+def parse_size(size: str) -> int:
+    """Accepts '10k', '100k', '1m' or a plain number."""
+    size = size.lower()
+    if size in SIZES:
+        return SIZES[size]
+    return int(size)
+
+
+def _word(rng: random.Random) -> str:
+    if rng.random() < CJK_RATIO:
+        return rng.choice(CJK_WORDS)
+    return rng.choice(LATIN_WORDS)
+
+
+def make_title(rng: random.Random) -> str:
+    return "".join(_word(rng) for _ in range(rng.randint(2, 4)))
+
+
+def make_body(rng: random.Random) -> str:
+    target = min(int(rng.lognormvariate(BODY_LENGTH_MU, BODY_LENGTH_SIGMA)), MAX_BODY_LENGTH)
+    parts = []
+    length = 0
+    while length < target:
+        sentence = "".join(_word(rng) for _ in range(rng.randint(4, 12)))
+        sentence += "。" if rng.random() < CJK_RATIO else ". "
+        if rng.random() < 0.1:
+            sentence += "\n\n"
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)
+
+
+def category_names(count: int):
+    return [f"{CJK_WORDS[i % len(CJK_WORDS)]}-{i:03d}" for i in range(count)]
+
+
+def generate_records(count: int, categories: int = 300, seed: int = 42) -> Iterator[dict]:
+    """Yields count note records spread over `categories` categories.
+
+    Category sizes are skewed (a few large categories, many small ones) and
+    timestamps are spread over the last three years."""
+    rng = random.Random(seed)
+    names = category_names(categories)
+    # Zipf-like weights, accumulated once so each draw is a bisect
+    cum_weights = list(accumulate(1.0 / (rank + 1) for rank in range(categories)))
+    start = datetime(2023, 1, 1)
+    span_seconds = 3 * 365 * 24 * 3600
+    for _ in range(count):
+        created_at = start + timedelta(seconds=rng.randrange(span_seconds))
+        updated_at = created_at + timedelta(seconds=rng.randrange(30 * 24 * 3600))
+        yield {
+            'title': make_title(rng),
+            'content': make_body(rng),
+            'category': rng.choices(names, cum_weights=cum_weights)[0],
+            'created_at': created_at,
+            'updated_at': updated_at,
+        }
@@ -0,0 +1,81 @@
+"""Timing and memory helpers shared by the benchmark scripts."""
+import gc
+import os
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+
+
+def use_database(path: str):
+    """Points the application at a benchmark database.
+
+    Must be called before the database is first opened, i.e. before the
+    first NoteManager() (see bootstrap.init_database): the storage
+    configuration, path included, is read then and kept for the process."""
+    os.environ['NOTEAPP_DB'] = os.path.abspath(path)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def measure(func: Callable, iterations: int, setup: Optional[Callable] = None) -> dict:
+    """Times func over iterations runs and measures its peak allocations.
+
+    setup(i), if given, runs untimed before each call and its return value
+    is passed to func. Latencies are measured without tracemalloc (which
+    slows allocation-heavy code down); peak memory comes from one extra
+    traced run."""
+    latencies = []
+    for i in range(iterations):
+        args = setup(i) if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        func(args) if setup else func()
+        latencies.append(time.perf_counter() - start)
+
+    args = setup(iterations) if setup else None
+    gc.collect()
+    tracemalloc.start()
+    func(args) if setup else func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def max_rss_kib() -> Optional[int]:
+    """Peak resident set size of this process, where the OS reports it."""
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if os.uname().sysname == 'Darwin' else rss
+
+
+def current_rss_kib() -> Optional[int]:
+    """Resident memory of this process now, not counting mapped files (Linux only).
+
+    That is the heap: pages of the database that SQLite reads through
+    mmap stay out of it, so it does not grow with the share of the file read."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
@@ -0,0 +1,122 @@
+"""Benchmarks revision history: storage growth and reconstruction time.
+
+    python -m benchmarks.history --edits 500 --out history.json
+
+For each snapshot interval, a set of notes with corpus-like bodies is
+edited --edits times each (small line edits, as when typing), every edit
+becoming a revision. Reported per interval: bytes stored in note_revisions
+against what full copies of every version would take, and the latency of
+get_revision for random revisions and for the worst case (the revision
+just before a snapshot, which replays the longest delta chain).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+from benchmarks import corpus
+from benchmarks.harness import measure, use_database
+
+INTERVALS = [5, 20, 50]
+
+
+def _edit(rng: random.Random, text: str) -> str:
+    lines = text.splitlines(keepends=True) or [""]
+    i = rng.randrange(len(lines))
+    op = rng.random()
+    if op < 0.6:
+        lines[i] = lines[i].rstrip("\n") + corpus.make_title(rng) + "\n"
+    elif op < 0.85:
+        lines.insert(i, corpus.make_title(rng) + "。\n")
+    elif len(lines) > 1:
+        del lines[i]
+    return "".join(lines)
+
+
+def run_interval(manager, interval: int, notes: int, edits: int, iterations: int, seed: int) -> dict:
+    from sqlalchemy import text
+
+    import history
+    from models import NoteRevision
+
+    manager.history_settings = history.HistorySettings(
+        snapshot_interval=interval, max_revisions=edits + 1, merge_seconds=0)
+    rng = random.Random(seed)
+    category_id = manager.get_all_categories()[0].id
+    full_copy_bytes = 0
+    note_ids = []
+    for n in range(notes):
+        body = corpus.make_body(rng)
+        note = manager.add_note(f"history benchmark {interval}-{n}", body, category_id)
+        note_ids.append(note.id)
+        full_copy_bytes += len(body.encode('utf-8'))
+        for _ in range(edits):
+            body = _edit(rng, body)
+            manager.update_note(note.id, note.title, body)
+            full_copy_bytes += len(body.encode('utf-8'))
+
+    with manager.unit_of_work() as session:
+        stored_bytes = session.execute(text(
+            "SELECT sum(length(CAST(data AS BLOB))) FROM note_revisions WHERE note_id IN (%s)"
+            % ",".join(str(i) for i in note_ids))).scalar()
+    revisions = edits + 1
+
+    random_read = measure(
+        lambda i: manager.get_revision(note_ids[i % notes], 1 + (i * 7919) % revisions),
+        iterations, setup=lambda i: i)
+    # The revision before a snapshot replays interval - 1 deltas
+    worst = max(interval, 2) if interval <= revisions else revisions
+    worst_read = measure(lambda i: manager.get_revision(note_ids[i % notes], worst),
+                         iterations, setup=lambda i: i)
+    with manager.unit_of_work() as session:
+        session.query(NoteRevision).filter(NoteRevision.note_id.in_(note_ids)).delete(
+            synchronize_session=False)
+        session.commit()
+    return {
+        'snapshot_interval': interval,
+        'revisions': notes * revisions,
+        'stored_kib': round(stored_bytes / 1024, 1),
+        'full_copies_kib': round(full_copy_bytes / 1024, 1),
+        'ratio': round(stored_bytes / full_copy_bytes, 3) if full_copy_bytes else None,
+        'get_revision[random]': random_read,
+        'get_revision[longest chain]': worst_read,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=10)
+    parser.add_argument('--edits', type=int, default=200, help="revisions per note")
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db-dir', default='benchmark-data')
+    parser.add_argument('--out', help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    db_path = os.path.join(args.db_dir, "history.db")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    use_database(db_path)
+    from note_manager import NoteManager
+
+    manager = NoteManager()
+    results = [run_interval(manager, interval, args.notes, args.edits, args.iterations, args.seed)
+               for interval in INTERVALS]
+
+    print(f"{'interval':>8} {'stored KiB':>11} {'copies KiB':>11} {'ratio':>6} "
+          f"{'random p95 ms':>14} {'longest p95 ms':>15}")
+    for r in results:
+        print(f"{r['snapshot_interval']:8d} {r['stored_kib']:11.1f} {r['full_copies_kib']:11.1f} "
+              f"{r['ratio']:6.3f} {r['get_revision[random]']['p95_ms']:14.3f} "
+              f"{r['get_revision[longest chain]']['p95_ms']:15.3f}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'meta': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
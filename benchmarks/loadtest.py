@@ -0,0 +1,203 @@
+"""Load test for the HTTP/JSON server (python main.py serve).
+
+    python -m benchmarks.loadtest --clients 1,8,32 --duration 10
+    python -m benchmarks.loadtest --start --size 10k --clients 16
+
+Each client holds one keep-alive connection and sends a mix of requests
+(note pages, single notes, searches, updates) with up to --pipeline
+requests in flight on it. For every client count the script reports
+requests per second and p50/p95/p99/max latency. With --start it builds
+(or reuses) the benchmark corpus and runs the server on a copy of it in a
+subprocess; otherwise it targets an already running server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from benchmarks import corpus
+from benchmarks.harness import percentile
+from benchmarks.run import SEARCH_KEYWORDS, prepare_work_copy
+
+# (weight, kind) of the request mix
+REQUEST_MIX = [(40, 'page'), (30, 'note'), (20, 'search'), (10, 'update')]
+
+
+class Client:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def send(self, method: str, path: str, body=None):
+        data = b"" if body is None else json.dumps(body).encode('utf-8')
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n")
+        self.writer.write(head.encode('latin-1') + data)
+
+    async def receive(self):
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode('latin-1').split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        length = 0
+        for line in lines[1:]:
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        body = await self.reader.readexactly(length) if length else b""
+        return status, (json.loads(body) if body else None)
+
+    async def request(self, method: str, path: str, body=None):
+        self.send(method, path, body)
+        await self.writer.drain()
+        return await self.receive()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def _next_request(rng: random.Random, note_ids, category_ids):
+    kind = rng.choices([k for _, k in REQUEST_MIX], weights=[w for w, _ in REQUEST_MIX])[0]
+    if kind == 'page':
+        return 'GET', f"/notes?category_id={rng.choice(category_ids)}&limit=50", None
+    if kind == 'note':
+        return 'GET', f"/notes/{rng.choice(note_ids)}", None
+    if kind == 'search':
+        return 'GET', f"/search?q={quote(rng.choice(SEARCH_KEYWORDS))}&limit=20", None
+    note_id = rng.choice(note_ids)
+    return 'PUT', f"/notes/{note_id}", {'title': f"loadtest {note_id}",
+                                        'content': f"edited at {time.time()}"}
+
+
+async def _run_client(host, port, duration, pipeline, seed, note_ids, category_ids, latencies, errors):
+    rng = random.Random(seed)
+    client = Client(host, port)
+    await client.connect()
+    deadline = time.perf_counter() + duration
+    sent = []
+    try:
+        while time.perf_counter() < deadline:
+            while len(sent) < pipeline:
+                method, path, body = _next_request(rng, note_ids, category_ids)
+                client.send(method, path, body)
+                sent.append(time.perf_counter())
+            await client.writer.drain()
+            status, _ = await client.receive()
+            latencies.append(time.perf_counter() - sent.pop(0))
+            if status >= 500:
+                errors.append(status)
+        while sent: # Collect what is still in flight
+            await client.receive()
+            sent.pop(0)
+    finally:
+        await client.close()
+
+
+async def run_load(host, port, clients, duration, pipeline, seed) -> dict:
+    probe = Client(host, port)
+    await probe.connect()
+    _, categories = await probe.request('GET', "/categories")
+    category_ids = [c['id'] for c in categories]
+    note_ids = []
+    for category_id in category_ids[:20]:
+        _, page = await probe.request('GET', f"/notes?category_id={category_id}&limit=100")
+        note_ids.extend(item['id'] for item in page['items'])
+    await probe.close()
+    if not note_ids:
+        raise SystemExit("The server has no notes; use --start or import a corpus first")
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(_run_client(host, port, duration, pipeline, seed + i, note_ids,
+                                       category_ids, latencies, errors)
+                           for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'clients': clients,
+        'pipeline': pipeline,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+async def _probe(host: str, port: int):
+    client = Client(host, port)
+    await client.connect()
+    await client.request('GET', "/health")
+    await client.close()
+
+
+def _start_server(args):
+    """Runs main.py serve on a copy of the benchmark corpus."""
+    work = prepare_work_copy(args.db_dir, "loadtest.db", corpus.parse_size(args.size),
+                             args.categories, args.seed)
+    main_py = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+    env = dict(os.environ, NOTEAPP_DB=work)
+    process = subprocess.Popen([sys.executable, main_py, "serve", "--host", args.host,
+                                "--port", str(args.port), "--workers", str(args.workers)], env=env)
+    for _ in range(100): # Wait until it accepts connections
+        try:
+            asyncio.run(_probe(args.host, args.port))
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("server did not start")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', default='1,8,32', help="comma-separated client counts")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per client count")
+    parser.add_argument('--pipeline', type=int, default=1, help="requests in flight per connection")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--start', action='store_true', help="start a server on the benchmark corpus")
+    parser.add_argument('--size', default='10k', help="corpus size with --start")
+    parser.add_argument('--categories', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=4, help="server database workers with --start")
+    parser.add_argument('--db-dir', default='benchmark-data')
+    parser.add_argument('--out', help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    process = _start_server(args) if args.start else None
+    try:
+        results = [asyncio.run(run_load(args.host, args.port, int(n), args.duration,
+                                        args.pipeline, args.seed))
+                   for n in args.clients.split(",")]
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    print(f"{'clients':>7} {'requests':>9} {'errors':>6} {'req/s':>9} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for r in results:
+        print(f"{r['clients']:7d} {r['requests']:9d} {r['errors']:6d} {r['rps']:9.1f} "
+              f"{r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} {r['max_ms']:9.3f}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'meta': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
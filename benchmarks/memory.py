@@ -0,0 +1,125 @@
+"""Checks that memory stays flat while browsing every category.
+
+    python -m benchmarks.memory --size 100k
+    python -m benchmarks.memory --size 10k --passes 3 --out memory.json
+
+Browsing is what the GUI does as a user clicks down the category list:
+each category's note list is paged through to the end, every
+--open-every'th note is opened (its body read), and every --edit-every'th
+opened note is saved with an edit. Each pass opens other notes than the
+one before. Resident memory (the heap, see harness.current_rss_kib) is
+sampled every --sample-every categories.
+
+SQLite's page cache is bounded by design but large (cache_size, 64 MiB by
+default): with edits it keeps filling for longer than a pass at 100k notes
+and would hide what this is looking for. The benchmark therefore sets it to
+--sqlite-cache-mib on its own connections. The first pass then fills what
+is bounded (that cache and NoteManager's read cache) and nothing else may
+grow: the exit status is 1 if a later pass ends more than --tolerance-mib
+above the end of the first.
+"""
+import argparse
+import gc
+import json
+import sys
+
+from benchmarks import corpus
+from benchmarks.harness import current_rss_kib, max_rss_kib, use_database
+from benchmarks.run import prepare_work_copy
+
+
+def rss_kib() -> int:
+    """Current heap RSS where the OS reports it, else the peak RSS (which also stays put when flat)."""
+    gc.collect()
+    current = current_rss_kib()
+    return current if current is not None else max_rss_kib() or 0
+
+
+def limit_page_cache(engine, cache_mib: float):
+    """Applies PRAGMA cache_size to every connection engine opens from now on."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'connect')
+    def _set_cache_size(dbapi_conn, connection_record):
+        dbapi_conn.execute(f"PRAGMA cache_size={-int(cache_mib * 1024)}")
+
+    # Connections opened at import time were set up with the configured size
+    engine.dispose()
+
+
+def browse(manager, categories, pass_number: int, open_every: int, edit_every: int,
+           sample_every: int, samples: list) -> dict:
+    from note_manager import NoteEdit
+
+    listed = opened = edited = 0
+    for n, category_id in enumerate(categories, 1):
+        cursor = None
+        while True:
+            page = manager.get_note_summaries_page(category_id, cursor)
+            for summary in page.items:
+                listed += 1
+                if (listed + pass_number) % open_every:
+                    continue
+                note = manager.find_note_by_id(summary.id)
+                opened += 1
+                if edit_every and opened % edit_every == 0:
+                    manager.save_notes([NoteEdit(note.id, note.title, note.content + "\n")])
+                    edited += 1
+            if not page.has_more:
+                break
+            cursor = page.next_cursor
+        if n % sample_every == 0 or n == len(categories):
+            samples.append({'pass': pass_number, 'categories': n, 'rss_kib': rss_kib()})
+    return {'pass': pass_number, 'listed': listed, 'opened': opened, 'edited': edited,
+            'rss_kib': samples[-1]['rss_kib']}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', default='100k', help="corpus size: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument('--categories', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--passes', type=int, default=2)
+    parser.add_argument('--open-every', type=int, default=5, help="open every n-th listed note")
+    parser.add_argument('--edit-every', type=int, default=50, help="save every n-th opened note (0: never)")
+    parser.add_argument('--sample-every', type=int, default=25, help="sample RSS every n categories")
+    parser.add_argument('--tolerance-mib', type=float, default=8.0,
+                        help="allowed growth after the first pass")
+    parser.add_argument('--sqlite-cache-mib', type=float, default=2.0,
+                        help="SQLite page cache per connection (0: keep the configured cache_size)")
+    parser.add_argument('--db-dir', default='benchmark-data')
+    parser.add_argument('--out', help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    work = prepare_work_copy(args.db_dir, "memory.db", corpus.parse_size(args.size),
+                             args.categories, args.seed)
+    use_database(work)
+    from bootstrap import init_database
+    from note_manager import NoteManager
+
+    if args.sqlite_cache_mib:
+        limit_page_cache(init_database().engine, args.sqlite_cache_mib)
+    manager = NoteManager()
+    categories = [c.id for c in manager.get_all_categories()]
+    start_kib = rss_kib()
+    samples = [{'pass': 0, 'categories': 0, 'rss_kib': start_kib}]
+    passes = [browse(manager, categories, p, args.open_every, args.edit_every, args.sample_every, samples)
+              for p in range(1, args.passes + 1)]
+
+    first_kib = passes[0]['rss_kib']
+    growth_kib = max(p['rss_kib'] for p in passes) - first_kib
+    print(f"{'pass':>4} {'listed':>9} {'opened':>8} {'edited':>7} {'RSS MiB':>9}")
+    print(f"{'start':>4} {'':>9} {'':>8} {'':>7} {start_kib / 1024:9.1f}")
+    for p in passes:
+        print(f"{p['pass']:4d} {p['listed']:9d} {p['opened']:8d} {p['edited']:7d} {p['rss_kib'] / 1024:9.1f}")
+    print(f"growth after the first pass: {growth_kib / 1024:.1f} MiB "
+          f"(tolerance {args.tolerance_mib} MiB); read cache: {manager.cache_stats()['size']} entries")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'meta': vars(args), 'passes': passes, 'samples': samples,
+                       'growth_kib': growth_kib}, f, ensure_ascii=False, indent=2)
+    return 1 if growth_kib > args.tolerance_mib * 1024 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""Runs the NoteManager benchmark suite against a synthetic corpus.
+
+    python -m benchmarks.run --size 10k --out results.json
+    python -m benchmarks.run --size 10k --baseline results.json
+
+The corpus database is built once per (size, categories, seed) and kept
+as a pristine copy; every run works on a fresh copy of it, because the
+benchmarks add, edit and delete notes. Results (p50/p95/p99 latency and
+peak allocations per operation) are written as JSON; with --baseline the
+run is compared against an earlier results file and the exit status is 1
+on regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from benchmarks import corpus
+from benchmarks.compare import compare, print_comparison
+from benchmarks.harness import max_rss_kib, measure, use_database
+
+SEARCH_KEYWORDS = ["项目计划", "数据库", "性能优化", "sqlite", "benchmark", "周报"]
+# Quick switcher input: title prefixes, pinyin initials, scattered letters
+TITLE_QUERIES = ["项目", "xmjh", "sqlite", "sjk", "周报py", "jhxm", "s", "sqlqry"]
+
+
+def build_corpus(pristine_path: str, size: int, categories: int, seed: int) -> float:
+    """Fills the working database and snapshots it to pristine_path.
+
+    Returns the seconds the import took."""
+    from exporters import export_sqlite_snapshot
+    from note_manager import NoteManager
+
+    manager = NoteManager()
+    start = time.perf_counter()
+    manager.bulk_import(corpus.generate_records(size, categories, seed), batch_size=5000)
+    elapsed = time.perf_counter() - start
+    with manager.unit_of_work() as session:
+        export_sqlite_snapshot(session.get_bind(), pristine_path)
+    return elapsed
+
+
+def prepare_work_copy(db_dir: str, name: str, size: int, categories: int, seed: int) -> str:
+    """Returns the path of a fresh copy of the corpus, building the corpus if needed.
+
+    For scripts that run the application in a subprocess on that copy."""
+    os.makedirs(db_dir, exist_ok=True)
+    pristine = os.path.join(db_dir, f"corpus-{size}-{categories}-{seed}.db")
+    work = os.path.join(db_dir, name)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    if os.path.exists(pristine):
+        shutil.copyfile(pristine, work)
+    else:
+        print(f"Building corpus of {size} notes in {pristine} ...", file=sys.stderr)
+        use_database(work)
+        build_corpus(pristine, size, categories, seed)
+    return os.path.abspath(work)
+
+
+def run_benchmarks(iterations: int) -> dict:
+    from note_manager import NoteManager
+
+    manager = NoteManager()
+    categories = [c.id for c in manager.get_all_categories()]
+    largest = max(categories, key=lambda cid: len(manager.get_note_summaries_by_category(cid)))
+    manager.clear_cache()
+
+    def fresh(i):
+        manager.clear_cache() # Measure queries, not the read cache
+        return i
+
+    results = {}
+
+    results['add_note'] = measure(
+        lambda i: manager.add_note(f"benchmark note {i}", corpus.make_body(random.Random(i)), largest),
+        iterations, setup=fresh)
+
+    added = [n.id for n in manager.search_all_note_summaries("benchmark note")]
+    results['update_note'] = measure(
+        lambda i: manager.update_note(added[i % len(added)], f"benchmark note {i} (edited)",
+                                      "edited body", largest),
+        iterations, setup=fresh)
+
+    for keyword in SEARCH_KEYWORDS:
+        results[f'search_all_notes[{keyword}]'] = measure(
+            lambda i, keyword=keyword: manager.search_all_notes(keyword), iterations, setup=fresh)
+    results['search_notes[largest category]'] = measure(
+        lambda i: manager.search_notes(SEARCH_KEYWORDS[i % len(SEARCH_KEYWORDS)], largest),
+        iterations, setup=fresh)
+
+    results['get_notes_by_category[largest]'] = measure(
+        lambda i: manager.get_notes_by_category(largest), iterations, setup=fresh)
+    results['get_notes_by_category[rotating]'] = measure(
+        lambda i: manager.get_notes_by_category(categories[i % len(categories)]), iterations, setup=fresh)
+
+    # GUI-free list population: what NoteListModel does on open and on scroll
+    results['list first page[largest]'] = measure(
+        lambda i: manager.get_note_summaries_page(largest), iterations, setup=fresh)
+
+    def page_through(i):
+        cursor = None
+        while True:
+            page = manager.get_note_summaries_page(largest, cursor)
+            if not page.has_more:
+                break
+            cursor = page.next_cursor
+    results['list all pages[largest]'] = measure(page_through, iterations, setup=fresh)
+
+    # Seek pagination: the last page of all notes costs what the first does
+    cursors = [None]
+    while True:
+        page = manager.get_notes_page(cursor=cursors[-1], limit=50)
+        if not page.has_more:
+            break
+        cursors.append(page.next_cursor)
+    results['notes page[first]'] = measure(
+        lambda i: manager.get_notes_page(limit=50), iterations, setup=fresh)
+    results['notes page[last]'] = measure(
+        lambda i: manager.get_notes_page(cursor=cursors[-1], limit=50), iterations, setup=fresh)
+    results['search page[first]'] = measure(
+        lambda i: manager.search_note_summaries_page(SEARCH_KEYWORDS[i % len(SEARCH_KEYWORDS)], limit=50),
+        iterations, setup=fresh)
+    # Category panel: names, counts and recency without reading notes
+    results['get_category_summaries'] = measure(
+        lambda i: manager.get_category_summaries(), iterations, setup=fresh)
+    # Quick switcher: building the title index once, then every keystroke
+    results['get_title_index[build]'] = measure(
+        lambda i: manager.get_title_index(), max(1, iterations // 5), setup=fresh)
+    title_index = manager.get_title_index()
+    for query in TITLE_QUERIES:
+        results[f'title index search[{query}]'] = measure(
+            lambda i, query=query: title_index.search(query), iterations, setup=lambda i: i)
+
+    def make_doomed_category(i):
+        manager.clear_cache()
+        name = f"benchmark doomed {i}"
+        manager.bulk_import(({'title': f"doomed {n}", 'content': "x" * 200, 'category': name}
+                             for n in range(200)))
+        return next(c.id for c in manager.get_all_categories() if c.name == name)
+    results['delete_category[200 notes]'] = measure(
+        lambda category_id: manager.delete_category(category_id),
+        max(1, iterations // 5), setup=make_doomed_category)
+
+    # Cached reads: the GUI clicking back and forth between a few categories.
+    # Every entry is read once untimed first, so that no timed call is a miss
+    clicked = categories[:5]
+    for category_id in clicked:
+        manager.get_note_summaries_by_category(category_id)
+    for note_id in added[:5]:
+        manager.find_note_by_id(note_id)
+    results['get_note_summaries_by_category[cached]'] = measure(
+        lambda i: manager.get_note_summaries_by_category(clicked[i % len(clicked)]), iterations,
+        setup=lambda i: i) # Keeps the warm cache
+    results['find_note_by_id[cached]'] = measure(
+        lambda i: manager.find_note_by_id(added[i % 5]), iterations, setup=lambda i: i)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', default='10k', help="corpus size: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument('--categories', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--db-dir', default='benchmark-data', help="where corpus databases are kept")
+    parser.add_argument('--out', help="write results JSON here")
+    parser.add_argument('--baseline', help="compare against this results JSON")
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help="allowed p95 slowdown against the baseline (0.20 = 20%%)")
+    args = parser.parse_args(argv)
+
+    size = corpus.parse_size(args.size)
+    os.makedirs(args.db_dir, exist_ok=True)
+    db_path = os.path.join(args.db_dir, f"corpus-{size}-{args.categories}-{args.seed}.db")
+    work_path = os.path.join(args.db_dir, "work.db")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(work_path + suffix):
+            os.remove(work_path + suffix)
+    build_seconds = None
+    if os.path.exists(db_path):
+        print(f"Reusing corpus {db_path}", file=sys.stderr)
+        shutil.copyfile(db_path, work_path)
+    use_database(work_path)
+    if not os.path.exists(db_path):
+        print(f"Building corpus of {size} notes in {db_path} ...", file=sys.stderr)
+        build_seconds = build_corpus(db_path, size, args.categories, args.seed)
+        print(f"  built in {build_seconds:.1f}s", file=sys.stderr)
+
+    results = run_benchmarks(args.iterations)
+    report = {
+        'meta': {
+            'size': size,
+            'categories': args.categories,
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'corpus_build_s': round(build_seconds, 2) if build_seconds else None,
+            'db_size_mib': round(os.path.getsize(db_path) / 2**20, 1),
+            'max_rss_kib': max_rss_kib(),
+        },
+        'results': results,
+    }
+
+    for name, r in results.items():
+        print(f"{name:40s} p50 {r['p50_ms']:9.3f} ms  p95 {r['p95_ms']:9.3f} ms  "
+              f"p99 {r['p99_ms']:9.3f} ms  peak {r['peak_kib']:10.1f} KiB")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(baseline, report, args.threshold)
+        print_comparison(rows)
+        if any(row['regressed'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
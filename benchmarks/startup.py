@@ -0,0 +1,143 @@
+"""Measures start-up: time to --help, to the first prompt and to the first window.
+
+    python -m benchmarks.startup --runs 10 --out startup.json
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.startup --skip-cli
+    python -m benchmarks.startup --gui-command dist/NoteApp/NoteApp   # PyInstaller build
+
+Every run starts a new process on a fresh copy of the benchmark corpus with
+NOTEAPP_STARTUP_PROFILE pointing at a report file (see bootstrap.py), and
+stops it once the report appears. Milestones are reported from process
+spawn, so interpreter start-up (or unpacking a frozen build) is included;
+the in-process milestones are shifted by the difference between the wall
+time the report appeared at and its last milestone. The targets shown
+(bootstrap.STARTUP_TARGETS_MS) count from the bootstrap import; the times
+here include interpreter start-up as well.
+"""
+import argparse
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import corpus
+from benchmarks.harness import percentile
+from benchmarks.run import prepare_work_copy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MILESTONE_LINE = re.compile(r"^\s{4}(\S.*?)\s+([0-9.]+)(?:\s+target.*)?$")
+POLL_SECONDS = 0.005
+TIMEOUT_SECONDS = 60
+
+
+def _read_milestones(text: str) -> dict:
+    milestones = {}
+    in_section = False
+    for line in text.splitlines():
+        if line.startswith("  milestones"):
+            in_section = True
+        elif in_section:
+            match = MILESTONE_LINE.match(line)
+            if match:
+                milestones[match.group(1)] = float(match.group(2))
+    return milestones
+
+
+def time_to_report(command, env) -> dict:
+    """Runs command until its start-up report is written; returns milestones in ms since spawn.
+
+    stdin stays open, so the interactive CLI waits at its first prompt."""
+    fd, report_path = tempfile.mkstemp(suffix=".txt", prefix="startup-")
+    os.close(fd)
+    os.remove(report_path)
+    env = dict(env, NOTEAPP_STARTUP_PROFILE=report_path)
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, cwd=ROOT, stdin=subprocess.PIPE,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while not os.path.exists(report_path) or not _read_milestones(_read(report_path)):
+            if time.perf_counter() - start > TIMEOUT_SECONDS or process.poll() is not None:
+                raise RuntimeError(f"no start-up report from {' '.join(command)}")
+            time.sleep(POLL_SECONDS)
+        wall_ms = (time.perf_counter() - start) * 1000
+    finally:
+        process.kill()
+        process.wait()
+    milestones = _read_milestones(_read(report_path))
+    os.remove(report_path)
+    offset = wall_ms - max(milestones.values())
+    return {name: ms + offset for name, ms in milestones.items()}
+
+
+def _read(path: str) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def time_to_exit(command, env) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, env=env, cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def _summary(samples) -> dict:
+    samples = sorted(samples)
+    return {'runs': len(samples),
+            'p50_ms': round(percentile(samples, 50), 1),
+            'p95_ms': round(percentile(samples, 95), 1),
+            'min_ms': round(samples[0], 1)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--size', default='10k', help="corpus size of the database opened")
+    parser.add_argument('--categories', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db-dir', default='benchmark-data')
+    parser.add_argument('--cli-command', default=f"{shlex.quote(sys.executable)} main.py",
+                        help="command line of the CLI (run from the repository root)")
+    parser.add_argument('--gui-command', default=f"{shlex.quote(sys.executable)} gui_main.py",
+                        help="command line of the GUI, e.g. the PyInstaller build")
+    parser.add_argument('--skip-cli', action='store_true')
+    parser.add_argument('--skip-gui', action='store_true')
+    parser.add_argument('--out', help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    size = corpus.parse_size(args.size)
+    samples = {}
+    for _ in range(args.runs):
+        # Each run opens an untouched copy, as a user's database would be
+        work = prepare_work_copy(args.db_dir, "startup.db", size, args.categories, args.seed)
+        env = dict(os.environ, NOTEAPP_DB=work)
+        runs = []
+        if not args.skip_cli:
+            cli = shlex.split(args.cli_command)
+            samples.setdefault('cli --help', []).append(time_to_exit(cli + ["--help"], env))
+            runs.append(time_to_report(cli, env))
+        if not args.skip_gui:
+            runs.append(time_to_report(shlex.split(args.gui_command), env))
+        for milestones in runs:
+            for name, ms in milestones.items():
+                samples.setdefault(name, []).append(ms)
+
+    from bootstrap import STARTUP_TARGETS_MS
+
+    results = {name: _summary(values) for name, values in samples.items()}
+    print(f"{'milestone (from spawn)':24} {'p50 ms':>9} {'p95 ms':>9} {'min ms':>9} {'target':>8}")
+    for name, r in results.items():
+        target = STARTUP_TARGETS_MS.get(name)
+        print(f"{name:24} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['min_ms']:9.1f} "
+              f"{target if target is not None else '':>8}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'meta': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
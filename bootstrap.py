@@ -0,0 +1,207 @@
+"""Application start-up: opens the database on first use and profiles start-up.
+
+Importing models only defines the ORM classes. Nothing touches the database
+until init_database() runs (NoteManager() calls it): it creates the engine
+and binds the session factories. Migrations run only when the schema
+version stored in the database (PRAGMA user_version) differs from the
+latest one; an up-to-date database costs two read queries.
+
+The entry points (main.py, gui_main.py) import SQLAlchemy, Rich and the Qt
+dialogs only where they are used, so `python main.py --help`, the first
+prompt and the first window do not wait for them. With --startup-profile
+(or NOTEAPP_STARTUP_PROFILE=<file>) the time spent importing each
+top-level package and in each start-up phase is reported once the first
+prompt or window is up, on stderr (or appended to the file), and checked
+against STARTUP_TARGETS_MS. benchmarks/startup.py measures the same
+milestones from outside the process.
+"""
+import builtins
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+PROFILE_FLAG = '--startup-profile'
+ENV_PROFILE_FILE = 'NOTEAPP_STARTUP_PROFILE'
+
+# Budgets from process start (bootstrap import) to each milestone
+STARTUP_TARGETS_MS = {
+    'first prompt': 250,
+    'first window': 400,
+    'notes loaded': 900,
+}
+
+
+class ImportTimer:
+    """Times first imports on the main thread, per top-level package.
+
+    Each package is charged for its own modules only: time spent importing
+    other packages from within it is charged to those."""
+
+    def __init__(self):
+        self.times: Dict[str, float] = {}
+        self._nested: List[float] = []
+        self._original = None
+
+    def install(self):
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original or builtins.__import__
+        if (level or name in sys.modules
+                or threading.current_thread() is not threading.main_thread()):
+            return original(name, globals, locals, fromlist, level)
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            package = name.partition('.')[0]
+            self.times[package] = self.times.get(package, 0.0) + elapsed - nested
+            if self._nested:
+                self._nested[-1] += elapsed
+
+
+class StartupProfile:
+    """Phases and milestones of one start-up; inert unless enabled."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.enabled = False
+        self.output: Optional[str] = None # None: stderr
+        self.imports = ImportTimer()
+        self.phases: List[Tuple[str, float]] = []
+        self.milestones: List[Tuple[str, float]] = []
+        self.reported = False
+
+    def configure(self, argv: List[str]):
+        """Enables profiling if requested on the command line or in the environment.
+
+        Call it before the heavy imports so that they are timed."""
+        if PROFILE_FLAG in argv:
+            self.enable()
+        elif os.environ.get(ENV_PROFILE_FILE):
+            self.enable(os.environ[ENV_PROFILE_FILE])
+
+    def enable(self, output: Optional[str] = None):
+        self.enabled = True
+        self.output = output
+        self.imports.install()
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def milestone(self, name: str, report: bool = False):
+        """Records the time since start-up; report=True also writes the report."""
+        if not self.enabled or self.reported:
+            return
+        self.milestones.append((name, time.perf_counter() - self.origin))
+        if report:
+            self.report()
+
+    def format_report(self) -> str:
+        lines = ["Startup profile (ms)", "  imports (own time per package):"]
+        for package, seconds in sorted(self.imports.times.items(), key=lambda item: -item[1]):
+            if seconds >= 0.001:
+                lines.append(f"    {package:28}{seconds * 1000:9.1f}")
+        lines.append("  init phases:")
+        for name, seconds in self.phases:
+            lines.append(f"    {name:28}{seconds * 1000:9.1f}")
+        lines.append("  milestones (since start):")
+        for name, seconds in self.milestones:
+            target = STARTUP_TARGETS_MS.get(name)
+            verdict = "" if target is None else (
+                f"  target {target} ms: {'ok' if seconds * 1000 <= target else 'OVER'}")
+            lines.append(f"    {name:28}{seconds * 1000:9.1f}{verdict}")
+        return "\n".join(lines)
+
+    def report(self):
+        """Writes the report once and stops timing imports."""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        self.imports.uninstall()
+        text = self.format_report() + "\n"
+        if self.output:
+            with open(self.output, 'a', encoding='utf-8') as f:
+                f.write(text)
+        elif sys.stderr is not None: # None in windowed (console=False) builds
+            sys.stderr.write(text)
+            sys.stderr.flush()
+
+
+profile = StartupProfile()
+
+
+class Database(NamedTuple):
+    config: object # storage.StorageConfig
+    engine: object
+    fts_enabled: bool # False when SQLite lacks FTS5/trigram: search uses LIKE
+    schema_version: int
+
+
+_database: Optional[Database] = None
+_database_lock = threading.Lock()
+
+
+def init_database() -> Database:
+    """Opens the configured database once per process; later calls return it."""
+    global _database
+    if _database is not None:
+        return _database
+    with _database_lock:
+        if _database is None:
+            _database = _open_database()
+    return _database
+
+
+def _open_database() -> Database:
+    with profile.phase('import models'):
+        import models
+        import migrations
+        import search_index
+        from compression import configure as configure_compression
+        from instrumentation import install_query_listeners
+        from storage import create_storage_engine, load_config
+
+    with profile.phase('create engine'):
+        config = load_config()
+        engine = create_storage_engine(config)
+        # Bodies over the threshold are stored compressed
+        configure_compression(config.compression, config.compress_min_bytes)
+        # Per-query latency histograms and the slow-query log
+        install_query_listeners(engine)
+
+    with profile.phase('schema check'):
+        with engine.connect() as conn:
+            version = migrations.get_schema_version(conn)
+            fts_enabled = search_index.index_exists(conn)
+    if version != migrations.latest_version():
+        with profile.phase('migrations'):
+            version = migrations.run_migrations(engine, models.Base.metadata)
+    if not fts_enabled:
+        with profile.phase('search index'):
+            # Missing only on new databases, or if SQLite lacked FTS5 last time
+            fts_enabled = search_index.ensure_search_index(engine)
+
+    models.Session.configure(bind=engine)
+    return Database(config, engine, fts_enabled, version)
@@ -0,0 +1,61 @@
+"""Bounded LRU cache with hit/miss counters, used by NoteManager for reads."""
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Least-recently-used cache holding at most maxsize entries.
+
+    Keys are tuples whose first item names the kind of entry, e.g.
+    ('note', 42) or ('summaries', category_id), so writers can invalidate
+    exactly the entries they affect with invalidate_where."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default=None):
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def put(self, key: Hashable, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, object], bool]):
+        """Drops every entry for which predicate(key, value) is true."""
+        for key in [k for k, v in self._entries.items() if predicate(k, v)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
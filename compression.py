@@ -0,0 +1,193 @@
+"""Transparent compression of large note bodies.
+
+Note.content uses CompressedText: bodies of at least `min_bytes` UTF-8
+bytes are stored as a BLOB holding a format marker followed by the zlib or
+lzma stream, everything else stays plain TEXT. Values are decompressed when
+the column is loaded; since Note.content is deferred, that only happens
+for notes whose body is actually read.
+
+SQL that needs the text (the LIKE search fallback) goes through the
+note_plaintext() function registered on every connection by
+install_sql_functions. The search index is given the plaintext by
+NoteManager (see search_index.py).
+
+recompress() rewrites existing rows under the current policy; it backs the
+`python main.py recompress` command.
+"""
+import lzma
+import os
+import random
+import time
+import zlib
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import Text, event, text
+from sqlalchemy.types import TypeDecorator
+
+# b'\x00NZ' + one byte naming the codec. A NUL can never start a UTF-8
+# note body, and plain bodies are stored as TEXT anyway.
+MARKER = b'\x00NZ'
+ALGORITHMS = {'zlib': b'z', 'lzma': b'x'}
+DEFAULT_MIN_BYTES = 4096
+ZLIB_LEVEL = 6
+LZMA_PRESET = 6
+
+
+class CompressionPolicy(NamedTuple):
+    algorithm: str = 'zlib' # 'zlib', 'lzma' or 'none'
+    min_bytes: int = DEFAULT_MIN_BYTES
+
+
+_policy = CompressionPolicy()
+
+
+def configure(algorithm: str, min_bytes: int):
+    """Sets how new and updated bodies are stored (see StorageConfig)."""
+    global _policy
+    if algorithm != 'none' and algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown compression: {algorithm}")
+    _policy = CompressionPolicy(algorithm, min_bytes)
+
+
+def current_policy() -> CompressionPolicy:
+    return _policy
+
+
+def compress_text(value: str, policy: Optional[CompressionPolicy] = None):
+    """The value to store for a body: the str itself or compressed bytes."""
+    policy = policy or _policy
+    if policy.algorithm == 'none':
+        return value
+    raw = value.encode('utf-8')
+    if len(raw) < policy.min_bytes:
+        return value
+    if policy.algorithm == 'lzma':
+        packed = lzma.compress(raw, preset=LZMA_PRESET)
+    else:
+        packed = zlib.compress(raw, ZLIB_LEVEL)
+    stored = MARKER + ALGORITHMS[policy.algorithm] + packed
+    if len(stored) >= len(raw):
+        return value # Incompressible (already compressed data, random text)
+    return stored
+
+
+def decompress_text(value):
+    """The body text for a stored value (str, compressed bytes or None)."""
+    if not isinstance(value, (bytes, memoryview)):
+        return value
+    value = bytes(value)
+    if value[:len(MARKER)] != MARKER:
+        return value.decode('utf-8', errors='replace')
+    codec, packed = value[len(MARKER):len(MARKER) + 1], value[len(MARKER) + 1:]
+    if codec == ALGORITHMS['lzma']:
+        return lzma.decompress(packed).decode('utf-8')
+    if codec == ALGORITHMS['zlib']:
+        return zlib.decompress(packed).decode('utf-8')
+    raise ValueError(f"Unknown compression codec {codec!r}")
+
+
+class CompressedText(TypeDecorator):
+    """Text column whose large values are compressed on the way in."""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            return compress_text(value)
+        return value
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+
+def install_sql_functions(engine):
+    """Registers note_plaintext(content) on every new connection of engine."""
+    @event.listens_for(engine, 'connect')
+    def _register(dbapi_conn, connection_record):
+        dbapi_conn.create_function('note_plaintext', 1, decompress_text, deterministic=True)
+
+
+# --- Offline recompression ---
+
+class RecompressResult(NamedTuple):
+    examined: int
+    rewritten: int
+    bytes_before: int
+    bytes_after: int
+
+
+class StorageReport(NamedTuple):
+    file_bytes: int
+    content_bytes: int
+    compressed_rows: int
+    total_rows: int
+    read_p50_ms: float
+    read_p95_ms: float
+
+
+def _file_bytes(engine) -> int:
+    path = engine.url.database
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal')
+               if path and os.path.exists(path + suffix))
+
+
+def storage_report(engine, samples: int = 200, seed: int = 0) -> StorageReport:
+    """On-disk size and the latency of reading (and decompressing) note bodies."""
+    with engine.connect() as conn:
+        content_bytes, compressed, total = conn.execute(text(
+            "SELECT coalesce(sum(length(CAST(content AS BLOB))), 0), "
+            "count(CASE WHEN typeof(content) = 'blob' THEN 1 END), count(*) FROM notes"
+        )).one()
+        ids = [row[0] for row in conn.execute(text("SELECT id FROM notes"))]
+        rng = random.Random(seed)
+        latencies = []
+        for note_id in rng.sample(ids, min(samples, len(ids))):
+            start = time.perf_counter()
+            stored = conn.execute(text("SELECT content FROM notes WHERE id = :id"),
+                                  {'id': note_id}).scalar()
+            decompress_text(stored)
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] if latencies else 0.0
+    return StorageReport(_file_bytes(engine), content_bytes, compressed, total, pct(50), pct(95))
+
+
+def recompress(engine, policy: Optional[CompressionPolicy] = None, batch_size: int = 500,
+               progress: Optional[Callable[[int], None]] = None) -> RecompressResult:
+    """Rewrites every body that is not stored the way policy wants.
+
+    Works through the table in id order, one transaction per batch, so it
+    can be interrupted and rerun. The FTS index is left alone, since the
+    plaintext does not change."""
+    policy = policy or _policy
+    examined = rewritten = bytes_before = bytes_after = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, content FROM notes WHERE id > :last ORDER BY id LIMIT :limit"
+            ), {'last': last_id, 'limit': batch_size}).fetchall()
+            if not rows:
+                break
+            updates = []
+            for note_id, stored in rows:
+                if stored is None:
+                    continue
+                wanted = compress_text(decompress_text(stored), policy)
+                old_size = len(stored.encode('utf-8')) if isinstance(stored, str) else len(stored)
+                new_size = len(wanted.encode('utf-8')) if isinstance(wanted, str) else len(wanted)
+                bytes_before += old_size
+                bytes_after += new_size
+                if wanted != stored:
+                    updates.append({'id': note_id, 'content': wanted})
+            if updates:
+                conn.execute(text("UPDATE notes SET content = :content WHERE id = :id"), updates)
+            examined += len(rows)
+            rewritten += len(updates)
+            last_id = rows[-1][0]
+        if progress:
+            progress(examined)
+    return RecompressResult(examined, rewritten, bytes_before, bytes_after)
@@ -0,0 +1,238 @@
+"""Self-checks for the storage layer.
+
+Run `python diagnostics.py` to verify that the hot queries are served by the
+indexes created in migrations.py, that no listing path issues one query
+per note (N+1), and that the per-category aggregates kept by triggers stay
+exact. Exits with status 1 if any check fails.
+"""
+import sys
+from contextlib import contextmanager
+from functools import partial
+from typing import List, NamedTuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import StaticPool
+
+
+class PlanCheck(NamedTuple):
+    label: str
+    sql: str
+    index: str # index name the plan is expected to mention
+    seek: bool = False # the index must be searched from a bound, not scanned from the top
+
+
+class CheckResult(NamedTuple):
+    label: str
+    ok: bool
+    detail: str
+
+
+PLAN_CHECKS = [
+    PlanCheck(
+        "notes by category, newest first",
+        "SELECT id, title FROM notes WHERE category_id = 1 "
+        "ORDER BY updated_at DESC, id DESC LIMIT 200",
+        "ix_notes_category_updated",
+    ),
+    PlanCheck(
+        "notes by category, next keyset page",
+        "SELECT id, title FROM notes WHERE category_id = 1 "
+        "AND updated_at <= '2024-01-01' "
+        "AND (updated_at < '2024-01-01' OR (updated_at = '2024-01-01' AND id < 10)) "
+        "ORDER BY updated_at DESC, id DESC LIMIT 200",
+        "ix_notes_category_updated",
+        seek=True,
+    ),
+    PlanCheck(
+        "all notes, newest first",
+        "SELECT id, title FROM notes ORDER BY updated_at DESC, id DESC LIMIT 200",
+        "ix_notes_updated",
+    ),
+    PlanCheck(
+        "all notes, next keyset page",
+        "SELECT id, title FROM notes "
+        "WHERE updated_at <= '2024-01-01' "
+        "AND (updated_at < '2024-01-01' OR (updated_at = '2024-01-01' AND id < 10)) "
+        "ORDER BY updated_at DESC, id DESC LIMIT 200",
+        "ix_notes_updated",
+        seek=True,
+    ),
+    PlanCheck(
+        "latest note of a category (category stats triggers)",
+        "SELECT MAX(updated_at) FROM notes WHERE category_id = 1",
+        "ix_notes_category_updated",
+    ),
+    PlanCheck(
+        "category by name",
+        "SELECT id FROM categories WHERE name = 'Uncategorized'",
+        "", # any index on name will do (constraint autoindex or ix_categories_name)
+    ),
+]
+
+
+def check_query_plans(engine) -> List[CheckResult]:
+    """Runs EXPLAIN QUERY PLAN for each hot query and checks index usage.
+
+    A check passes when the plan searches an index (the expected one, if
+    named) and does not need a temporary B-tree to sort the results."""
+    results = []
+    with engine.connect() as conn:
+        for check in PLAN_CHECKS:
+            rows = conn.execute(text("EXPLAIN QUERY PLAN " + check.sql)).fetchall()
+            detail = "; ".join(row[-1] for row in rows)
+            uses_index = "USING INDEX" in detail or "USING COVERING INDEX" in detail
+            if check.index:
+                uses_index = uses_index and check.index in detail
+            ok = uses_index and "TEMP B-TREE" not in detail
+            if check.seek:
+                ok = ok and "<" in detail # e.g. "SEARCH notes USING INDEX ... (updated_at<?)"
+            results.append(CheckResult(check.label, ok, detail))
+    return results
+
+
+@contextmanager
+def count_queries(engine):
+    """Counts the SQL statements executed on engine inside the block.
+
+    Yields a one-element list whose item is updated as statements run."""
+    counter = [0]
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    event.listen(engine, "after_cursor_execute", on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "after_cursor_execute", on_execute)
+
+
+def scratch_engine():
+    """An empty in-memory database set up like the application's (see storage.py).
+
+    Foreign keys are enforced, as NoteManager's deletes rely on ON DELETE CASCADE."""
+    from compression import install_sql_functions
+
+    engine = create_engine('sqlite://', poolclass=StaticPool,
+                           connect_args={'check_same_thread': False})
+
+    @event.listens_for(engine, 'connect')
+    def _enforce_foreign_keys(dbapi_conn, connection_record):
+        dbapi_conn.execute("PRAGMA foreign_keys=ON")
+
+    install_sql_functions(engine)
+    return engine
+
+
+def scratch_manager():
+    """A NoteManager over a seeded in-memory database with several categories (also used by tests/)."""
+    from models import Base, Session
+    from migrations import run_migrations
+    from note_manager import NoteManager
+    from search_index import ensure_search_index
+
+    engine = scratch_engine()
+    run_migrations(engine, Base.metadata)
+    manager = NoteManager(partial(Session, bind=engine), fts_enabled=ensure_search_index(engine))
+    for c in range(3):
+        category = manager.add_category(f"分类{c}")
+        for n in range(5):
+            manager.add_note(f"项目计划 {c}-{n}", f"content {n} abc", category.id)
+    return engine, manager
+
+
+def check_listing_query_counts() -> List[CheckResult]:
+    """Checks that every listing path returns category names in one query.
+
+    Each listing call, followed by reading the category name of every
+    result as the UI does, must execute exactly one SQL statement."""
+    engine, manager = scratch_manager()
+    category_id = next(c.id for c in manager.get_all_categories() if c.note_count)
+
+    def category_names(notes):
+        return [n.category_name for n in notes]
+
+    paths = [
+        ("get_all_notes", lambda: manager.get_all_notes()),
+        ("get_notes_by_category", lambda: manager.get_notes_by_category(category_id)),
+        ("search_notes (index)", lambda: manager.search_notes("项目计划", category_id)),
+        ("search_notes (LIKE)", lambda: manager.search_notes("ab", category_id)),
+        ("search_all_notes (index)", lambda: manager.search_all_notes("项目计划")),
+        ("search_all_notes (LIKE)", lambda: manager.search_all_notes("ab")),
+        ("get_all_note_summaries", lambda: manager.get_all_note_summaries()),
+        ("get_note_summaries_by_category",
+         lambda: manager.get_note_summaries_by_category(category_id)),
+        ("search_note_summaries", lambda: manager.search_note_summaries("项目计划", category_id)),
+        ("search_all_note_summaries", lambda: manager.search_all_note_summaries("项目计划")),
+        ("get_notes_page", lambda: manager.get_notes_page().items),
+        ("search_notes_page", lambda: manager.search_notes_page("项目计划").items),
+        ("get_note_summaries_page", lambda: manager.get_note_summaries_page(category_id).items),
+        ("search_note_summaries_page (LIKE)",
+         lambda: manager.search_note_summaries_page("ab", category_id).items),
+    ]
+    results = []
+    for label, call in paths:
+        manager.clear_cache()
+        with count_queries(engine) as counter:
+            names = category_names(call())
+        ok = counter[0] == 1 and len(names) > 0
+        results.append(CheckResult(f"query count: {label}", ok,
+                                   f"{counter[0]} queries for {len(names)} notes"))
+    return results
+
+
+def check_category_stats() -> List[CheckResult]:
+    """Checks the trigger-maintained category aggregates against a recount.
+
+    Each kind of write (insert, bulk insert, edit, move, back-dating,
+    delete, category delete) is followed by comparing note_count and
+    last_updated_at with COUNT(*) / MAX(updated_at) over notes."""
+    from datetime import datetime
+    from note_manager import NoteEdit
+
+    engine, manager = scratch_manager()
+    first, second, third = [c.id for c in manager.get_all_categories() if c.note_count][:3]
+    note = manager.add_note("新笔记", "content", first)
+
+    def back_date(note_id):
+        with manager.unit_of_work() as session:
+            session.execute(text("UPDATE notes SET updated_at = :t WHERE id = :id"),
+                            {'t': datetime(2000, 1, 1), 'id': note_id})
+            session.commit()
+
+    writes = [
+        ("add_note", lambda: manager.add_note("另一条", "content", second)),
+        ("bulk_import", lambda: manager.bulk_import(
+            [{'title': f"导入 {n}", 'content': "x", 'category': "导入分类"} for n in range(10)])),
+        ("update_note", lambda: manager.update_note(note.id, "新标题", "new content")),
+        ("move note", lambda: manager.save_notes([NoteEdit(note.id, "新标题", "moved", second)])),
+        ("back-date latest note", lambda: back_date(note.id)),
+        ("delete_note", lambda: manager.delete_note(note.id)),
+        ("delete_category", lambda: manager.delete_category(third)),
+    ]
+    recount = text(
+        "SELECT c.id, c.note_count, c.last_updated_at, COUNT(n.id), MAX(n.updated_at) "
+        "FROM categories c LEFT JOIN notes n ON n.category_id = c.id GROUP BY c.id")
+    results = []
+    for label, write in writes:
+        write()
+        with engine.connect() as conn:
+            wrong = [row[0] for row in conn.execute(recount) if (row[1], row[2]) != (row[3], row[4])]
+        results.append(CheckResult(f"category stats after {label}", not wrong,
+                                   f"mismatched categories: {wrong}" if wrong else "counts match"))
+    return results
+
+
+def main() -> int:
+    from bootstrap import init_database
+
+    engine = init_database().engine
+    results = check_query_plans(engine) + check_listing_query_counts() + check_category_stats()
+    for result in results:
+        status = "OK  " if result.ok else "FAIL"
+        print(f"[{status}] {result.label}: {result.detail}")
+    return 0 if all(r.ok for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Diagnostics dialog: latency histograms of NoteManager methods and queries."""
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton, QLabel
+from PyQt5.QtGui import QFont
+
+import instrumentation
+
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, parent=None, cache_stats=None):
+        super().__init__(parent)
+        self.cache_stats = cache_stats
+        self.setWindowTitle('性能诊断')
+        self.resize(1100, 700)
+
+        layout = QVBoxLayout(self)
+        settings = instrumentation.settings
+        layout.addWidget(QLabel(f'慢查询日志：{settings.slow_query_log}（阈值 {settings.slow_query_ms:g} ms）'))
+        self.cache_label = QLabel()
+        layout.addWidget(self.cache_label)
+        self.report_view = QPlainTextEdit()
+        self.report_view.setReadOnly(True)
+        self.report_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.report_view.setFont(QFont("Consolas, Menlo, monospace", 11))
+        layout.addWidget(self.report_view)
+
+        button_layout = QHBoxLayout()
+        refresh_btn = QPushButton("刷新")
+        refresh_btn.clicked.connect(self.refresh)
+        reset_btn = QPushButton("清空统计")
+        reset_btn.setObjectName("deleteButton")
+        reset_btn.clicked.connect(self.reset)
+        close_btn = QPushButton("关闭")
+        close_btn.setObjectName("secondaryButton")
+        close_btn.clicked.connect(self.accept)
+        button_layout.addStretch()
+        button_layout.addWidget(refresh_btn)
+        button_layout.addWidget(reset_btn)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.refresh()
+
+    def refresh(self):
+        self.report_view.setPlainText(
+            instrumentation.format_report(instrumentation.combined_stats()))
+        if self.cache_stats:
+            c = self.cache_stats()
+            self.cache_label.setText(
+                f"读取缓存：{c['size']}/{c['maxsize']} 项，命中 {c['hits']}，未命中 {c['misses']}，"
+                f"淘汰 {c['evictions']}，命中率 {c['hit_rate']:.1%}")
+
+    def reset(self):
+        instrumentation.reset_stats()
+        self.refresh()
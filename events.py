@@ -0,0 +1,79 @@
+"""Change events that NoteManager publishes after each committed write.
+
+A subscriber (the title index, the window's lists) applies the change to
+what it already holds instead of reading it back: each event carries the
+row as it is now. Events inside NoteManager.batch() are held back until the
+batch commits, and dropped if it rolls back; DataReset follows then, as it
+does whenever the manager cannot tell what changed (another session wrote,
+a bulk import).
+"""
+import logging
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple, Union
+
+from models import NoteSummary
+
+logger = logging.getLogger('noteapp.events')
+
+
+@dataclass(frozen=True, slots=True)
+class NoteAdded:
+    summary: NoteSummary
+
+
+@dataclass(frozen=True, slots=True)
+class NoteUpdated:
+    """Title or body saved, in the same category; summary.updated_at is the new one."""
+    summary: NoteSummary
+
+
+@dataclass(frozen=True, slots=True)
+class NoteMoved:
+    """Saved into another category (possibly with a new title or body too)."""
+    summary: NoteSummary
+    old_category_id: int
+
+
+@dataclass(frozen=True, slots=True)
+class NotesDeleted:
+    """One or more notes of a category were deleted, in one transaction."""
+    category_id: int
+    note_ids: Tuple[int, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryChanged:
+    """A category was added or renamed (name is the current one) or deleted (name is None).
+
+    Deleting a category publishes NotesDeleted for its notes first."""
+    category_id: int
+    name: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class DataReset:
+    """Anything may have changed: subscribers reload what they hold."""
+
+
+ChangeEvent = Union[NoteAdded, NoteUpdated, NoteMoved, NotesDeleted, CategoryChanged, DataReset]
+Subscriber = Callable[[ChangeEvent], None]
+
+
+class EventBus:
+    """Calls every subscriber with each published event, in subscription order."""
+
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Returns a function that unsubscribes callback again."""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def publish(self, event: ChangeEvent):
+        # The write is committed already: one failing view must not stop the others
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("change event subscriber failed on %r", event)
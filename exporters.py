@@ -0,0 +1,117 @@
+"""Streaming exporters for the note database.
+
+The JSONL and Markdown exporters consume the records yielded by
+NoteManager.iter_export_records and write each note as soon as it arrives,
+optionally gzip-compressed on the fly, so peak memory does not depend on the
+number of notes. JSONL output can be read back with importers.read_jsonl and
+a Markdown tree with importers.read_markdown_dir.
+"""
+import gzip
+import io
+import json
+import os
+import re
+import tarfile
+import time
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import text
+
+FORMATS = ('jsonl', 'markdown', 'sqlite')
+PROGRESS_EVERY = 1000
+
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+MAX_NAME_LENGTH = 80
+
+Progress = Optional[Callable[[int], None]]
+
+
+def safe_filename(name: str) -> str:
+    """Turns a title or category name into a portable file name."""
+    name = _UNSAFE_CHARS.sub('_', name).strip().rstrip('.')
+    return name[:MAX_NAME_LENGTH] or 'untitled'
+
+
+def _report(progress: Progress, count: int):
+    if progress and count % PROGRESS_EVERY == 0:
+        progress(count)
+
+
+def export_jsonl(records: Iterable[dict], path: str, compress: bool = False,
+                 progress: Progress = None) -> int:
+    """Writes one JSON object per line; gzip-compressed if compress is set."""
+    opener = gzip.open if compress else open
+    count = 0
+    with opener(path, 'wt', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+            _report(progress, count)
+    return count
+
+
+def _markdown_document(record: dict) -> str:
+    content = record['content']
+    if content.startswith('# '):
+        return content # Already carries its own title heading
+    return f"# {record['title']}\n\n{content}"
+
+
+def export_markdown_tree(records: Iterable[dict], path: str, compress: bool = False,
+                         progress: Progress = None) -> int:
+    """Writes one .md file per note inside one directory per category.
+
+    Without compress, path is a directory. With compress, the tree is
+    streamed into a .tar.gz archive at path instead."""
+    count = 0
+    archive = tarfile.open(path, 'w:gz') if compress else None
+    try:
+        for record in records:
+            relative = os.path.join(
+                safe_filename(record['category']),
+                f"{safe_filename(record['title'])}-{record['id']}.md",
+            )
+            data = _markdown_document(record).encode('utf-8')
+            if archive:
+                info = tarfile.TarInfo(relative.replace(os.sep, '/'))
+                info.size = len(data)
+                info.mtime = time.time()
+                archive.addfile(info, io.BytesIO(data))
+            else:
+                target = os.path.join(path, relative)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as f:
+                    f.write(data)
+            count += 1
+            _report(progress, count)
+    finally:
+        if archive:
+            archive.close()
+    return count
+
+
+def export_sqlite_snapshot(engine, path: str):
+    """Writes a consistent, compacted copy of the whole database to path.
+
+    Uses VACUUM INTO, which copies page by page inside SQLite, so nothing is
+    loaded into Python. The target file must not exist yet."""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM INTO :path"), {'path': path})
+
+
+def export_notes(manager, path: str, fmt: str, compress: bool = False,
+                 progress: Progress = None) -> Optional[int]:
+    """Runs one of the exporters; returns the number of notes written
+    (None for an SQLite snapshot, which copies the database as a whole)."""
+    if fmt == 'sqlite':
+        with manager.unit_of_work() as session:
+            export_sqlite_snapshot(session.get_bind(), path)
+        return None
+    if fmt == 'jsonl':
+        return export_jsonl(manager.iter_export_records(), path, compress, progress)
+    if fmt == 'markdown':
+        return export_markdown_tree(manager.iter_export_records(), path, compress, progress)
+    raise ValueError(f"Unknown export format: {fmt}")
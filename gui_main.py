@@ -1,23 +1,70 @@
 import sys
+from dataclasses import replace
+from typing import Optional
+import bootstrap
+
+# Before the Qt imports, so that they show up in the profile
+bootstrap.profile.configure(sys.argv)
+
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QPushButton, QTextEdit, QLineEdit, QLabel, QMessageBox, 
-    QListWidget, QListWidgetItem, QSplitter, QInputDialog, QMenu, QAction,
-    QComboBox, QStyleFactory, QSizePolicy
+    QListWidget, QListWidgetItem, QListView, QSplitter, QInputDialog, QMenu, QAction,
+    QComboBox, QStyleFactory, QSizePolicy, QFileDialog, QDialog, QAbstractItemView
 )
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QFont, QIcon
-from note_manager import NoteManager
-from models import Category, Note # Import models
+from PyQt5.QtCore import Qt, QSize, QModelIndex, QTimer
+from PyQt5.QtGui import QFont, QIcon, QKeySequence
+from note_list_model import NoteListModel
+# SQLAlchemy (note_manager, models, workers) and the dialogs are imported
+# where they are used: the window is shown before the database is opened
 
 class NoteApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.note_manager = NoteManager()
-        self.current_category: Optional[Category] = None
-        self.current_note: Optional[Note] = None
+        self.note_manager = None # Set by open_database() once the window is up
+        self.current_category: Optional[CategorySummary] = None
+        self.current_note: Optional[NoteDetail] = None # As read when it was opened
+        # What the editor shows: an existing note's id, or a new unsaved note
+        self.editor_note_id: Optional[int] = None
+        self.editor_is_new = False
+        self.autosaver = None
+        self.search_scheduler = None
+        self.background_tasks = set() # Keeps running tasks (and their signals) alive
         self.init_ui()
-        self.load_categories() # Load categories on startup
+        # Nothing to interact with until open_database() has loaded the categories
+        self.centralWidget().setEnabled(False)
+        self.menuBar().setEnabled(False)
+        self.statusBar().showMessage('正在打开数据库...')
+
+    def open_database(self):
+        """Opens the database and loads the categories; runs once the window is shown."""
+        from note_manager import NoteManager
+        from search_worker import SearchScheduler
+        from autosave import Autosaver
+
+        import instrumentation
+
+        with bootstrap.profile.phase('open note manager'):
+            self.note_manager = NoteManager()
+        instrumentation.save_stats_at_exit() # For `python main.py stats`
+        # Edits are staged and written in batches; no commit per keystroke or save
+        self.autosaver = Autosaver(self.note_manager,
+                                   lambda: self.save_editor_changes(show_new=True), self)
+        self.autosaver.state_changed.connect(self.show_save_state)
+        # Searches run debounced on a worker thread; only the newest result lands
+        self.search_scheduler = SearchScheduler(self, ranked=self.note_manager.ranks_by_relevance)
+        self.search_scheduler.results_ready.connect(self.show_search_results)
+        self.search_scheduler.search_failed.connect(self.show_search_failure)
+        # Writes update single rows of the lists instead of reloading them
+        self.note_manager.events.subscribe(self.apply_change)
+        with bootstrap.profile.phase('load categories'):
+            self.load_categories()
+        self.centralWidget().setEnabled(True)
+        self.menuBar().setEnabled(True)
+        self.statusBar().clearMessage()
+        bootstrap.profile.milestone('notes loaded', report=True)
+        # Once the window is usable, so that the first Ctrl+P does not wait for it
+        QTimer.singleShot(0, self.note_manager.get_title_index)
 
     def init_ui(self):
         self.setWindowTitle('笔记管理程序 v2.0')
@@ -25,17 +72,17 @@ class NoteApp(QMainWindow):
         self.setStyleSheet("""
             QMainWindow { background-color: #f8f9fa; }
             QWidget { font-size: 18px; } /* Increased base font size further */
-            QListWidget { 
+            QListWidget, QListView { 
                 border: 1px solid #ced4da; 
                 border-radius: 4px; 
                 background-color: white; 
                 padding: 5px;
             }
-            QListWidget::item { 
+            QListWidget::item, QListView::item { 
                 padding: 8px 10px; /* Increased item padding */ 
                 border-bottom: 1px solid #eee;
             }
-            QListWidget::item:selected { 
+            QListWidget::item:selected, QListView::item:selected { 
                 background-color: #cfe2ff; 
                 color: #000;
                 border-left: 3px solid #0d6efd;
@@ -66,6 +113,31 @@ class NoteApp(QMainWindow):
             QSplitter::handle:vertical { height: 5px; }
         """)
 
+        # --- Menu Bar ---        
+        file_menu = self.menuBar().addMenu("文件")
+        quick_open_action = QAction("快速打开笔记...", self)
+        quick_open_action.setShortcut(QKeySequence("Ctrl+P"))
+        quick_open_action.triggered.connect(self.show_quick_switcher)
+        file_menu.addAction(quick_open_action)
+        import_menu = file_menu.addMenu("导入")
+        self.import_actions = []
+        for label, fmt in (("Markdown 文件夹...", "markdown"), ("JSONL 文件...", "jsonl"), ("CSV 文件...", "csv")):
+            action = QAction(label, self)
+            action.triggered.connect(lambda checked, fmt=fmt: self.import_notes(fmt))
+            import_menu.addAction(action)
+            self.import_actions.append(action)
+        export_menu = file_menu.addMenu("导出")
+        for label, fmt, compress in (("JSONL 文件...", "jsonl", False), ("JSONL 压缩文件 (.gz)...", "jsonl", True),
+                                     ("Markdown 文件夹...", "markdown", False), ("数据库快照...", "sqlite", False)):
+            action = QAction(label, self)
+            action.triggered.connect(lambda checked, fmt=fmt, compress=compress: self.export_notes(fmt, compress))
+            export_menu.addAction(action)
+            self.import_actions.append(action) # Imports and exports share the busy state
+        help_menu = self.menuBar().addMenu("帮助")
+        diagnostics_action = QAction("性能诊断...", self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        help_menu.addAction(diagnostics_action)
+
         # --- Main Layout ---        
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
@@ -128,8 +200,21 @@ class NoteApp(QMainWindow):
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText('在当前分类下搜索...')
         self.search_input.textChanged.connect(self.search_notes)
-        self.note_list = QListWidget()
-        self.note_list.currentItemChanged.connect(self.note_selected)
+        # Paged model: rows hold summaries only and are fetched as the view scrolls
+        self.note_model = NoteListModel(self)
+        self.note_list = QListView()
+        self.note_list.setUniformItemSizes(True)
+        self.note_list.setModel(self.note_model)
+        self.note_list.selectionModel().currentChanged.connect(self.note_selected)
+        # Ctrl/Shift+click selects several notes; the context menu and Delete act on all of them
+        self.note_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.note_list.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.note_list.customContextMenuRequested.connect(self.show_note_context_menu)
+        delete_selected_action = QAction("删除所选笔记", self.note_list)
+        delete_selected_action.setShortcut(QKeySequence.Delete)
+        delete_selected_action.setShortcutContext(Qt.WidgetShortcut)
+        delete_selected_action.triggered.connect(self.delete_selected_notes)
+        self.note_list.addAction(delete_selected_action)
         
         self.new_note_btn = QPushButton("新建笔记")
         self.new_note_btn.clicked.connect(self.new_note)
@@ -149,15 +234,18 @@ class NoteApp(QMainWindow):
         title_label = QLabel("标题:")
         self.title_input = QLineEdit()
         self.title_input.setEnabled(False)
+        self.title_input.textEdited.connect(self.editor_changed)
         
         content_label = QLabel("内容:")
         self.content_input = QTextEdit()
         self.content_input.setEnabled(False)
+        self.content_input.textChanged.connect(self.editor_changed)
 
         move_layout = QHBoxLayout()
         move_label = QLabel("移动到分类:")
         self.move_category_combo = QComboBox()
         self.move_category_combo.setEnabled(False)
+        self.move_category_combo.activated.connect(self.move_note)
         move_layout.addWidget(move_label)
         move_layout.addWidget(self.move_category_combo)
         move_layout.addStretch()
@@ -170,7 +258,12 @@ class NoteApp(QMainWindow):
         self.delete_button.setObjectName("deleteButton")
         self.delete_button.setEnabled(False)
         self.delete_button.clicked.connect(self.delete_note)
+        self.history_button = QPushButton("历史版本")
+        self.history_button.setObjectName("secondaryButton")
+        self.history_button.setEnabled(False)
+        self.history_button.clicked.connect(self.show_history)
         button_layout.addStretch()
+        button_layout.addWidget(self.history_button)
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.delete_button)
 
@@ -184,6 +277,67 @@ class NoteApp(QMainWindow):
 
         splitter.setSizes([250, 300, 850]) # Adjust initial sizes
 
+        # Autosave indicator, replacing the old "saved" message boxes
+        self.save_status_label = QLabel()
+        self.statusBar().addPermanentWidget(self.save_status_label)
+
+    # --- Change Events ---
+    def apply_change(self, event):
+        """Applies a NoteManager change event to the lists, row by row and without queries."""
+        from events import CategoryChanged, DataReset, NoteAdded, NoteMoved, NotesDeleted
+        self.search_scheduler.invalidate() # Remembered search results are stale
+        if isinstance(event, DataReset):
+            self.load_categories()
+        elif isinstance(event, CategoryChanged):
+            self.apply_category_change(event.category_id, event.name)
+        elif isinstance(event, NotesDeleted):
+            self.count_category_notes(event.category_id, -len(event.note_ids))
+            self.remove_note_rows(set(event.note_ids))
+        elif isinstance(event, NoteAdded):
+            summary = event.summary
+            self.count_category_notes(summary.category_id, 1, summary.updated_at)
+            if self.listed_category_id(unfiltered=True) == summary.category_id:
+                self.note_model.prepend(summary) # Newest first
+        else: # NoteUpdated or NoteMoved
+            summary = event.summary
+            if isinstance(event, NoteMoved):
+                self.count_category_notes(event.old_category_id, -1)
+                self.count_category_notes(summary.category_id, 1, summary.updated_at)
+            else:
+                self.count_category_notes(summary.category_id, 0, summary.updated_at)
+            pending = self.autosaver.pending_edit(summary.id) # The row shows the editor's title
+            if pending:
+                summary = replace(summary, title=pending.title)
+            listed = self.listed_category_id()
+            row = self.note_model.row_for_note(summary.id)
+            if row >= 0 and listed is not None and listed != summary.category_id:
+                self.remove_note_rows({summary.id}) # Moved out of the category shown
+            elif row >= 0:
+                self.note_model.set_summary(row, summary)
+            elif isinstance(event, NoteMoved) and self.listed_category_id(unfiltered=True) == summary.category_id:
+                self.note_model.prepend(summary)
+            if isinstance(event, NoteMoved) and summary.id == self.editor_note_id:
+                # Still open (e.g. in search results): its next autosave must not move it back
+                index = self.move_category_combo.findData(summary.category_id)
+                if index >= 0:
+                    self.move_category_combo.setCurrentIndex(index)
+
+    def listed_category_id(self, unfiltered: bool = False) -> Optional[int]:
+        """The category whose notes the list shows; None for global search results.
+
+        With unfiltered, also None while the category search filters the list."""
+        if self.current_category is None or self.global_search_input.text():
+            return None
+        if unfiltered and self.search_input.text().strip():
+            return None
+        return self.current_category.id
+
+    def remove_note_rows(self, note_ids: set):
+        current = self.note_list.currentIndex()
+        if current.isValid() and self.note_model.summary(current.row()).id in note_ids:
+            self.note_list.selectionModel().clearCurrentIndex() # Empties the editor
+        self.note_model.remove_notes(note_ids)
+
     # --- Global Search Methods ---
     def perform_global_search(self):
         """Performs search across all notes based on global search input."""
@@ -198,21 +352,27 @@ class NoteApp(QMainWindow):
             # Optionally disable category interaction during global search
             self.category_list.setEnabled(False)
             self.notes_list_label.setText(f'全局搜索结果: "{keyword}"')
-            notes = self.note_manager.search_all_notes(keyword)
-            for note in notes:
-                # Display category name along with title for context
-                display_text = f"{note.title}  [{note.category.name}]"
-                item = QListWidgetItem(display_text)
-                item.setData(Qt.UserRole, note) # Store full note object
-                self.note_list.addItem(item)
+            from search_worker import SearchRequest
+            self.search_scheduler.schedule(SearchRequest(keyword))
             self.new_note_btn.setEnabled(False) # Can't create new note in search results
             self.search_input.setEnabled(False) # Disable category search
         else:
             # If global search is cleared, re-enable categories and load current
             self.clear_global_search() 
 
+    def show_search_results(self, request, summaries):
+        """Fills the note list with results delivered by the search worker."""
+        # Global results show the category name along with the title for context
+        self.note_model.set_rows(summaries, show_category=request.category_id is None)
+
+    def show_search_failure(self, request, message: str):
+        """Empties the list and says why, instead of showing the failure as "no matches"."""
+        self.note_model.clear()
+        self.statusBar().showMessage(f'搜索 "{request.keyword}" 失败：{message}', 10000)
+
     def clear_global_search(self):
         """Clears global search and restores category view."""
+        self.search_scheduler.cancel()
         # Block signals to prevent triggering search again while clearing
         self.global_search_input.blockSignals(True)
         self.global_search_input.clear()
@@ -238,16 +398,17 @@ class NoteApp(QMainWindow):
         """Loads categories into the category list."""
         self.category_list.clear()
         self.move_category_combo.clear() # Clear move combo as well
-        categories = self.note_manager.get_all_categories()
+        # Names with note counts, in one query that reads no notes
+        categories = self.note_manager.get_category_summaries()
         if not categories:
              # Ensure default if none exist after init check
-             default_cat = self.note_manager.add_category("Uncategorized")
-             if default_cat: categories = [default_cat]
-             else: return # Should not happen
+             if not self.note_manager.add_category("Uncategorized"):
+                 return # Should not happen
+             categories = self.note_manager.get_category_summaries()
 
         for category in categories:
-            item = QListWidgetItem(category.name)
-            item.setData(Qt.UserRole, category) # Store category object
+            item = QListWidgetItem()
+            self.show_category_item(item, category)
             self.category_list.addItem(item)
             self.move_category_combo.addItem(category.name, category.id)
             
@@ -280,6 +441,85 @@ class NoteApp(QMainWindow):
             self.category_list.setEnabled(False)
             self.search_input.setEnabled(False)
 
+    def show_category_item(self, item: QListWidgetItem, category: "CategorySummary"):
+        item.setText(f"{category.name} ({category.note_count})")
+        item.setToolTip(f"{category.note_count} 条笔记，最近修改于 "
+                        f"{category.last_updated_at:%Y-%m-%d %H:%M}" if category.last_updated_at
+                        else "暂无笔记")
+        item.setData(Qt.UserRole, category) # Store category summary
+
+    def find_category_item(self, category_id: int) -> Optional[QListWidgetItem]:
+        for i in range(self.category_list.count()):
+            item = self.category_list.item(i)
+            if item.data(Qt.UserRole).id == category_id:
+                return item
+        return None
+
+    def count_category_notes(self, category_id: int, delta: int, updated_at=None):
+        """Adjusts a category's note count and latest update as shown, without a query.
+
+        After a delete the latest update shown may be older than a note
+        that is gone; load_categories() reads the exact one again."""
+        item = self.find_category_item(category_id)
+        if item is None:
+            return
+        category = item.data(Qt.UserRole)
+        note_count = category.note_count + delta
+        last_updated_at = category.last_updated_at
+        if updated_at and (last_updated_at is None or updated_at > last_updated_at):
+            last_updated_at = updated_at
+        category = replace(category, note_count=note_count,
+                           last_updated_at=last_updated_at if note_count else None)
+        self.show_category_item(item, category)
+        if self.current_category and self.current_category.id == category_id:
+            self.current_category = category
+
+    def category_position(self, name: str) -> int:
+        """Row at which a category of this name goes: the list is sorted by name."""
+        row = 0
+        while row < self.category_list.count() and self.category_list.item(row).data(Qt.UserRole).name < name:
+            row += 1
+        return row
+
+    def apply_category_change(self, category_id: int, name: Optional[str]):
+        """Adds, renames or removes one category in the list and in the 'move to' combo."""
+        from models import CategorySummary
+        item = self.find_category_item(category_id)
+        combo_index = self.move_category_combo.findData(category_id)
+        if name is None: # Deleted; selecting the next one loads its notes
+            if item is not None:
+                self.category_list.takeItem(self.category_list.row(item))
+            if combo_index >= 0:
+                self.move_category_combo.removeItem(combo_index)
+            return
+        if item is None:
+            item = QListWidgetItem()
+            self.show_category_item(item, CategorySummary(category_id, name, 0, None))
+            row = self.category_position(name)
+            self.category_list.insertItem(row, item)
+            self.move_category_combo.insertItem(row, name, category_id)
+            return
+        category = replace(item.data(Qt.UserRole), name=name)
+        # Move it to its sorted place without selecting anything on the way
+        is_current = item is self.category_list.currentItem()
+        combo_selected = self.move_category_combo.currentData()
+        self.category_list.blockSignals(True)
+        self.category_list.takeItem(self.category_list.row(item))
+        self.show_category_item(item, category)
+        row = self.category_position(name)
+        self.category_list.insertItem(row, item)
+        if is_current:
+            self.category_list.setCurrentItem(item)
+        self.category_list.blockSignals(False)
+        self.move_category_combo.removeItem(combo_index)
+        self.move_category_combo.insertItem(row, name, category_id)
+        self.move_category_combo.setCurrentIndex(self.move_category_combo.findData(combo_selected)
+                                                 if combo_selected is not None else -1)
+        if is_current:
+            self.current_category = category
+            self.notes_list_label.setText(f'笔记列表 ({name})')
+        self.note_model.rename_category(category_id, name) # Global search rows show it
+
     def category_selected(self, current_item: QListWidgetItem, previous_item: QListWidgetItem = None):
         """Handles selection of a category. Clears global search if active."""
         # If a category is selected manually, clear global search
@@ -313,52 +553,31 @@ class NoteApp(QMainWindow):
         if ok and name:
             if not self.note_manager.add_category(name):
                 QMessageBox.warning(self, '错误', f'分类 "{name}" 已存在或添加失败。')
-            else:
-                self.load_categories() # Refresh list
 
     def rename_category(self):
         """Renames the selected category."""
         selected_item = self.category_list.currentItem()
         if not selected_item: return
         
-        category: Category = selected_item.data(Qt.UserRole)
+        category: CategorySummary = selected_item.data(Qt.UserRole)
         new_name, ok = QInputDialog.getText(self, '重命名分类', '请输入新的分类名称:', QLineEdit.Normal, category.name)
         
         if ok and new_name and new_name != category.name:
             if not self.note_manager.update_category_name(category.id, new_name):
                 QMessageBox.warning(self, '错误', f'无法重命名为 "{new_name}"，可能名称已存在。')
-            else:
-                # Refresh lists
-                current_cat_id = category.id
-                self.load_categories()
-                # Reselect the renamed category
-                for i in range(self.category_list.count()):
-                    item = self.category_list.item(i)
-                    if item.data(Qt.UserRole).id == current_cat_id:
-                        self.category_list.setCurrentItem(item)
-                        break
 
     def delete_category(self):
         """Deletes the selected category and its notes."""
         selected_item = self.category_list.currentItem()
         if not selected_item: return
 
-        category: Category = selected_item.data(Qt.UserRole)
+        category: CategorySummary = selected_item.data(Qt.UserRole)
         reply = QMessageBox.question(self, '确认删除', 
                                    f'确定要删除分类 "{category.name}" 及其所有笔记吗？此操作无法撤销。',
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            if self.note_manager.delete_category(category.id):
-                self.load_categories() # Refresh category list
-                # If no categories left, UI should reflect that
-                if self.category_list.count() == 0:
-                     self.current_category = None
-                     self.clear_note_list()
-                     self.new_note_btn.setEnabled(False)
-                     self.clear_editor()
-                     self.set_editor_enabled(False)
-            else:
+            if not self.note_manager.delete_category(category.id):
                 QMessageBox.warning(self, '错误', '删除分类失败。')
 
     def show_category_context_menu(self, position):
@@ -381,25 +600,38 @@ class NoteApp(QMainWindow):
     # --- Note Methods ---    
     def load_notes_for_category(self, category_id: int):
         """Loads notes for the selected category."""
-        self.clear_note_list()
+        self.search_scheduler.cancel() # Results for the previous view are stale
         self.current_note = None # Deselect note when category changes
-        notes = self.note_manager.get_notes_by_category(category_id)
-        for note in notes:
-            item = QListWidgetItem(note.title)
-            item.setData(Qt.UserRole, note) # Store note object
-            self.note_list.addItem(item)
-        self.search_notes() # Apply search filter if any
-
-    def note_selected(self, current_item: QListWidgetItem, previous_item: QListWidgetItem = None):
+        # Only the first page is queried now; the rest loads as the list scrolls
+        self.note_model.set_source(
+            lambda cursor, limit: self.note_manager.get_note_summaries_page(category_id, cursor, limit))
+        if self.search_input.text().strip():
+            # Apply search filter if any
+            from search_worker import SearchRequest
+            self.search_scheduler.run_now(
+                SearchRequest(self.search_input.text().strip(), category_id))
+
+    def note_selected(self, current: QModelIndex, previous: QModelIndex = None):
         """Handles selection of a note from either category view or global search."""
+        note = None
+        if current.isValid():
+            # The list only holds summaries; load the full note on demand
+            note = self.note_manager.find_note_by_id(self.note_model.summary(current.row()).id)
+        self.show_note(note)
+
+    def show_note(self, note: "Optional[NoteDetail]"):
+        """Loads a note into the editor, with its edits that are not saved yet; None empties it."""
         self.clear_editor()
-        if current_item:
-            self.current_note = current_item.data(Qt.UserRole)
-            self.title_input.setText(self.current_note.title)
-            self.content_input.setText(self.current_note.content)
+        if note:
+            self.current_note = note
+            self.editor_note_id = note.id
+            pending = self.autosaver.pending_edit(note.id) # Edited but not written yet
+            self.title_input.setText(pending.title if pending else self.current_note.title)
+            self.content_input.setText(pending.content if pending else self.current_note.content)
+            self.mark_editor_clean()
             
             # Find the correct category in the 'move to' combo
-            cat_id_to_select = self.current_note.category_id
+            cat_id_to_select = pending.category_id if pending and pending.category_id else self.current_note.category_id
             index = self.move_category_combo.findData(cat_id_to_select)
             if index >= 0:
                 self.move_category_combo.setCurrentIndex(index)
@@ -413,14 +645,54 @@ class NoteApp(QMainWindow):
             self.current_note = None
             self.set_editor_enabled(False)
 
+    def show_quick_switcher(self):
+        """Ctrl+P: opens a note picked by its title."""
+        if self.note_manager is None:
+            return # Still opening the database
+        from quick_switcher import QuickSwitcher
+        dialog = QuickSwitcher(self.note_manager.get_title_index(), self)
+        if dialog.exec_() == QDialog.Accepted and dialog.selected_note_id is not None:
+            self.open_note(dialog.selected_note_id)
+
+    def open_note(self, note_id: int):
+        """Shows a note in its category's list and in the editor."""
+        note = self.note_manager.find_note_by_id(note_id)
+        if note is None:
+            self.statusBar().showMessage('这条笔记已被删除', 5000)
+            return
+        if self.global_search_input.text():
+            self.clear_global_search()
+        self.search_input.blockSignals(True) # The note may not match the category filter
+        self.search_input.clear()
+        self.search_input.blockSignals(False)
+        for i in range(self.category_list.count()):
+            item = self.category_list.item(i)
+            if item.data(Qt.UserRole).id == note.category_id:
+                if item is self.category_list.currentItem():
+                    self.category_selected(item) # Reloads the unfiltered list
+                else:
+                    self.category_list.setCurrentItem(item)
+                break
+        row = self.note_model.row_for_note(note_id)
+        if row >= 0:
+            index = self.note_model.index(row)
+            self.note_list.setCurrentIndex(index) # Loads it into the editor
+            self.note_list.scrollTo(index)
+        else:
+            # Older than the pages loaded so far: edit it without a row to highlight
+            self.note_list.clearSelection()
+            self.show_note(note)
+        self.content_input.setFocus()
+
     def new_note(self):
         """Clears the editor to start a new note in the current category."""
         if not self.current_category:
              QMessageBox.warning(self, '提示', '请先选择一个分类。')
              return
         self.note_list.clearSelection() # Deselect any current note
+        self.clear_editor() # Stages the previous note's changes
         self.current_note = None 
-        self.clear_editor()
+        self.editor_is_new = True
         self.set_editor_enabled(True)
         self.title_input.setFocus()
         # Set move combo to current category for new note
@@ -429,53 +701,112 @@ class NoteApp(QMainWindow):
              self.move_category_combo.setCurrentIndex(index)
 
     def save_note(self):
-        """Saves the current note (new or existing)."""
+        """Saves the editor right away instead of waiting for the autosave timer."""
+        self.save_editor_changes(show_new=True)
+        self.autosaver.flush()
+
+    def move_note(self):
+        """Moves the note to the category picked in the 'move to' combo."""
+        if self.editor_note_id is None:
+            return # A new note is created in the picked category
+        self.save_editor_changes(force=True)
+        if not self.autosaver.flush_blocking():
+            return
+        moved_away = (self.current_category is not None and not self.global_search_input.text()
+                      and self.move_category_combo.currentData() != self.current_category.id)
+        if moved_away: # Its row is gone from the list
+            self.clear_editor()
+            self.set_editor_enabled(False)
+
+    def show_history(self):
+        """Shows the current note's revisions and restores the one picked."""
+        note_id = self.editor_note_id
+        if note_id is None:
+            return
+        # The history should end with what the editor shows
+        self.save_editor_changes()
+        if not self.autosaver.flush_blocking():
+            QMessageBox.warning(self, '错误', '保存当前修改失败，无法查看历史版本。')
+            return
+        from history_dialog import HistoryDialog
+        dialog = HistoryDialog(self.note_manager, note_id, self)
+        if dialog.exec_() != QDialog.Accepted or dialog.selected_revision is None:
+            return
+        if not self.note_manager.restore_revision(note_id, dialog.selected_revision):
+            QMessageBox.warning(self, '错误', '恢复历史版本失败。')
+            return
+        note = self.note_manager.find_note_by_id(note_id)
+        if self.editor_note_id == note_id and note:
+            self.title_input.setText(note.title)
+            self.content_input.setPlainText(note.content)
+            self.mark_editor_clean()
+        self.statusBar().showMessage(f'已恢复到版本 #{dialog.selected_revision}', 5000)
+
+    # --- Autosave ---
+    def editor_has_changes(self) -> bool:
+        return self.title_input.isModified() or self.content_input.document().isModified()
+
+    def mark_editor_clean(self):
+        self.title_input.setModified(False)
+        self.content_input.document().setModified(False)
+
+    def editor_changed(self):
+        """Schedules an autosave when the user edits the title or content."""
+        if (self.editor_note_id is not None or self.editor_is_new) and self.editor_has_changes():
+            self.autosaver.touch()
+
+    def save_editor_changes(self, force: bool = False, show_new: bool = False):
+        """Stages the editor's unsaved changes for the next autosave flush.
+
+        A new note is inserted right away, since its later edits need its id;
+        with show_new it is also added to the list and selected."""
+        from autosave import FAILED, SAVED
+        from note_manager import NoteEdit
+
+        if self.editor_note_id is None and not self.editor_is_new:
+            return
+        if not (force or self.editor_has_changes()):
+            return
         title = self.title_input.text().strip()
+        if not title:
+            self.show_save_state(FAILED, '笔记标题不能为空')
+            return
         content = self.content_input.toPlainText() # Keep leading/trailing whitespace in content
-        category_id_to_save = self.move_category_combo.currentData() # Get ID from combo
+        category_id = self.move_category_combo.currentData() # Get ID from combo
+        self.mark_editor_clean()
 
-        if not title:
-            QMessageBox.warning(self, '警告', '笔记标题不能为空。')
+        if self.editor_note_id is not None:
+            self.autosaver.stage(NoteEdit(self.editor_note_id, title, content, category_id))
+            row = self.note_model.row_for_note(self.editor_note_id)
+            if row >= 0:
+                self.note_model.set_title(row, title)
             return
-        if category_id_to_save is None: # Should not happen if UI logic is correct
-             QMessageBox.critical(self, '错误', '无法确定要保存到的分类。')
-             return
 
-        if self.current_note: # Update existing note
-            success = self.note_manager.update_note(
-                self.current_note.id, title, content, category_id_to_save
-            )
-            if success:
-                 QMessageBox.information(self, '成功', '笔记已更新。')
-                 # Refresh if category changed or title changed
-                 if category_id_to_save != self.current_category.id:
-                      self.load_notes_for_category(self.current_category.id)
-                      self.clear_editor()
-                      self.set_editor_enabled(False)
-                 else:
-                      self.current_note.title = title # Update title in list item too if possible
-                      self.note_list.currentItem().setText(title)
-            else:
-                 QMessageBox.warning(self, '错误', '更新笔记失败。')
-        else: # Add new note
-            new_note = self.note_manager.add_note(title, content, category_id_to_save)
-            if new_note:
-                QMessageBox.information(self, '成功', '笔记已添加。')
-                # If added to current category, refresh list and select it
-                if category_id_to_save == self.current_category.id:
-                     self.load_notes_for_category(self.current_category.id)
-                     # Find and select the newly added note
-                     for i in range(self.note_list.count()):
-                          item = self.note_list.item(i)
-                          if item.data(Qt.UserRole).id == new_note.id:
-                               self.note_list.setCurrentItem(item)
-                               break
-                else: # If added to different category via combo, just clear editor
-                    self.clear_editor()
-                    self.set_editor_enabled(False)
-                    
-            else:
-                QMessageBox.warning(self, '错误', '添加笔记失败。')
+        if category_id is None and self.current_category:
+            category_id = self.current_category.id
+        note = self.note_manager.add_note(title, content, category_id) if category_id else None
+        if not note:
+            self.show_save_state(FAILED, '添加笔记失败')
+            return
+        self.editor_is_new = False
+        self.editor_note_id = note.id
+        self.current_note = note
+        self.set_editor_enabled(True) # Delete and move apply to it now
+        self.show_save_state(SAVED, '')
+        row = self.note_model.row_for_note(note.id) # Added to the list by apply_change()
+        if show_new and row >= 0:
+            # Select it without reloading the editor the user is typing in
+            selection = self.note_list.selectionModel()
+            selection.blockSignals(True)
+            self.note_list.setCurrentIndex(self.note_model.index(row))
+            selection.blockSignals(False)
+
+    def show_save_state(self, state: str, message: str = ''):
+        """Shows the autosave state in the status bar."""
+        from autosave import DIRTY, SAVING, SAVED, FAILED
+        texts = {DIRTY: '有未保存的更改', SAVING: '正在保存...', SAVED: '已自动保存',
+                 FAILED: f'保存失败：{message}'}
+        self.save_status_label.setText(texts[state])
 
     def delete_note(self):
         """Deletes the selected note."""
@@ -484,19 +815,83 @@ class NoteApp(QMainWindow):
             return
 
         reply = QMessageBox.question(self, '确认删除', 
-                                   f'确定要删除笔记 "{self.current_note.title}" 吗？',
+                                   f'确定要删除笔记 "{self.title_input.text().strip() or self.current_note.title}" 吗？',
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         
         if reply == QMessageBox.Yes:
+            # Don't autosave the note that is being deleted
+            self.autosaver.discard(self.current_note.id)
+            self.mark_editor_clean()
             if self.note_manager.delete_note(self.current_note.id):
                 QMessageBox.information(self, '成功', '笔记已删除。')
-                # Refresh note list for the current category
-                self.load_notes_for_category(self.current_category.id) 
                 self.clear_editor()
                 self.set_editor_enabled(False)
             else:
                 QMessageBox.warning(self, '错误', '删除笔记失败。')
 
+    # --- Bulk Actions ---
+    def selected_note_ids(self) -> list:
+        """Ids of the selected rows, top to bottom."""
+        rows = sorted(index.row() for index in self.note_list.selectionModel().selectedRows())
+        return [self.note_model.summary(row).id for row in rows]
+
+    def show_note_context_menu(self, position):
+        """Shows the bulk actions for the selected notes."""
+        note_ids = self.selected_note_ids()
+        if not note_ids:
+            return
+
+        menu = QMenu()
+        move_menu = menu.addMenu(f"移动 {len(note_ids)} 条笔记到")
+        for i in range(self.category_list.count()):
+            category = self.category_list.item(i).data(Qt.UserRole)
+            action = move_menu.addAction(category.name)
+            action.triggered.connect(lambda checked, category_id=category.id: self.move_selected_notes(category_id))
+        delete_action = menu.addAction(f"删除 {len(note_ids)} 条笔记")
+        delete_action.triggered.connect(self.delete_selected_notes)
+
+        menu.exec_(self.note_list.viewport().mapToGlobal(position))
+
+    def move_selected_notes(self, category_id: int):
+        """Moves the selected notes into a category, in one transaction."""
+        note_ids = self.selected_note_ids()
+        if not note_ids:
+            return
+        # Staged edits name the category they were made in: write them first,
+        # or their autosave would move the notes back
+        self.save_editor_changes()
+        if not self.autosaver.flush_blocking():
+            QMessageBox.warning(self, '错误', '保存当前修改失败，未移动笔记。')
+            return
+        moved = self.note_manager.bulk_move_notes(note_ids, category_id)
+        if moved < 0:
+            QMessageBox.warning(self, '错误', '目标分类不存在。')
+        else:
+            self.statusBar().showMessage(f'已移动 {moved} 条笔记', 5000)
+
+    def delete_selected_notes(self):
+        """Deletes the selected notes, in one transaction."""
+        note_ids = self.selected_note_ids()
+        if not note_ids:
+            return
+        reply = QMessageBox.question(self, '确认删除',
+                                   f'确定要删除所选的 {len(note_ids)} 条笔记吗？此操作无法撤销。',
+                                   QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        # Don't autosave notes that are being deleted
+        for note_id in note_ids:
+            self.autosaver.discard(note_id)
+        editor_deleted = self.editor_note_id in note_ids
+        if editor_deleted:
+            self.mark_editor_clean()
+        deleted = self.note_manager.bulk_delete_notes(note_ids)
+        if editor_deleted: # Its row is gone; it may also have been open without one
+            self.current_note = None
+            self.clear_editor()
+            self.set_editor_enabled(False)
+        self.statusBar().showMessage(f'已删除 {deleted} 条笔记', 5000)
+
     def search_notes(self):
         """Filters the notes list based on search input *within the current category*."""
         # This function should only be active when NOT in global search mode
@@ -504,28 +899,113 @@ class NoteApp(QMainWindow):
              return 
         
         keyword = self.search_input.text().strip()
-        self.clear_note_list()
         
-        # Use the category-specific search
-        notes = self.note_manager.search_notes(keyword, self.current_category.id)
-        for note in notes:
-            item = QListWidgetItem(note.title) # Only title needed here
-            item.setData(Qt.UserRole, note)
-            self.note_list.addItem(item)
+        # Use the category-specific search, debounced on the worker thread
+        from search_worker import SearchRequest
+        self.search_scheduler.schedule(SearchRequest(keyword, self.current_category.id))
             
+        self.note_list.clearSelection()
         self.current_note = None # Deselect note after search
         self.clear_editor()
         self.set_editor_enabled(False)
 
+    # --- Import / Export ---
+    def run_background_task(self, job, on_finished, on_failed, on_progress=None):
+        """Runs job(manager, report_progress) on a worker thread."""
+        from gui_tasks import BackgroundTask, start_task
+        task = BackgroundTask(job)
+        self.background_tasks.add(task)
+        if on_progress:
+            task.signals.progress.connect(on_progress)
+        task.signals.finished.connect(lambda result: (self.background_tasks.discard(task), on_finished(result)))
+        task.signals.failed.connect(lambda message: (self.background_tasks.discard(task), on_failed(message)))
+        start_task(task)
+
+    def import_notes(self, fmt: str):
+        """Imports a Markdown folder, JSONL or CSV file in the background."""
+        from importers import read_records
+        if fmt == "markdown":
+            path = QFileDialog.getExistingDirectory(self, '选择 Markdown 文件夹')
+        else:
+            path, _ = QFileDialog.getOpenFileName(self, '选择导入文件', '', f'{fmt.upper()} (*.{fmt})')
+        if not path:
+            return
+        for action in self.import_actions:
+            action.setEnabled(False)
+        self.statusBar().showMessage('正在导入...')
+
+        def finished(result):
+            for action in self.import_actions:
+                action.setEnabled(True)
+            self.statusBar().showMessage(f'导入完成：{result.imported} 条笔记', 5000)
+            self.note_manager.clear_cache() # Imported through another session: reloads the lists
+            QMessageBox.information(self, '导入完成',
+                                    f'已导入 {result.imported} 条笔记，新建 {result.categories_created} 个分类，'
+                                    f'跳过 {result.skipped} 条无标题记录。')
+
+        def failed(message):
+            for action in self.import_actions:
+                action.setEnabled(True)
+            self.statusBar().clearMessage()
+            self.note_manager.clear_cache() # Earlier batches are committed
+            QMessageBox.warning(self, '错误', f'导入失败：{message}')
+
+        self.run_background_task(
+            lambda manager, progress: manager.bulk_import(read_records(path, fmt), progress=progress),
+            finished, failed,
+            on_progress=lambda count: self.statusBar().showMessage(f'正在导入... 已导入 {count} 条'))
+
+    def export_notes(self, fmt: str, compress: bool = False):
+        """Exports all notes in the background without loading them into memory."""
+        from exporters import export_notes
+        if fmt == "markdown":
+            path = QFileDialog.getExistingDirectory(self, '选择导出文件夹')
+        elif fmt == "jsonl":
+            suffix = 'jsonl.gz' if compress else 'jsonl'
+            path, _ = QFileDialog.getSaveFileName(self, '导出为', f'notes.{suffix}', f'JSONL (*.{suffix})')
+        else:
+            path, _ = QFileDialog.getSaveFileName(self, '导出数据库快照', 'notes-backup.db', 'SQLite (*.db)')
+        if not path:
+            return
+        for action in self.import_actions:
+            action.setEnabled(False)
+        self.statusBar().showMessage('正在导出...')
+
+        def finished(count):
+            for action in self.import_actions:
+                action.setEnabled(True)
+            message = f'已导出 {count} 条笔记' if count is not None else '数据库快照已保存'
+            self.statusBar().showMessage(f'导出完成：{message}', 5000)
+
+        def failed(message):
+            for action in self.import_actions:
+                action.setEnabled(True)
+            self.statusBar().clearMessage()
+            QMessageBox.warning(self, '错误', f'导出失败：{message}')
+
+        self.run_background_task(
+            lambda manager, progress: export_notes(manager, path, fmt, compress, progress),
+            finished, failed,
+            on_progress=lambda count: self.statusBar().showMessage(f'正在导出... 已导出 {count} 条'))
+
+    def show_diagnostics(self):
+        """Shows method and query latency histograms."""
+        from diagnostics_dialog import DiagnosticsDialog
+        DiagnosticsDialog(self, cache_stats=self.note_manager.cache_stats).exec_()
+
     # --- UI Utility Methods ---    
     def clear_editor(self):
-        """Clears the title and content fields."""
+        """Clears the title and content fields, staging unsaved changes first."""
+        self.save_editor_changes()
+        self.editor_note_id = None
+        self.editor_is_new = False
         self.title_input.clear()
         self.content_input.clear()
+        self.mark_editor_clean()
         self.move_category_combo.setCurrentIndex(-1) # Reset combo
 
     def clear_note_list(self):
-         self.note_list.clear()
+         self.note_model.clear()
 
     def set_editor_enabled(self, enabled: bool):
         """Enables or disables editor fields and buttons."""
@@ -533,14 +1013,32 @@ class NoteApp(QMainWindow):
         self.content_input.setEnabled(enabled)
         self.save_button.setEnabled(enabled)
         self.delete_button.setEnabled(enabled and self.current_note is not None)
+        self.history_button.setEnabled(enabled and self.current_note is not None)
         self.move_category_combo.setEnabled(enabled and self.current_note is not None)
 
+    def closeEvent(self, event):
+        """Writes unsaved edits and stops background searches before the window goes away."""
+        if self.autosaver is None: # Closed before the database was opened
+            super().closeEvent(event)
+            return
+        if not self.autosaver.flush_blocking():
+            reply = QMessageBox.question(self, '保存失败', '部分笔记未能保存，仍要退出吗？',
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                event.ignore()
+                return
+        self.search_scheduler.shutdown()
+        super().closeEvent(event)
+
 def main():
     app = QApplication(sys.argv)
     # Apply a style (optional, Fusion usually looks good cross-platform)
     # app.setStyle(QStyleFactory.create('Fusion')) 
     window = NoteApp()
     window.show()
+    app.processEvents() # Paint the window before the database is opened
+    bootstrap.profile.milestone('first window')
+    QTimer.singleShot(0, window.open_database)
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
@@ -0,0 +1,45 @@
+"""Long-running NoteManager jobs (import, export, ...) off the Qt main thread."""
+from typing import Optional
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from models import ScopedSession
+from note_manager import NoteManager
+
+
+class TaskSignals(QObject):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object) # the job's return value
+    failed = pyqtSignal(str)
+
+
+class BackgroundTask(QRunnable):
+    """Runs job(manager, report_progress) on a worker thread.
+
+    The job gets a NoteManager over its own thread-local session. Connect to
+    task.signals before starting the task; the slots run on the GUI thread."""
+
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.signals = TaskSignals()
+        # True or False once run; for a caller that waits on the pool and
+        # cannot wait for the (queued) signals as well
+        self.succeeded: Optional[bool] = None
+
+    def run(self):
+        manager = NoteManager(ScopedSession)
+        try:
+            result = self.job(manager, self.signals.progress.emit)
+        except Exception as e:
+            self.succeeded = False
+            self.signals.failed.emit(str(e))
+        else:
+            self.succeeded = True
+            self.signals.finished.emit(result)
+        finally:
+            ScopedSession.remove()
+
+
+def start_task(task: BackgroundTask):
+    QThreadPool.globalInstance().start(task)
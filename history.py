@@ -0,0 +1,76 @@
+"""Line deltas and settings for note revision history.
+
+Every change of a note's title or body is stored as a row of
+note_revisions. Most rows hold a line delta against the previous revision;
+every `snapshot_interval`-th revision holds the full text instead, so
+rebuilding any revision applies at most snapshot_interval - 1 deltas.
+
+A delta is a JSON list of operations applied in order to the lines of the
+base text (split with keepends): [start, end] copies base lines start..end,
+a string inserts that text. Lines not copied are deleted.
+
+Settings ([history] section of noteapp.ini):
+    snapshot_interval  full text every N revisions (default 20)
+    max_revisions      revisions kept per note (default 100)
+    merge_seconds      a change within this many seconds of the previous
+                       one replaces it instead of adding a revision, so
+                       autosave bursts make one revision (default 60)
+"""
+import difflib
+import json
+from typing import List, NamedTuple, Union
+
+from storage import read_config_section
+
+Delta = List[Union[List[int], str]]
+
+
+class HistorySettings(NamedTuple):
+    snapshot_interval: int = 20
+    max_revisions: int = 100
+    merge_seconds: int = 60
+
+
+def load_settings(config_file: str = None) -> HistorySettings:
+    section = read_config_section('history', config_file)
+    settings = HistorySettings(**{name: int(section[name]) for name in HistorySettings._fields
+                                  if name in section})
+    if settings.snapshot_interval < 1 or settings.max_revisions < 1:
+        raise ValueError("snapshot_interval and max_revisions must be at least 1")
+    return settings
+
+
+settings = load_settings()
+
+
+def make_delta(base: str, new: str) -> Delta:
+    """Operations that turn base into new, copying unchanged line runs."""
+    base_lines = base.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops: Delta = []
+    matcher = difflib.SequenceMatcher(None, base_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1: # replace or insert
+            ops.append("".join(new_lines[j1:j2]))
+    return ops
+
+
+def apply_delta(base: str, ops: Delta) -> str:
+    base_lines = base.splitlines(keepends=True)
+    out = []
+    for op in ops:
+        if isinstance(op, str):
+            out.append(op)
+        else:
+            out.extend(base_lines[op[0]:op[1]])
+    return "".join(out)
+
+
+def encode_delta(ops: Delta) -> str:
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_delta(data: str) -> Delta:
+    return json.loads(data)
@@ -0,0 +1,77 @@
+"""History dialog: revisions of one note, with a preview and restore."""
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem,
+                             QPlainTextEdit, QPushButton, QLabel, QSplitter, QWidget)
+
+
+class HistoryDialog(QDialog):
+    """Lists a note's revisions; accepting sets selected_revision."""
+
+    def __init__(self, manager, note_id: int, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.note_id = note_id
+        self.selected_revision = None
+        self.setWindowTitle('历史版本')
+        self.resize(1100, 700)
+
+        layout = QVBoxLayout(self)
+        splitter = QSplitter(Qt.Horizontal)
+        self.revision_list = QListWidget()
+        self.revision_list.currentItemChanged.connect(self.show_revision)
+        splitter.addWidget(self.revision_list)
+
+        preview_panel = QWidget()
+        preview_layout = QVBoxLayout(preview_panel)
+        preview_layout.setContentsMargins(0, 0, 0, 0)
+        self.title_label = QLabel()
+        self.preview = QPlainTextEdit()
+        self.preview.setReadOnly(True)
+        preview_layout.addWidget(self.title_label)
+        preview_layout.addWidget(self.preview)
+        splitter.addWidget(preview_panel)
+        splitter.setSizes([350, 750])
+        layout.addWidget(splitter)
+
+        button_layout = QHBoxLayout()
+        self.restore_btn = QPushButton("恢复此版本")
+        self.restore_btn.setEnabled(False)
+        self.restore_btn.clicked.connect(self.restore)
+        close_btn = QPushButton("关闭")
+        close_btn.setObjectName("secondaryButton")
+        close_btn.clicked.connect(self.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(self.restore_btn)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.load_history()
+
+    def load_history(self):
+        revisions = self.manager.get_history(self.note_id)
+        for info in revisions:
+            item = QListWidgetItem(f"#{info.revision}  {info.created_at:%Y-%m-%d %H:%M}  {info.title}")
+            item.setData(Qt.UserRole, info.revision)
+            self.revision_list.addItem(item)
+        if revisions:
+            self.revision_list.setCurrentRow(0)
+        else:
+            self.title_label.setText('这条笔记还没有历史版本（首次修改后开始记录）。')
+
+    def show_revision(self, current: QListWidgetItem, previous: QListWidgetItem = None):
+        if current is None:
+            return
+        revision = self.manager.get_revision(self.note_id, current.data(Qt.UserRole))
+        if revision is None:
+            return
+        title, content = revision
+        self.title_label.setText(f'标题：{title}')
+        self.preview.setPlainText(content)
+        # The newest revision is the note as it is now
+        self.restore_btn.setEnabled(self.revision_list.row(current) > 0)
+
+    def restore(self):
+        item = self.revision_list.currentItem()
+        if item is not None:
+            self.selected_revision = item.data(Qt.UserRole)
+            self.accept()
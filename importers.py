@@ -0,0 +1,108 @@
+"""Streaming readers that turn note archives into import records.
+
+Each reader is a generator yielding dicts with the keys understood by
+NoteManager.bulk_import: title, content, category and optionally
+created_at / updated_at (ISO 8601 strings or datetimes). Files are read one
+record at a time, so memory use does not depend on the size of the archive.
+"""
+import csv
+import json
+import os
+from typing import Dict, Iterator, Optional
+
+DEFAULT_CATEGORY = "Uncategorized"
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+
+Record = Dict[str, object]
+
+
+def read_markdown_dir(root: str, default_category: str = DEFAULT_CATEGORY) -> Iterator[Record]:
+    """Yields one record per Markdown file under root.
+
+    The first-level sub-directory becomes the category (files directly in
+    root go to default_category). The title is the first '# ' heading, or
+    the file name if there is none."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        relative = os.path.relpath(dirpath, root)
+        category = default_category if relative == '.' else relative.split(os.sep)[0]
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(MARKDOWN_SUFFIXES):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, encoding='utf-8', errors='replace') as f:
+                content = f.read()
+            yield {
+                'title': _markdown_title(content) or os.path.splitext(filename)[0],
+                'content': content,
+                'category': category,
+            }
+
+
+def _markdown_title(content: str) -> Optional[str]:
+    for line in content.splitlines():
+        if line.startswith('# '):
+            return line[2:].strip()
+        if line.strip():
+            return None # Only a heading at the top counts as the title
+    return None
+
+
+def read_jsonl(path: str, default_category: str = DEFAULT_CATEGORY) -> Iterator[Record]:
+    """Yields one record per non-empty line of a JSON Lines file.
+
+    A line that is not a JSON object raises ValueError naming the line."""
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON: {e}") from e
+            if not isinstance(record, dict):
+                raise ValueError(f"{path}:{line_number}: expected a JSON object, "
+                                 f"got {type(record).__name__}")
+            record['category'] = record.get('category') or default_category
+            yield record
+
+
+def read_csv(path: str, default_category: str = DEFAULT_CATEGORY) -> Iterator[Record]:
+    """Yields one record per row of a CSV file with a header row.
+
+    Expected columns: title, content, and optionally category, created_at,
+    updated_at."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            if not row.get('category'):
+                row['category'] = default_category
+            yield row
+
+
+READERS = {
+    'markdown': read_markdown_dir,
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+def detect_format(path: str) -> str:
+    """Guesses the import format from the path."""
+    if os.path.isdir(path):
+        return 'markdown'
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    raise ValueError(f"Cannot detect import format of {path}")
+
+
+def read_records(path: str, fmt: Optional[str] = None,
+                 default_category: str = DEFAULT_CATEGORY) -> Iterator[Record]:
+    """Dispatches to the reader for fmt (detected from path if omitted)."""
+    fmt = fmt or detect_format(path)
+    if fmt not in READERS:
+        raise ValueError(f"Unknown import format: {fmt}")
+    return READERS[fmt](path, default_category)
@@ -0,0 +1,337 @@
+"""In-process latency histograms for NoteManager methods and SQL queries.
+
+install_query_listeners hooks SQLAlchemy's before/after_cursor_execute
+events on the engine; the @timed decorator wraps NoteManager methods. Both
+feed log-bucketed histograms kept in this module. Queries slower than the
+configured threshold are written, with their EXPLAIN QUERY PLAN, to the
+slow-query log. Query times cover execution up to the first row: SQLite
+does sorting and FTS ranking before that, but rows read by a streaming
+scan after it are only accounted for in the method timings.
+
+Histograms are merged into a stats file when a long-running process (the
+GUI, the interactive CLI, the server) exits, so that `python main.py stats`
+can show what a session spent its time on. One-off commands leave the file
+alone unless record_stats is set, so scripted calls do not rewrite it.
+
+Settings ([diagnostics] section of noteapp.ini, or environment):
+    slow_query_ms   NOTEAPP_SLOW_QUERY_MS   threshold in ms (default 100)
+    slow_query_log  NOTEAPP_SLOW_QUERY_LOG  log file (default slow_queries.log)
+    stats_file      NOTEAPP_STATS_FILE      stats file (default noteapp-stats.json)
+    record_stats    NOTEAPP_RECORD_STATS    save stats of every process (default no)
+Relative default file names are placed next to the database file.
+"""
+import atexit
+import bisect
+import configparser
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from storage import load_config, read_config_section
+
+# Bucket upper bounds in milliseconds; the last bucket is unbounded.
+BUCKET_BOUNDS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                    1000, 2500, 5000, 10000]
+MAX_QUERY_KEY_LENGTH = 300
+
+slow_query_logger = logging.getLogger('noteapp.slow_query')
+
+
+class Histogram:
+    """Fixed log-scale latency histogram; cheap to record and to merge."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def record(self, elapsed_ms: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile."""
+        count = self.count
+        if not count:
+            return 0.0
+        rank = pct / 100.0 * count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                bound = BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max_ms
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def merge(self, other: "Histogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def to_dict(self) -> dict:
+        return {'counts': self.counts, 'total_ms': self.total_ms, 'max_ms': self.max_ms}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls()
+        if len(data.get('counts', [])) == len(histogram.counts):
+            histogram.counts = list(data['counts'])
+            histogram.total_ms = data['total_ms']
+            histogram.max_ms = data['max_ms']
+        return histogram
+
+
+class Stats:
+    """Named histograms for methods and queries, safe to use from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.methods: Dict[str, Histogram] = {}
+        self.queries: Dict[str, Histogram] = {}
+
+    def record_method(self, name: str, elapsed_ms: float):
+        with self._lock:
+            self.methods.setdefault(name, Histogram()).record(elapsed_ms)
+
+    def record_query(self, statement: str, elapsed_ms: float):
+        with self._lock:
+            self.queries.setdefault(statement, Histogram()).record(elapsed_ms)
+
+    @property
+    def query_count(self) -> int:
+        with self._lock:
+            return sum(h.count for h in self.queries.values())
+
+    def reset(self):
+        with self._lock:
+            self.methods.clear()
+            self.queries.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'methods': {k: h.to_dict() for k, h in self.methods.items()},
+                'queries': {k: h.to_dict() for k, h in self.queries.items()},
+            }
+
+    def merge_dict(self, data: dict):
+        with self._lock:
+            for name, h in data.get('methods', {}).items():
+                self.methods.setdefault(name, Histogram()).merge(Histogram.from_dict(h))
+            for statement, h in data.get('queries', {}).items():
+                self.queries.setdefault(statement, Histogram()).merge(Histogram.from_dict(h))
+
+
+stats = Stats()
+
+
+class Settings:
+    def __init__(self):
+        section = read_config_section('diagnostics')
+        data_dir = os.path.dirname(os.path.abspath(load_config().path))
+        self.slow_query_ms = float(os.environ.get('NOTEAPP_SLOW_QUERY_MS')
+                                   or section.get('slow_query_ms', 100))
+        self.slow_query_log = (os.environ.get('NOTEAPP_SLOW_QUERY_LOG')
+                               or section.get('slow_query_log')
+                               or os.path.join(data_dir, 'slow_queries.log'))
+        self.stats_file = (os.environ.get('NOTEAPP_STATS_FILE')
+                           or section.get('stats_file')
+                           or os.path.join(data_dir, 'noteapp-stats.json'))
+        record = os.environ.get('NOTEAPP_RECORD_STATS') or section.get('record_stats', 'no')
+        self.record_stats = configparser.ConfigParser.BOOLEAN_STATES.get(record.strip().lower(), False)
+
+
+settings = Settings()
+
+
+# --- Method timing ---
+
+# Per thread: whether a timed call is in progress
+_timing = threading.local()
+
+
+def timed(func):
+    """Records the wall time of each call under 'Class.method'.
+
+    Only the outermost timed call of a thread is recorded: a method that
+    delegates to another (delete_note -> bulk_delete_notes) counts once,
+    under its own name."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_timing, 'active', False):
+            return func(*args, **kwargs)
+        _timing.active = True
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _timing.active = False
+            stats.record_method(name, (time.perf_counter() - start) * 1000)
+    return wrapper
+
+
+# --- Query timing ---
+
+def _query_key(statement: str) -> str:
+    return " ".join(statement.split())[:MAX_QUERY_KEY_LENGTH]
+
+
+def _explain(cursor, statement: str, parameters) -> str:
+    try:
+        rows = cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    except Exception as e:
+        return f"(EXPLAIN failed: {e})"
+    return "; ".join(str(row[-1]) for row in rows)
+
+
+def _configure_slow_query_log():
+    if slow_query_logger.handlers:
+        return
+    handler = logging.FileHandler(settings.slow_query_log, encoding='utf-8', delay=True)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    slow_query_logger.addHandler(handler)
+    slow_query_logger.setLevel(logging.WARNING)
+    slow_query_logger.propagate = False
+
+
+def install_query_listeners(engine):
+    """Times every statement run on engine and logs the slow ones."""
+    _configure_slow_query_log()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['query_start_time'].pop()) * 1000
+        stats.record_query(_query_key(statement), elapsed_ms)
+        if elapsed_ms >= settings.slow_query_ms:
+            plan = "(executemany)" if executemany else _explain(cursor, statement, parameters)
+            slow_query_logger.warning("%.1f ms | %s | params=%r | plan: %s",
+                                      elapsed_ms, " ".join(statement.split()),
+                                      parameters if not executemany else "...", plan)
+
+    @event.listens_for(engine, 'handle_error')
+    def _failed(exception_context):
+        # after_cursor_execute does not run for failed (e.g. interrupted) statements
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_start_time'):
+            conn.info['query_start_time'].pop()
+
+    if settings.record_stats:
+        save_stats_at_exit()
+
+
+_saving_at_exit = False
+
+
+def save_stats_at_exit():
+    """Has save_stats run when the process exits (once, however often called)."""
+    global _saving_at_exit
+    if not _saving_at_exit:
+        _saving_at_exit = True
+        atexit.register(save_stats)
+
+
+# --- Persisting and reporting ---
+
+def load_saved_stats(path: Optional[str] = None) -> Stats:
+    path = path or settings.stats_file
+    saved = Stats()
+    if os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                saved.merge_dict(json.load(f))
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            saved = Stats() # A corrupt stats file is not worth failing over
+    return saved
+
+
+def combined_stats(path: Optional[str] = None) -> Stats:
+    """Saved histograms from earlier runs plus those of this process."""
+    combined = load_saved_stats(path)
+    combined.merge_dict(stats.to_dict())
+    return combined
+
+
+def reset_stats(path: Optional[str] = None):
+    """Forgets the histograms of this process and of earlier runs."""
+    stats.reset()
+    path = path or settings.stats_file
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def save_stats(path: Optional[str] = None):
+    """Merges this process's histograms into the stats file.
+
+    The GUI, CLI and server may exit at the same time: the file is written
+    under a temporary name and renamed into place, so a reader sees either
+    the old or the new file, never a partly written one. (One of two
+    simultaneous merges may still be lost.)"""
+    path = path or settings.stats_file
+    if not stats.methods and not stats.queries:
+        return
+    merged = combined_stats(path)
+    try:
+        fd, temp_path = tempfile.mkstemp(prefix='.noteapp-stats-', suffix='.tmp',
+                                         dir=os.path.dirname(os.path.abspath(path)))
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(merged.to_dict(), f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return
+    stats.reset() # Already persisted; avoid counting twice on a later save
+
+
+def report_rows(histograms: Dict[str, Histogram], top: Optional[int] = None) -> List[dict]:
+    """One row per histogram, most total time first."""
+    rows = [{
+        'name': name,
+        'count': h.count,
+        'total_ms': h.total_ms,
+        'mean_ms': h.total_ms / h.count if h.count else 0.0,
+        'p50_ms': h.percentile(50),
+        'p95_ms': h.percentile(95),
+        'p99_ms': h.percentile(99),
+        'max_ms': h.max_ms,
+    } for name, h in histograms.items()]
+    rows.sort(key=lambda r: r['total_ms'], reverse=True)
+    return rows[:top] if top else rows
+
+
+def format_report(source: Stats, top: int = 20) -> str:
+    """Plain-text tables of method and query latencies."""
+    lines = []
+    for title, histograms in (("NoteManager methods", source.methods),
+                              ("SQL queries", source.queries)):
+        lines.append(f"== {title} ==")
+        lines.append(f"{'count':>8} {'total ms':>11} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>9}  name")
+        for r in report_rows(histograms, top):
+            lines.append(f"{r['count']:8d} {r['total_ms']:11.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} "
+                         f"{r['p99_ms']:8.2f} {r['max_ms']:9.2f}  {r['name']}")
+        lines.append("")
+    lines.append(f"Total queries: {sum(h.count for h in source.queries.values())}")
+    return "\n".join(lines)
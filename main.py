@@ -1,67 +1,381 @@
+import json
+import sys
+from typing import Optional
+
+import bootstrap
+
+# Before any other import, so that they all show up in the profile
+bootstrap.profile.configure(sys.argv)
+
 import typer
-from rich.console import Console
-from rich.prompt import Prompt
-from note_manager import NoteManager
-from ui import display_menu, display_notes
 
 app = typer.Typer()
-console = Console()
-note_manager = NoteManager()
+PAGE_SIZE = 50 # Notes per page in the interactive list
+_note_manager = None
+
+def get_note_manager():
+    """NoteManager of this process; the database is only opened on first use."""
+    global _note_manager
+    if _note_manager is None:
+        from note_manager import NoteManager
+        with bootstrap.profile.phase('open note manager'):
+            _note_manager = NoteManager()
+    return _note_manager
+
+def close_note_manager():
+    global _note_manager
+    _note_manager = None # Its sessions are closed after every call
+
+def get_console():
+    from ui import console # Rich is only imported by commands that print with it
+    return console
+
+@app.callback(invoke_without_command=True)
+def cli(
+    ctx: typer.Context,
+    startup_profile: bool = typer.Option(False, "--startup-profile",
+                                         help="打印启动耗时分析（各模块导入与初始化阶段）"),
+):
+    """笔记管理程序（不带子命令时进入交互模式）"""
+    # Callbacks run last-registered first: close the database, then report
+    ctx.call_on_close(lambda: bootstrap.profile.milestone('command finished', report=True))
+    ctx.call_on_close(close_note_manager)
+    if ctx.invoked_subcommand is None:
+        main()
+
+def run_command(op: str, as_json: bool, show, **args):
+    """Runs one operation (see operations.py); prints its result as JSON or with show()."""
+    from operations import OperationError, run_operation as run
+
+    try:
+        result = run(get_note_manager(), dict(args, op=op))
+    except OperationError as e:
+        typer.echo(f"错误：{e}", err=True)
+        raise typer.Exit(1)
+    if as_json:
+        typer.echo(json.dumps(result, ensure_ascii=False))
+    else:
+        show(result)
+    return result
+
+def read_content(content: Optional[str]) -> Optional[str]:
+    """"-" means the note body comes from standard input."""
+    return sys.stdin.read() if content == "-" else content
+
+def show_message(message: str):
+    return lambda result: get_console().print(f"[green]{message.format(**result)}[/green]")
+
+def show_notes(result: dict):
+    from ui import display_notes
+
+    display_notes(result["items"])
+    if result["next_cursor"]:
+        get_console().print(f"还有更多笔记，下一页：--cursor {result['next_cursor']}", markup=False)
+
+JSON_OPTION = typer.Option(False, "--json", help="以 JSON 输出结果（便于脚本处理）")
+CATEGORY_OPTION = typer.Option(None, "--category", help="分类名称")
+CATEGORY_ID_OPTION = typer.Option(None, "--category-id", help="分类 ID")
+CURSOR_OPTION = typer.Option(None, "--cursor", help="上一页输出的 next_cursor，从该处继续")
+LIMIT_OPTION = typer.Option(50, help="每页条数")
 
 @app.command()
 def main():
-    """笔记管理程序主入口"""
+    """笔记管理程序主入口（交互模式）"""
+    from rich.prompt import Confirm, Prompt
+    from operations import OperationError, run_operation as run
+    from serializers import summary_dict
+    from ui import display_menu, display_notes
+    import instrumentation
+
+    instrumentation.save_stats_at_exit() # A session worth keeping, unlike one-off commands
+    console = get_console()
     while True:
         display_menu()
+        bootstrap.profile.milestone('first prompt', report=True)
         choice = Prompt.ask("请选择操作", choices=["1", "2", "3", "4", "5", "6", "7"])
-        
-        if choice == "1":
-            title = Prompt.ask("请输入笔记标题")
-            content = Prompt.ask("请输入笔记内容")
-            note_manager.add_note(title, content)
-            console.print("[green]笔记添加成功！[/green]")
-            
-        elif choice == "2":
-            title = Prompt.ask("请输入要删除的笔记标题")
-            if note_manager.delete_note(title):
+        note_manager = get_note_manager() if choice != "7" else None
+
+        try:
+            if choice == "1":
+                title = Prompt.ask("请输入笔记标题")
+                content = Prompt.ask("请输入笔记内容")
+                category = Prompt.ask("请输入分类", default="Uncategorized")
+                note = run(note_manager, {"op": "add", "title": title, "content": content,
+                                          "category": category})
+                console.print(f"[green]笔记添加成功！（ID {note['id']}）[/green]")
+
+            elif choice == "2":
+                note_id = int(Prompt.ask("请输入要删除的笔记 ID"))
+                run(note_manager, {"op": "delete", "id": note_id})
                 console.print("[green]笔记删除成功！[/green]")
-            else:
-                console.print("[red]未找到该笔记！[/red]")
-                
-        elif choice == "3":
-            title = Prompt.ask("请输入要查找的笔记标题")
-            note = note_manager.find_note_by_title(title)
-            if note:
-                display_notes([note])
-            else:
-                console.print("[red]未找到该笔记！[/red]")
-                
-        elif choice == "4":
-            keyword = Prompt.ask("请输入要搜索的关键词")
-            notes = note_manager.search_notes(keyword)
-            if notes:
-                display_notes(notes)
-            else:
-                console.print("[red]未找到包含该关键词的笔记！[/red]")
-                
-        elif choice == "5":
-            title = Prompt.ask("请输入要修改的笔记标题")
-            new_content = Prompt.ask("请输入新的笔记内容")
-            if note_manager.update_note(title, new_content):
+
+            elif choice == "3":
+                title = Prompt.ask("请输入要查找的笔记标题")
+                notes = [summary_dict(s) for s in note_manager.search_note_summaries(title)
+                         if title.lower() in s.title.lower()]
+                if notes:
+                    display_notes(notes)
+                else:
+                    console.print("[red]未找到该笔记！[/red]")
+
+            elif choice == "4":
+                keyword = Prompt.ask("请输入要搜索的关键词")
+                notes = [summary_dict(s) for s in note_manager.search_note_summaries(keyword)]
+                if notes:
+                    display_notes(notes)
+                else:
+                    console.print("[red]未找到包含该关键词的笔记！[/red]")
+
+            elif choice == "5":
+                note_id = int(Prompt.ask("请输入要修改的笔记 ID"))
+                new_content = Prompt.ask("请输入新的笔记内容")
+                run(note_manager, {"op": "update", "id": note_id, "content": new_content})
                 console.print("[green]笔记修改成功！[/green]")
-            else:
-                console.print("[red]未找到该笔记！[/red]")
-                
-        elif choice == "6":
-            notes = note_manager.get_all_notes()
-            if notes:
-                display_notes(notes)
-            else:
-                console.print("[yellow]当前没有任何笔记！[/yellow]")
-                
-        elif choice == "7":
-            console.print("[yellow]感谢使用笔记管理程序，再见！[/yellow]")
-            break
+
+            elif choice == "6":
+                page = note_manager.get_note_summaries_page(limit=PAGE_SIZE)
+                if not page.items:
+                    console.print("[yellow]当前没有任何笔记！[/yellow]")
+                    continue
+                display_notes([summary_dict(s) for s in page.items])
+                while page.has_more and Confirm.ask("显示更多笔记？", default=True):
+                    page = note_manager.get_note_summaries_page(cursor=page.next_cursor, limit=PAGE_SIZE)
+                    display_notes([summary_dict(s) for s in page.items])
+
+            elif choice == "7":
+                console.print("[yellow]感谢使用笔记管理程序，再见！[/yellow]")
+                break
+        except ValueError:
+            console.print("[red]请输入数字 ID！[/red]")
+        except OperationError as e:
+            console.print(f"[red]{e}[/red]")
+
+@app.command("add")
+def add_command(
+    title: str = typer.Argument(..., help="笔记标题"),
+    content: str = typer.Option("", "--content", "-c", help="笔记正文；为 - 时从标准输入读取"),
+    category: Optional[str] = typer.Option(None, "--category", help="分类名称（不存在时自动创建），默认 Uncategorized"),
+    category_id: Optional[int] = CATEGORY_ID_OPTION,
+    as_json: bool = JSON_OPTION,
+):
+    """添加一条笔记"""
+    run_command("add", as_json, show_message("已添加笔记 #{id}"),
+                  title=title, content=read_content(content), category=category, category_id=category_id)
+
+@app.command("get")
+def get_command(
+    note_id: int = typer.Argument(..., help="笔记 ID"),
+    as_json: bool = JSON_OPTION,
+):
+    """显示一条笔记（含正文）"""
+    from ui import display_note
+    run_command("get", as_json, display_note, id=note_id)
+
+@app.command("update")
+def update_command(
+    note_id: int = typer.Argument(..., help="笔记 ID"),
+    title: Optional[str] = typer.Option(None, "--title", "-t", help="新标题"),
+    content: Optional[str] = typer.Option(None, "--content", "-c", help="新正文；为 - 时从标准输入读取"),
+    category: Optional[str] = CATEGORY_OPTION,
+    category_id: Optional[int] = CATEGORY_ID_OPTION,
+    as_json: bool = JSON_OPTION,
+):
+    """修改笔记（只修改给出的字段）"""
+    run_command("update", as_json, show_message("已修改笔记 #{id}"), id=note_id, title=title,
+                  content=read_content(content), category=category, category_id=category_id)
+
+@app.command("delete")
+def delete_command(
+    note_id: int = typer.Argument(..., help="笔记 ID"),
+    as_json: bool = JSON_OPTION,
+):
+    """删除一条笔记"""
+    run_command("delete", as_json, show_message("已删除笔记 #{id}"), id=note_id)
+
+@app.command("search")
+def search_command(
+    keyword: str = typer.Argument(..., help="关键词（匹配标题和正文）"),
+    category: Optional[str] = CATEGORY_OPTION,
+    category_id: Optional[int] = CATEGORY_ID_OPTION,
+    limit: int = LIMIT_OPTION,
+    cursor: Optional[str] = CURSOR_OPTION,
+    as_json: bool = JSON_OPTION,
+):
+    """搜索笔记（按修改时间从新到旧分页）"""
+    run_command("search", as_json, show_notes, query=keyword, category=category,
+                category_id=category_id, limit=limit, cursor=cursor)
+
+@app.command("list")
+def list_command(
+    category: Optional[str] = CATEGORY_OPTION,
+    category_id: Optional[int] = CATEGORY_ID_OPTION,
+    limit: int = LIMIT_OPTION,
+    cursor: Optional[str] = CURSOR_OPTION,
+    as_json: bool = JSON_OPTION,
+):
+    """列出笔记（按修改时间从新到旧分页）"""
+    run_command("list", as_json, show_notes, category=category, category_id=category_id,
+                limit=limit, cursor=cursor)
+
+@app.command("categories")
+def categories_command(as_json: bool = JSON_OPTION):
+    """列出所有分类"""
+    from ui import display_categories
+    run_command("categories", as_json, display_categories)
+
+@app.command("batch")
+def batch_command(
+    chunk_size: int = typer.Option(500, help="每个事务执行的操作数"),
+    keep_going: bool = typer.Option(False, "--keep-going", help="某批回滚后继续执行后面的操作"),
+):
+    """从标准输入逐行读取 JSON 操作（NDJSON）并执行，每行输出一条 JSON 结果
+
+    操作格式见 operations.py，例如 {"op": "add", "title": "...", "category": "Work"}。
+    每 chunk-size 条操作在一个事务中提交；单条操作失败不影响其他操作，
+    数据库错误会回滚整批。有操作失败时退出码为 1。"""
+    from operations import run_batch
+
+    total = failed = 0
+    for results in run_batch(get_note_manager(), sys.stdin, chunk_size, keep_going):
+        for result in results:
+            sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+        sys.stdout.flush() # Results of a chunk appear once it has committed
+        total += len(results)
+        failed += sum(1 for result in results if not result["ok"])
+    if failed:
+        typer.echo(f"{failed} / {total} 条操作失败", err=True)
+        raise typer.Exit(1)
+
+@app.command("import")
+def import_notes(
+    path: str = typer.Argument(..., help="Markdown 文件夹、JSONL 或 CSV 文件"),
+    format: Optional[str] = typer.Option(None, "--format", "-f", help="markdown / jsonl / csv，默认按路径判断"),
+    category: str = typer.Option("Uncategorized", help="记录未指定分类时使用的分类"),
+    batch_size: int = typer.Option(1000, help="每个事务插入的笔记数"),
+):
+    """批量导入笔记（流式读取，分批提交）"""
+    from importers import read_records
+
+    console = get_console()
+    try:
+        records = read_records(path, format, category)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+    try:
+        result = get_note_manager().bulk_import(
+            records, batch_size=batch_size,
+            progress=lambda count: console.print(f"已导入 {count} 条笔记...", end="\r"),
+        )
+    except ValueError as e: # A malformed record; the batches before it are imported
+        console.print(f"[red]导入中止：{e}[/red]")
+        raise typer.Exit(1)
+    console.print(f"[green]导入完成：{result.imported} 条笔记，"
+                  f"新建 {result.categories_created} 个分类，跳过 {result.skipped} 条无标题记录。[/green]")
+
+@app.command("export")
+def export_command(
+    path: str = typer.Argument(..., help="输出文件或目录"),
+    format: str = typer.Option("jsonl", "--format", "-f", help="jsonl / markdown / sqlite"),
+    gzip: bool = typer.Option(False, "--gzip", help="边写边压缩（jsonl 写成 .gz，markdown 写成 .tar.gz）"),
+):
+    """导出全部笔记（流式写出，内存占用与笔记数量无关）"""
+    from exporters import FORMATS as EXPORT_FORMATS, export_notes
+
+    console = get_console()
+    if format not in EXPORT_FORMATS:
+        console.print(f"[red]不支持的导出格式：{format}[/red]")
+        raise typer.Exit(1)
+    count = export_notes(
+        get_note_manager(), path, format, compress=gzip,
+        progress=lambda count: console.print(f"已导出 {count} 条笔记...", end="\r"),
+    )
+    if count is None:
+        console.print(f"[green]数据库快照已写入 {path}[/green]")
+    else:
+        console.print(f"[green]导出完成：{count} 条笔记已写入 {path}[/green]")
+
+@app.command("stats")
+def stats_command(
+    top: int = typer.Option(20, help="每张表显示的条目数"),
+    reset: bool = typer.Option(False, "--reset", help="清空已记录的统计数据"),
+):
+    """显示各方法与 SQL 查询的耗时统计（包括之前运行记录的数据）"""
+    import instrumentation
+
+    console = get_console()
+    if reset:
+        instrumentation.reset_stats()
+        console.print("[green]统计数据已清空。[/green]")
+        return
+    typer.echo(instrumentation.format_report(instrumentation.combined_stats(), top)) # Plain text: no wrapping
+    console.print(f"慢查询日志：{instrumentation.settings.slow_query_log}"
+                  f"（阈值 {instrumentation.settings.slow_query_ms:g} ms）", markup=False)
+
+@app.command("recompress")
+def recompress_command(
+    algorithm: Optional[str] = typer.Option(None, help="zlib / lzma / none，默认使用配置文件中的设置"),
+    min_bytes: Optional[int] = typer.Option(None, help="超过该字节数的正文才压缩"),
+    batch_size: int = typer.Option(500, help="每个事务处理的笔记数"),
+    vacuum: bool = typer.Option(True, "--vacuum/--no-vacuum", help="完成后执行 VACUUM 回收磁盘空间"),
+):
+    """按当前压缩设置重写已有笔记正文，并报告前后的磁盘占用和读取耗时"""
+    import compression
+
+    console = get_console()
+    engine = bootstrap.init_database().engine
+    current = compression.current_policy()
+    try:
+        compression.configure(algorithm or current.algorithm,
+                              min_bytes if min_bytes is not None else current.min_bytes)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+    before = compression.storage_report(engine)
+    result = compression.recompress(
+        engine, batch_size=batch_size,
+        progress=lambda count: console.print(f"已处理 {count} 条笔记...", end="\r"),
+    )
+    if vacuum:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    after = compression.storage_report(engine)
+    console.print(f"[green]重写 {result.rewritten} / {result.examined} 条笔记正文。[/green]")
+    rows = [
+        ("数据库文件", f"{before.file_bytes / 2**20:.1f} MiB", f"{after.file_bytes / 2**20:.1f} MiB"),
+        ("正文存储", f"{before.content_bytes / 2**20:.1f} MiB", f"{after.content_bytes / 2**20:.1f} MiB"),
+        ("压缩存储的笔记", f"{before.compressed_rows} / {before.total_rows}",
+         f"{after.compressed_rows} / {after.total_rows}"),
+        ("读取正文 p50", f"{before.read_p50_ms:.3f} ms", f"{after.read_p50_ms:.3f} ms"),
+        ("读取正文 p95", f"{before.read_p95_ms:.3f} ms", f"{after.read_p95_ms:.3f} ms"),
+    ]
+    typer.echo(f"{'':16}{'之前':>16}{'之后':>16}")
+    for label, old, new in rows:
+        typer.echo(f"{label:16}{old:>16}{new:>16}")
+
+@app.command("reindex")
+def reindex_command():
+    """重建全文搜索索引（用其他工具直接修改过数据库中的笔记后使用）"""
+    import search_index
+
+    console = get_console()
+    engine = bootstrap.init_database().engine
+    with engine.begin() as conn:
+        if not search_index.rebuild_search_index(conn):
+            console.print("[red]当前 SQLite 不支持 FTS5 trigram 分词，搜索使用 LIKE，无需索引。[/red]")
+            raise typer.Exit(1)
+    console.print("[green]搜索索引已重建。[/green]")
+
+@app.command("serve")
+def serve_command(
+    host: str = typer.Option("127.0.0.1", help="监听地址（默认只接受本机连接）"),
+    port: int = typer.Option(8765, help="监听端口"),
+    workers: int = typer.Option(4, help="执行数据库操作的线程数"),
+):
+    """以 HTTP/JSON 接口提供笔记服务，供本机的其他工具读写笔记"""
+    import server # Only needed in this mode
+    server.serve(host, port, workers)
 
 if __name__ == "__main__":
     app() 
\ No newline at end of file
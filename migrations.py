@@ -0,0 +1,279 @@
+"""Versioned schema migrations for notes.db.
+
+The schema version is stored in the database itself (PRAGMA user_version).
+At startup run_migrations applies, in order, every migration newer than the
+stored version. Migrations must be idempotent (IF NOT EXISTS etc.) so that a
+run interrupted half-way can simply be repeated.
+
+SQLite cannot alter a column's constraints in place; such a migration
+rebuilds the table (rebuilds_table=True) and runs with foreign key
+enforcement off, as SQLite's documented procedure requires.
+"""
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import text
+
+import search_index
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable # apply(connection, metadata)
+    rebuilds_table: bool = False
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str, rebuilds_table: bool = False):
+    """Registers a migration function under the given schema version."""
+    def register(func):
+        MIGRATIONS.append(Migration(version, description, func, rebuilds_table))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return register
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def _set_schema_version(conn, version: int):
+    # PRAGMA does not accept bound parameters; version is always an int
+    conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def run_migrations(engine, metadata) -> int:
+    """Brings the database up to the latest schema version.
+
+    Returns the schema version the database is at afterwards."""
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+    for m in MIGRATIONS:
+        if m.version <= current:
+            continue
+        if m.rebuilds_table:
+            _apply_rebuild(engine, metadata, m)
+        else:
+            with engine.begin() as conn:
+                m.apply(conn, metadata)
+                _set_schema_version(conn, m.version)
+        current = m.version
+    return current
+
+
+def _apply_rebuild(engine, metadata, m: Migration):
+    """Applies a table rebuild with foreign keys off.
+
+    With them on, dropping the old table would first delete its rows and
+    cascade into the tables referencing it. The pragma is a no-op inside a
+    transaction, so it is switched around the transaction, and the result
+    is checked with foreign_key_check before the commit."""
+    with engine.connect() as conn:
+        enforced = conn.execute(text("PRAGMA foreign_keys")).scalar()
+        conn.execute(text("PRAGMA foreign_keys = OFF"))
+        try:
+            with conn.begin():
+                m.apply(conn, metadata)
+                violation = conn.execute(text("PRAGMA foreign_key_check")).first()
+                if violation is not None:
+                    raise RuntimeError(f"migration {m.version} left a dangling reference: {tuple(violation)}")
+                _set_schema_version(conn, m.version)
+        finally:
+            conn.execute(text(f"PRAGMA foreign_keys = {'ON' if enforced else 'OFF'}"))
+
+
+# --- Migrations ---
+
+@migration(1, "base tables")
+def _create_base_tables(conn, metadata):
+    # Databases created before versioning already have these tables
+    metadata.create_all(conn)
+
+
+def _has_unique_index(conn, table: str, column: str) -> bool:
+    for index in conn.execute(text(f"PRAGMA index_list({table})")).mappings():
+        if not index['unique']:
+            continue
+        columns = [row['name'] for row in
+                   conn.execute(text(f"PRAGMA index_info('{index['name']}')")).mappings()]
+        if columns == [column]:
+            return True
+    return False
+
+
+@migration(2, "indexes for note listing and category lookup")
+def _add_listing_indexes(conn, metadata):
+    # Serves get_notes_by_category and its keyset pages, which order by
+    # (updated_at DESC, id DESC) within one category, without a sort step.
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_notes_category_updated "
+        "ON notes (category_id, updated_at DESC, id DESC)"
+    ))
+    # Serves ORDER BY updated_at DESC across all notes; the rowid (id) is the
+    # implicit last column, so ties are ordered by id as well.
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_notes_updated ON notes (updated_at)"
+    ))
+    # The UNIQUE constraint on categories.name normally provides this
+    # already (sqlite_autoindex_categories_1); only add one if it is missing.
+    if not _has_unique_index(conn, 'categories', 'name'):
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_categories_name ON categories (name)"
+        ))
+
+
+@migration(3, "index the plaintext of compressed note bodies")
+def _index_note_plaintext(conn, metadata):
+    # Bodies may now be stored compressed. This used to make the FTS
+    # triggers index note_plaintext(content); migration 7 replaced those
+    # triggers, and rebuilds the index from the plaintext anyway.
+    pass
+
+
+@migration(4, "note revision history")
+def _add_note_revisions(conn, metadata):
+    metadata.tables['note_revisions'].create(conn, checkfirst=True)
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    return any(row['name'] == column
+               for row in conn.execute(text(f"PRAGMA table_info({table})")).mappings())
+
+
+# Keep categories.note_count and categories.last_updated_at in step with
+# every write to notes, whichever code path (ORM, bulk insert, cascade)
+# makes it. The latest update time of a category is one seek on
+# ix_notes_category_updated, so it is only recomputed when it may have
+# moved backwards: the latest note was deleted, moved away or back-dated.
+CATEGORY_STATS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS categories_stats_ai AFTER INSERT ON notes BEGIN
+        UPDATE categories SET
+            note_count = note_count + 1,
+            last_updated_at = CASE
+                WHEN last_updated_at IS NULL OR NEW.updated_at > last_updated_at
+                THEN NEW.updated_at ELSE last_updated_at END
+        WHERE id = NEW.category_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS categories_stats_ad AFTER DELETE ON notes BEGIN
+        UPDATE categories SET
+            note_count = note_count - 1,
+            last_updated_at = CASE
+                WHEN OLD.updated_at < last_updated_at THEN last_updated_at
+                ELSE (SELECT MAX(updated_at) FROM notes WHERE category_id = OLD.category_id) END
+        WHERE id = OLD.category_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS categories_stats_au
+    AFTER UPDATE OF category_id, updated_at ON notes BEGIN
+        UPDATE categories SET
+            note_count = note_count - 1,
+            last_updated_at = CASE
+                WHEN OLD.updated_at < last_updated_at THEN last_updated_at
+                ELSE (SELECT MAX(updated_at) FROM notes WHERE category_id = OLD.category_id) END
+        WHERE id = OLD.category_id AND NEW.category_id != OLD.category_id;
+        UPDATE categories SET
+            note_count = note_count + (NEW.category_id != OLD.category_id),
+            last_updated_at = CASE
+                WHEN last_updated_at IS NULL OR NEW.updated_at >= last_updated_at THEN NEW.updated_at
+                ELSE (SELECT MAX(updated_at) FROM notes WHERE category_id = NEW.category_id) END
+        WHERE id = NEW.category_id;
+    END
+    """,
+]
+
+
+@migration(5, "per-category note counts and latest update, kept by triggers")
+def _add_category_stats(conn, metadata):
+    # New databases got the columns from create_all in migration 1
+    if not _has_column(conn, 'categories', 'note_count'):
+        conn.execute(text("ALTER TABLE categories ADD COLUMN note_count INTEGER NOT NULL DEFAULT 0"))
+    if not _has_column(conn, 'categories', 'last_updated_at'):
+        conn.execute(text("ALTER TABLE categories ADD COLUMN last_updated_at DATETIME"))
+    for trigger in CATEGORY_STATS_TRIGGERS:
+        conn.execute(text(trigger))
+    _recount_category_stats(conn)
+
+
+def _recount_category_stats(conn):
+    # One pass over ix_notes_category_updated
+    conn.execute(text("""
+        UPDATE categories SET
+            note_count = (SELECT COUNT(*) FROM notes WHERE category_id = categories.id),
+            last_updated_at = (SELECT MAX(updated_at) FROM notes WHERE category_id = categories.id)
+    """))
+
+
+def _is_not_null(conn, table: str, column: str) -> bool:
+    return any(row['name'] == column and row['notnull']
+               for row in conn.execute(text(f"PRAGMA table_info({table})")).mappings())
+
+
+def _foreign_key_action(conn, table: str, column: str) -> str:
+    for row in conn.execute(text(f"PRAGMA foreign_key_list({table})")).mappings():
+        if row['from'] == column:
+            return row['on_delete']
+    return ''
+
+
+# Stands in for a missing timestamp: sorts before any real one
+_UNKNOWN_TIME = "'1970-01-01 00:00:00.000000'"
+
+
+@migration(6, "delete a category's notes by ON DELETE CASCADE; note timestamps NOT NULL",
+           rebuilds_table=True)
+def _cascade_category_notes(conn, metadata):
+    # NoteManager deletes a category with one DELETE and leaves its notes to
+    # the database. Keyset pages need an updated_at on every row: older rows
+    # may lack one, and NULL would sort last and have no cursor to continue
+    # from. New databases got both from create_all.
+    if (_foreign_key_action(conn, 'notes', 'category_id') == 'CASCADE'
+            and _is_not_null(conn, 'notes', 'updated_at')):
+        return
+    conn.execute(text("DROP TABLE IF EXISTS notes_new")) # Left by an interrupted run
+    conn.execute(text("""
+        CREATE TABLE notes_new (
+            id INTEGER NOT NULL,
+            title VARCHAR NOT NULL,
+            content TEXT,
+            created_at DATETIME NOT NULL,
+            updated_at DATETIME NOT NULL,
+            category_id INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(category_id) REFERENCES categories (id) ON DELETE CASCADE
+        )
+    """))
+    # Same ids, so notes_fts and the revisions still match
+    conn.execute(text(f"""
+        INSERT INTO notes_new (id, title, content, created_at, updated_at, category_id)
+        SELECT id, title, content,
+               COALESCE(created_at, updated_at, {_UNKNOWN_TIME}),
+               COALESCE(updated_at, created_at, {_UNKNOWN_TIME}),
+               category_id
+        FROM notes
+    """))
+    conn.execute(text("DROP TABLE notes"))
+    conn.execute(text("ALTER TABLE notes_new RENAME TO notes"))
+    # Indexes and triggers were dropped with the old table
+    _add_listing_indexes(conn, metadata)
+    for trigger in CATEGORY_STATS_TRIGGERS:
+        conn.execute(text(trigger))
+    _recount_category_stats(conn) # The latest update may have been a filled-in NULL
+
+
+@migration(7, "contentless search index, kept up to date by NoteManager instead of triggers")
+def _contentless_search_index(conn, metadata):
+    # The triggers called note_plaintext(), which only the application's
+    # connections define, so any other client failed to write notes. New
+    # databases get the index from ensure_search_index at start-up.
+    if search_index.index_exists(conn):
+        search_index.rebuild_search_index(conn)
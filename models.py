@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Boolean, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship, deferred
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
+from compression import CompressedText
 
 Base = declarative_base()
 
@@ -10,7 +13,13 @@ class Category(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String, unique=True, nullable=False)
-    notes = relationship("Note", back_populates="category", cascade="all, delete-orphan")
+    # 由 notes 表上的触发器维护（见 migrations.py），程序不直接写入；
+    # 已加载的对象中的值可能过时，请通过 NoteManager.get_category_summaries() 读取
+    note_count = Column(Integer, nullable=False, default=0, server_default='0')
+    last_updated_at = Column(DateTime)
+    # 删除分类时由数据库一并删除其笔记（ON DELETE CASCADE，见 migrations.py），不逐条加载
+    notes = relationship("Note", back_populates="category", cascade="all, delete-orphan",
+                         passive_deletes=True)
 
     def __repr__(self):
         return f"<Category(name='{self.name}')>"
@@ -20,19 +29,68 @@ class Note(Base):
 
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
-    content = Column(Text)
-    created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    # 正文只在需要时加载（列表视图只用标题）；较长的正文压缩存储
+    content = deferred(Column(CompressedText))
+    # 非空：按 (updated_at, id) 分页需要每行都有时间（见 migrations.py 第 6 版）
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
     
-    category_id = Column(Integer, ForeignKey('categories.id'), nullable=False)
+    category_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'), nullable=False)
     category = relationship("Category", back_populates="notes")
 
     def __repr__(self):
         return f"<Note(title='{self.title}', category='{self.category.name if self.category else None}')>"
 
-# 创建数据库引擎
-engine = create_engine('sqlite:///notes.db', echo=False)
-# 创建所有表
-Base.metadata.create_all(engine)
-# 创建会话工厂
-Session = sessionmaker(bind=engine) 
\ No newline at end of file
+class NoteRevision(Base):
+    __tablename__ = 'note_revisions'
+    # 同时作为按笔记查找版本的索引
+    __table_args__ = (UniqueConstraint('note_id', 'revision'),)
+
+    id = Column(Integer, primary_key=True)
+    # 删除笔记时由数据库一并删除其历史版本
+    note_id = Column(Integer, ForeignKey('notes.id', ondelete='CASCADE'), nullable=False)
+    revision = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    title = Column(String, nullable=False)
+    # 每隔若干版本保存一次完整正文，其余版本只保存相对上一版本的行差异（见 history.py）
+    is_snapshot = Column(Boolean, nullable=False)
+    data = Column(CompressedText, nullable=False)
+
+    def __repr__(self):
+        return f"<NoteRevision(note_id={self.note_id}, revision={self.revision})>"
+
+@dataclass(frozen=True, slots=True)
+class NoteSummary:
+    """Lightweight row for note lists: everything but the note body."""
+    id: int
+    title: str
+    updated_at: Optional[datetime]
+    category_id: int
+    category_name: str
+
+@dataclass(frozen=True, slots=True)
+class NoteDetail:
+    """A whole note, body included, as NoteManager returns it: a copy, not bound to a session."""
+    id: int
+    title: str
+    content: str
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    category_id: int
+    category_name: str
+
+@dataclass(frozen=True, slots=True)
+class CategorySummary:
+    """Row for the category list: the category and its notes' aggregates."""
+    id: int
+    name: str
+    note_count: int
+    last_updated_at: Optional[datetime] # None while the category is empty
+
+# 会话工厂在 bootstrap.init_database() 打开数据库后才绑定引擎；
+# 导入本模块不会连接数据库
+# NoteManager 的每个操作使用一个短期会话（见 NoteManager.unit_of_work()），结束时关闭；
+# 提交后不使对象过期，提交后仍可读取刚写入的对象（如新笔记的 id）而不必重新查询
+Session = sessionmaker(expire_on_commit=False)
+# 线程本地会话：后台线程各自使用独立会话，用完后调用 ScopedSession.remove()
+ScopedSession = scoped_session(Session) 
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""Paged list model for the note list view.
+
+Rows are NoteSummary objects (no note bodies). In paged mode the model asks
+its fetch function for the next keyset page whenever the view scrolls near
+the end, so opening a category with tens of thousands of notes only loads
+and paints the first page.
+"""
+from dataclasses import replace
+from typing import TYPE_CHECKING, Callable, Collection, List, Optional
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+
+if TYPE_CHECKING: # The list is shown before models (and SQLAlchemy) are imported
+    from models import NoteSummary
+    from pagination import Page
+
+PAGE_SIZE = 200
+NOTE_ID_ROLE = Qt.UserRole
+
+# fetch_page(cursor, limit) -> Page of NoteSummary; cursor is None for the first page
+FetchPage = Callable[[Optional[str], int], "Page"]
+
+
+class NoteListModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List["NoteSummary"] = []
+        self._fetch_page: Optional[FetchPage] = None
+        self._cursor: Optional[str] = None
+        self._has_more = False
+        self._show_category = False
+
+    # --- Populating ---
+    def set_source(self, fetch_page: FetchPage, show_category: bool = False):
+        """Switches to paged mode and loads the first page."""
+        self.beginResetModel()
+        self._rows = []
+        self._fetch_page = fetch_page
+        self._cursor = None
+        self._has_more = True
+        self._show_category = show_category
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def set_rows(self, rows: List["NoteSummary"], show_category: bool = False):
+        """Shows a fixed list of rows, e.g. search results."""
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._fetch_page = None
+        self._cursor = None
+        self._has_more = False
+        self._show_category = show_category
+        self.endResetModel()
+
+    def clear(self):
+        self.set_rows([])
+
+    # --- Lazy loading ---
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self._has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._has_more:
+            return
+        # The cursor, not the last row, marks the position: rows shown above
+        # it may have been prepended or retitled since
+        page = self._fetch_page(self._cursor, PAGE_SIZE)
+        self._cursor = page.next_cursor
+        self._has_more = page.has_more
+        if page.items:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(page.items) - 1)
+            self._rows.extend(page.items)
+            self.endInsertRows()
+
+    # --- Qt model interface ---
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._rows):
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            if self._show_category:
+                # Display category name along with title for context
+                return f"{row.title}  [{row.category_name}]"
+            return row.title
+        if role == NOTE_ID_ROLE:
+            return row.id
+        return None
+
+    # --- Helpers for the window ---
+    def summary(self, row: int) -> "NoteSummary":
+        return self._rows[row]
+
+    def row_for_note(self, note_id: int) -> int:
+        """Row index of a loaded note, or -1 if it is not (yet) loaded."""
+        for i, row in enumerate(self._rows):
+            if row.id == note_id:
+                return i
+        return -1
+
+    def prepend(self, summary: "NoteSummary"):
+        """Shows a just-created note at the top, where the newest notes go."""
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self._rows.insert(0, summary)
+        self.endInsertRows()
+
+    def set_title(self, row: int, title: str):
+        self.set_summary(row, replace(self._rows[row], title=title))
+
+    def set_summary(self, row: int, summary: "NoteSummary"):
+        """Replaces a row in place, e.g. with a note's summary after it was saved."""
+        self._rows[row] = summary
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def remove_notes(self, note_ids: Collection[int]):
+        """Removes the rows of these notes, one run of adjacent rows at a time."""
+        end = len(self._rows)
+        while end > 0:
+            while end > 0 and self._rows[end - 1].id not in note_ids:
+                end -= 1
+            start = end
+            while start > 0 and self._rows[start - 1].id in note_ids:
+                start -= 1
+            if start < end:
+                self.beginRemoveRows(QModelIndex(), start, end - 1)
+                del self._rows[start:end]
+                self.endRemoveRows()
+            end = start
+
+    def rename_category(self, category_id: int, name: str):
+        """Shows a renamed category's new name in the rows of its notes."""
+        for row, summary in enumerate(self._rows):
+            if summary.category_id == category_id:
+                self.set_summary(row, replace(summary, category_name=name))
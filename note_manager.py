@@ -1,137 +1,982 @@
-from typing import List, Optional
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from datetime import datetime
-from models import Note, Category, Session
+from itertools import islice
+from models import Note, Category, CategorySummary, NoteDetail, NoteRevision, NoteSummary, Session
+from sqlalchemy import and_, or_, func
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession, undefer
+import search_index
+from bootstrap import init_database
+from events import (CategoryChanged, ChangeEvent, DataReset, EventBus, NoteAdded, NoteMoved, NotesDeleted,
+                    NoteUpdated)
+from instrumentation import timed
+from cache import LRUCache
+from pagination import DEFAULT_PAGE_SIZE, Page, decode_cursor, encode_cursor
+from title_index import TitleIndex
+import history
+
+DEFAULT_CATEGORY_NAME = "Uncategorized"
+
+# Read cache bounds: number of entries, and longest summary list worth keeping
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_ROWS = 5000
+# Ids per IN (...) query; stays below SQLite's bound-parameter limit
+TEXT_QUERY_CHUNK = 500
+
+class ImportResult(NamedTuple):
+    imported: int
+    skipped: int # Records without a title
+    categories_created: int
+
+class BatchRolledBack(Exception):
+    """A write inside NoteManager.batch() failed; the whole batch was rolled back."""
+
+class NoteEdit(NamedTuple):
+    note_id: int
+    title: str
+    content: str
+    category_id: Optional[int] = None # None keeps the note's category
+
+class RevisionInfo(NamedTuple):
+    revision: int
+    created_at: datetime
+    title: str
+    is_snapshot: bool
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
 
 class NoteManager:
-    def __init__(self):
-        self.session = Session()
+    """Reads and writes notes and categories, each call in a unit of work of its own.
+
+    A unit of work is a session opened for one public call (or for one
+    batch()) and closed before the call returns, so no ORM object outlives
+    it: notes come back as NoteDetail or NoteSummary and categories as
+    CategorySummary, immutable copies that hold no session and are never
+    refreshed behind the caller's back. What the manager keeps between calls
+    is the read cache, and it expires explicitly:
+
+    - a write through this manager drops the entries it changes;
+    - forget_notes() drops notes that another session wrote;
+    - clear_cache() drops everything, when what changed is unknown;
+    - category counts are read fresh every time and never cached.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], OrmSession]] = None,
+                 fts_enabled: Optional[bool] = None):
+        if session_factory is None or fts_enabled is None:
+            database = init_database() # Opens the database on first use; cheap afterwards
+            fts_enabled = database.fts_enabled if fts_enabled is None else fts_enabled
+        # Background workers pass their thread-local ScopedSession; the GUI/CLI use Session
+        self.session_factory = session_factory or Session
+        self._session: Optional[OrmSession] = None # That of the unit of work in progress
+        self.fts_enabled = fts_enabled
+        # Memoized reads; every write path below drops exactly what it changes
+        self.cache = LRUCache(CACHE_MAX_ENTRIES)
+        self._title_index: Optional[TitleIndex] = None # Built by get_title_index() on first use
+        self.history_settings = history.settings
+        self._batch_depth = 0 # > 0 inside batch(): writes flush, the batch commits
+        # Change events (events.py); those of a batch wait for its commit
+        self.events = EventBus()
+        self._pending_events: List[ChangeEvent] = []
+        self.events.subscribe(self._update_title_index)
         self._ensure_default_category()
 
     def _ensure_default_category(self):
         """Ensures at least one category exists, e.g., 'Uncategorized'."""
         if not self.get_all_categories():
-            self.add_category("Uncategorized")
+            self.add_category(DEFAULT_CATEGORY_NAME)
+
+    # --- Read Cache ---
+    def cache_stats(self) -> dict:
+        """Hit/miss counters and size of the read cache."""
+        return self.cache.stats()
+
+    def clear_cache(self):
+        """Forgets all cached reads, e.g. after another session wrote to the DB.
+
+        Subscribers are told to reload (DataReset); the title index is
+        rebuilt by get_title_index() when next used."""
+        self.cache.clear()
+        self._emit(DataReset())
+
+    def _cached_list(self, key, load, max_rows: int = CACHE_MAX_ROWS) -> list:
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = load()
+            if len(cached) <= max_rows:
+                self.cache.put(key, cached)
+        return list(cached) # Callers may modify their copy
+
+    def _invalidate_note_lists(self, *category_ids):
+        """Drops cached summaries and pages of these categories and of 'all notes'."""
+        affected = set(category_ids) | {None}
+        self.cache.invalidate_where(
+            lambda key, value: key[0] in ('summaries', 'page') and key[1] in affected)
+
+    # --- Units of Work ---
+    @contextmanager
+    def unit_of_work(self) -> Iterator[OrmSession]:
+        """A session for one unit of work, closed with everything it loaded at the end.
+
+        Inside batch() or another unit of work this is the session already in
+        use, so that nested calls see each other's writes; only the outermost
+        unit closes it. Closing rolls back whatever was not committed."""
+        if self._session is not None:
+            yield self._session
+            return
+        session = self._session = self.session_factory()
+        try:
+            yield session
+        finally:
+            if self._session is session: # Not when a generator holding it is collected late
+                self._session = None
+            session.close()
+
+    def _commit(self):
+        """Commits; inside batch() only flushes, and the batch commits once at its end."""
+        if self._batch_depth:
+            self._session.flush()
+        else:
+            self._session.commit()
+
+    def _emit(self, event: ChangeEvent):
+        """Publishes a change once it is committed: at once, or when the batch commits."""
+        if self._batch_depth and not isinstance(event, DataReset):
+            self._pending_events.append(event)
+        else:
+            self.events.publish(event)
+
+    def _rollback(self):
+        # The cache may hold what the rolled back writes read or wrote
+        self._session.rollback()
+        self._pending_events.clear()
+        self.clear_cache()
+        if self._batch_depth:
+            # Earlier writes of the batch are gone too: a quiet None/False would hide that
+            raise BatchRolledBack("batch rolled back after a failed write")
+
+    @contextmanager
+    def batch(self):
+        """Groups the writes made inside the block into one transaction.
+
+        The block is one unit of work: write methods flush instead of
+        committing; the batch commits when the block exits, or rolls back
+        (and re-raises) if it raises. Batches nest: only the outermost one
+        commits or rolls back."""
+        with self.unit_of_work() as session:
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    session.rollback()
+                    self._pending_events.clear()
+                    self.clear_cache()
+                raise
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                try:
+                    session.commit()
+                except Exception:
+                    self._rollback()
+                    raise
+        if not self._batch_depth:
+            events, self._pending_events = self._pending_events, []
+            for event in events:
+                self.events.publish(event)
 
     # --- Category Management ---
-    def add_category(self, name: str) -> Optional[Category]:
+    @timed
+    def add_category(self, name: str) -> Optional[CategorySummary]:
         """Adds a new category.
-        Returns the new Category object or None if name already exists."""
-        if self.session.query(Category).filter(Category.name == name).first():
-            return None # Category already exists
-        category = Category(name=name)
-        self.session.add(category)
-        try:
-            self.session.commit()
-            return category
-        except IntegrityError:
-            self.session.rollback()
-            return None
-        
-    def get_all_categories(self) -> List[Category]:
-        """Returns a list of all categories."""
-        return self.session.query(Category).order_by(Category.name).all()
-        
-    def get_category_by_id(self, category_id: int) -> Optional[Category]:
+        Returns the new category or None if name already exists."""
+        with self.unit_of_work() as session:
+            if session.query(Category.id).filter(Category.name == name).first():
+                return None # Category already exists
+            category = Category(name=name)
+            session.add(category)
+            try:
+                self._commit()
+            except IntegrityError:
+                self._rollback()
+                return None
+            added = CategorySummary(category.id, name, 0, None)
+        self.cache.invalidate(('categories',))
+        self._emit(CategoryChanged(added.id, name))
+        return added
+
+    @timed
+    def get_all_categories(self) -> List[CategorySummary]:
+        """Returns a list of all categories, by name (see get_category_summaries)."""
+        return self.get_category_summaries()
+
+    @timed
+    def get_category_summaries(self) -> List[CategorySummary]:
+        """Every category with its note count and latest note update, by name.
+
+        One read of the categories table: the aggregates are kept up to date
+        by triggers on notes (see migrations.py), so no note is scanned. Not
+        cached, so that writes from other sessions (autosave, import) show."""
+        with self.unit_of_work() as session:
+            rows = session.query(
+                Category.id, Category.name, Category.note_count, Category.last_updated_at
+            ).order_by(Category.name).all()
+        return [CategorySummary(*row) for row in rows]
+
+    @timed
+    def get_category_by_id(self, category_id: int) -> Optional[CategorySummary]:
         """Finds a category by its ID."""
-        return self.session.query(Category).filter(Category.id == category_id).first()
-        
+        with self.unit_of_work() as session:
+            row = session.query(
+                Category.id, Category.name, Category.note_count, Category.last_updated_at
+            ).filter(Category.id == category_id).first()
+        return CategorySummary(*row) if row else None
+
+    def _category_names(self) -> Dict[int, str]:
+        """Category id -> name, cached: existence checks and events need no query."""
+        names = self.cache.get(('categories',))
+        if names is None:
+            with self.unit_of_work() as session:
+                names = dict(session.query(Category.id, Category.name))
+            self.cache.put(('categories',), names)
+        return names
+
+    @timed
     def update_category_name(self, category_id: int, new_name: str) -> bool:
         """Updates the name of a category."""
-        category = self.get_category_by_id(category_id)
-        if category and not self.session.query(Category).filter(Category.name == new_name).first():
+        with self.unit_of_work() as session:
+            category = session.get(Category, category_id)
+            if category is None or session.query(Category.id).filter(Category.name == new_name).first():
+                return False
             category.name = new_name
             try:
-                self.session.commit()
-                return True
+                self._commit()
             except IntegrityError:
-                self.session.rollback()
+                self._rollback()
                 return False
-        return False
+        # Summaries and details carry the category name
+        self.cache.invalidate(('categories',))
+        self._invalidate_note_lists(category_id)
+        self.cache.invalidate_where(
+            lambda key, value: key[0] == 'note' and value.category_id == category_id)
+        self._emit(CategoryChanged(category_id, new_name))
+        return True
 
+    @timed
     def delete_category(self, category_id: int) -> bool:
-        """Deletes a category and all notes within it."""
-        category = self.get_category_by_id(category_id)
-        if category:
-            # Cascade delete should handle notes due to relationship setting
-            self.session.delete(category)
-            self.session.commit()
-            return True
-        return False
+        """Deletes a category and all notes within it.
+
+        One DELETE of the category row: its notes, and their revisions, are
+        deleted by the database (ON DELETE CASCADE), not through the ORM.
+        Their titles and bodies are only read to take them out of the
+        search index."""
+        with self.unit_of_work() as session:
+            # Only the ids, for the NotesDeleted event (ix_notes_category_updated)
+            note_ids = [row.id for row in session.query(Note.id).filter(Note.category_id == category_id)]
+            indexed = self._indexed_texts(Note.category_id == category_id)
+            deleted = session.query(Category).filter(
+                Category.id == category_id).delete(synchronize_session=False)
+            if not deleted:
+                return False
+            self._update_index(removed=indexed)
+            self._commit()
+        self.cache.invalidate(('categories',))
+        self._invalidate_note_lists(category_id)
+        self.cache.invalidate_where(
+            lambda key, value: key[0] == 'note' and value.category_id == category_id)
+        if note_ids:
+            self._emit(NotesDeleted(category_id, tuple(note_ids)))
+        self._emit(CategoryChanged(category_id, None))
+        return True
 
     # --- Note Management ---
-    def add_note(self, title: str, content: str, category_id: int) -> Optional[Note]:
+    @timed
+    def add_note(self, title: str, content: str, category_id: int) -> Optional[NoteDetail]:
         """Adds a new note to a specific category."""
-        category = self.get_category_by_id(category_id)
-        if not category:
+        category_name = self._category_names().get(category_id)
+        if category_name is None:
             return None # Category doesn't exist
-            
-        note = Note(
-            title=title,
-            content=content,
-            category_id=category_id
-        )
-        self.session.add(note)
-        self.session.commit()
-        return note
+        with self.unit_of_work() as session:
+            note = Note(
+                title=title,
+                content=content,
+                category_id=category_id
+            )
+            session.add(note)
+            session.flush() # Assigns the id
+            self._update_index(added=[(note.id, title, content)])
+            self._commit()
+            added = NoteDetail(note.id, title, content, note.created_at, note.updated_at,
+                               category_id, category_name)
+        self._invalidate_note_lists(category_id)
+        self.cache.put(('note', added.id), added) # Usually opened next
+        self._emit(NoteAdded(self._summary_of(added)))
+        return added
+
+    @timed
+    def bulk_import(self, records: Iterable[dict], batch_size: int = 1000,
+                    progress: Optional[Callable[[int], None]] = None) -> ImportResult:
+        """Imports notes from an iterable of records in large transactions.
 
+        Each record is a dict with title, content, category (a name) and
+        optionally created_at / updated_at. Records are consumed lazily,
+        batch_size at a time, and each batch is one executemany INSERT and
+        one commit. Unknown categories are created on the fly. progress, if
+        given, is called with the running number of imported notes.
+        Subscribers get one DataReset, when the import ends."""
+        with self.unit_of_work() as session:
+            category_ids = dict(session.query(Category.name, Category.id))
+            categories_table = Category.__table__
+            notes_table = Note.__table__
+            imported = skipped = categories_created = 0
+            records = iter(records)
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+                now = datetime.now()
+                rows = []
+                try:
+                    for record in batch:
+                        title = (record.get('title') or '').strip()
+                        if not title:
+                            skipped += 1
+                            continue
+                        category_name = (record.get('category') or DEFAULT_CATEGORY_NAME).strip()
+                        category_id = category_ids.get(category_name)
+                        if category_id is None:
+                            result = session.execute(categories_table.insert().values(name=category_name))
+                            category_id = category_ids[category_name] = result.inserted_primary_key[0]
+                            categories_created += 1
+                        created_at = _parse_timestamp(record.get('created_at')) or now
+                        rows.append({
+                            'title': title,
+                            'content': record.get('content') or '',
+                            'category_id': category_id,
+                            'created_at': created_at,
+                            'updated_at': _parse_timestamp(record.get('updated_at')) or created_at,
+                        })
+                    if rows:
+                        session.execute(notes_table.insert(), rows)
+                        if self.fts_enabled:
+                            # executemany reports no ids; holding the write lock, the
+                            # rows got the next len(rows) rowids, in order
+                            first_id = session.query(func.max(Note.id)).scalar() - len(rows) + 1
+                            self._update_index(added=[(first_id + i, row['title'], row['content'])
+                                                      for i, row in enumerate(rows)])
+                    self._commit()
+                except Exception:
+                    self._rollback()
+                    raise
+                # New notes and possibly new categories everywhere; subscribers
+                # reload once, at the end, not after every batch
+                self.cache.clear()
+                imported += len(rows)
+                if progress:
+                    progress(imported)
+        self._emit(DataReset())
+        return ImportResult(imported, skipped, categories_created)
+
+    @timed
+    def save_notes(self, edits: Iterable[NoteEdit]) -> int:
+        """Applies edits to any number of notes in a single transaction.
+
+        Edits of notes that no longer exist are skipped, and moves to missing
+        categories are ignored. Returns the number of notes written."""
+        edits = list(edits)
+        if not edits:
+            return 0
+        with self.unit_of_work() as session:
+            notes = {note.id: note for note in session.query(Note).options(undefer(Note.content)).filter(
+                Note.id.in_([edit.note_id for edit in edits]))}
+            target_ids = {edit.category_id for edit in edits if edit.category_id}
+            valid_category_ids = {row.id for row in session.query(Category.id).filter(
+                Category.id.in_(target_ids))} if target_ids else set()
+            now = datetime.now()
+            affected_categories = set()
+            old_category_ids = {}
+            indexed = {} # Note id -> (id, title, body) as the search index has it
+            for edit in edits:
+                note = notes.get(edit.note_id)
+                if note is None:
+                    continue # Deleted meanwhile
+                affected_categories.add(note.category_id)
+                old_category_ids.setdefault(note.id, note.category_id)
+                indexed.setdefault(note.id, (note.id, note.title, note.content or ''))
+                self._record_revision(note, edit.title, edit.content, now)
+                note.title = edit.title
+                note.content = edit.content
+                if edit.category_id in valid_category_ids:
+                    note.category_id = edit.category_id
+                    affected_categories.add(edit.category_id)
+                note.updated_at = now
+            changed = [(old, (note_id, notes[note_id].title, notes[note_id].content or ''))
+                       for note_id, old in indexed.items()]
+            changed = [(old, new) for old, new in changed if old != new]
+            try:
+                self._update_index(removed=[old for old, _ in changed], added=[new for _, new in changed])
+                self._commit()
+            except Exception:
+                self._rollback()
+                raise
+            saved = [(self._summary_of(notes[note_id]), old_category_id)
+                     for note_id, old_category_id in old_category_ids.items()]
+        self._invalidate_note_lists(*affected_categories)
+        for summary, old_category_id in saved:
+            self.cache.invalidate(('note', summary.id))
+            self._emit_saved(summary, old_category_id)
+        return sum(1 for edit in edits if edit.note_id in notes)
+
+    def forget_notes(self, note_ids: Iterable[int]):
+        """Drops cached copies of notes that another session has written.
+
+        Publishes what became of them, read back in one query."""
+        old_category_ids = {}
+        for note_id in note_ids:
+            note = self.cache.get(('note', note_id))
+            old_category_ids[note_id] = note.category_id if note is not None else None
+            self.cache.invalidate(('note', note_id))
+        # Their titles and order may have changed in any list
+        self.cache.invalidate_where(lambda key, value: key[0] in ('summaries', 'page'))
+        summaries = self.get_note_summaries(old_category_ids)
+        for note_id, old_category_id in old_category_ids.items():
+            summary = summaries.get(note_id)
+            if summary is None:
+                if old_category_id is not None: # Deleted meanwhile
+                    self._emit(NotesDeleted(old_category_id, (note_id,)))
+            elif old_category_id is not None and old_category_id != summary.category_id:
+                self._emit(NoteMoved(summary, old_category_id))
+            else:
+                self._emit(NoteUpdated(summary))
+
+    @timed
     def delete_note(self, note_id: int) -> bool:
         """Deletes a note by its ID."""
-        note = self.session.query(Note).filter(Note.id == note_id).first()
-        if note:
-            self.session.delete(note)
-            self.session.commit()
-            return True
-        return False
-
-    def find_note_by_id(self, note_id: int) -> Optional[Note]:
-         """Finds a note by its ID."""
-         return self.session.query(Note).filter(Note.id == note_id).first()
-
-    def search_notes(self, keyword: str, category_id: Optional[int] = None) -> List[Note]:
-        """Searches notes by keyword, optionally within a specific category."""
-        query = self.session.query(Note).filter(
+        return self.bulk_delete_notes([note_id]) == 1
+
+    @timed
+    def bulk_delete_notes(self, note_ids: Iterable[int]) -> int:
+        """Deletes any number of notes in a single transaction.
+
+        One DELETE per TEXT_QUERY_CHUNK ids; revisions go with their notes
+        (ON DELETE CASCADE). Ids of missing notes are skipped. Publishes one
+        NotesDeleted per category; returns the number of notes deleted."""
+        note_ids = list(dict.fromkeys(note_ids))
+        deleted: Dict[int, List[int]] = {} # category id -> note ids
+        with self.unit_of_work() as session:
+            try:
+                for start in range(0, len(note_ids), TEXT_QUERY_CHUNK):
+                    chunk = note_ids[start:start + TEXT_QUERY_CHUNK]
+                    for note_id, category_id in session.query(Note.id, Note.category_id).filter(Note.id.in_(chunk)):
+                        deleted.setdefault(category_id, []).append(note_id)
+                    self._update_index(removed=self._indexed_texts(Note.id.in_(chunk)))
+                    # Notes loaded earlier in a batch are not expunged: nothing reads them again
+                    session.query(Note).filter(Note.id.in_(chunk)).delete(synchronize_session=False)
+                self._commit()
+            except Exception:
+                self._rollback()
+                raise
+        self._invalidate_note_lists(*deleted)
+        for category_id, ids in deleted.items():
+            for note_id in ids:
+                self.cache.invalidate(('note', note_id))
+            self._emit(NotesDeleted(category_id, tuple(ids)))
+        return sum(len(ids) for ids in deleted.values())
+
+    @timed
+    def bulk_move_notes(self, note_ids: Iterable[int], category_id: int) -> int:
+        """Moves any number of notes into a category in a single transaction.
+
+        One UPDATE per TEXT_QUERY_CHUNK ids; like a move in the editor it
+        counts as an update (updated_at), but bodies are not read and no
+        revision is recorded, since title and body stay as they are. Notes
+        already in the category and missing ids are skipped. Returns the
+        number of notes moved, or -1 if the category does not exist."""
+        category_name = self._category_names().get(category_id)
+        if category_name is None:
+            return -1
+        note_ids = list(dict.fromkeys(note_ids))
+        now = datetime.now()
+        moved = [] # (summary, old category id)
+        with self.unit_of_work() as session:
+            try:
+                for start in range(0, len(note_ids), TEXT_QUERY_CHUNK):
+                    in_chunk = and_(Note.id.in_(note_ids[start:start + TEXT_QUERY_CHUNK]),
+                                    Note.category_id != category_id)
+                    moved.extend((NoteSummary(note_id, title, now, category_id, category_name), old_category_id)
+                                 for note_id, title, old_category_id
+                                 in session.query(Note.id, Note.title, Note.category_id).filter(in_chunk))
+                    session.query(Note).filter(in_chunk).update(
+                        {Note.category_id: category_id, Note.updated_at: now}, synchronize_session=False)
+                self._commit()
+            except Exception:
+                self._rollback()
+                raise
+        self._invalidate_note_lists(category_id, *{old_category_id for _, old_category_id in moved})
+        for summary, old_category_id in moved:
+            self.cache.invalidate(('note', summary.id))
+            self._emit(NoteMoved(summary, old_category_id))
+        return len(moved)
+
+    @timed
+    def find_note_by_id(self, note_id: int) -> Optional[NoteDetail]:
+         """Finds a note by its ID, body included."""
+         note = self.cache.get(('note', note_id))
+         if note is None:
+             with self.unit_of_work() as session:
+                 row = self._detail_query(session).filter(Note.id == note_id).first()
+             if row is not None:
+                 note = NoteDetail(*row)
+                 self.cache.put(('note', note_id), note)
+         return note
+
+    def _summary_of(self, note) -> NoteSummary:
+        """Summary of a Note (or NoteDetail); the category name comes from the cache."""
+        return NoteSummary(note.id, note.title, note.updated_at, note.category_id,
+                           self._category_names()[note.category_id])
+
+    def _emit_saved(self, summary: NoteSummary, old_category_id: int):
+        self._emit(NoteMoved(summary, old_category_id) if summary.category_id != old_category_id
+                   else NoteUpdated(summary))
+
+    @staticmethod
+    def _detail_query(session: OrmSession):
+        """Query for NoteDetail columns, body and category name included.
+
+        Columns rather than Note entities: nothing enters the session's
+        identity map, and the category comes in the same SELECT."""
+        return session.query(
+            Note.id, Note.title, Note.content, Note.created_at, Note.updated_at,
+            Note.category_id, Category.name
+        ).join(Category, Note.category_id == Category.id)
+
+    @staticmethod
+    def _summary_query(session: OrmSession):
+        """Query for NoteSummary columns; the note body is never selected."""
+        return session.query(
+            Note.id, Note.title, Note.updated_at, Note.category_id, Category.name
+        ).join(Category, Note.category_id == Category.id)
+
+    # --- Search Index ---
+    # Kept by the write methods, not by triggers: see search_index.py
+    def _update_index(self, removed: Iterable[search_index.IndexedText] = (),
+                      added: Iterable[search_index.IndexedText] = ()):
+        """Takes notes out of and puts them into notes_fts, in the current transaction.
+
+        removed holds (id, title, body) as they were indexed, added as they are now."""
+        if self.fts_enabled:
+            search_index.remove_from_index(self._session, removed)
+            search_index.add_to_index(self._session, added)
+
+    def _indexed_texts(self, *criteria) -> List[search_index.IndexedText]:
+        """(id, title, body) of the notes matching criteria, for _update_index(removed=...).
+
+        Empty, and nothing is read, when there is no index to update."""
+        if not self.fts_enabled:
+            return []
+        rows = self._session.query(Note.id, Note.title, Note.content).filter(*criteria)
+        return [(note_id, title, content or '') for note_id, title, content in rows]
+
+    def ranks_by_relevance(self, keyword: str) -> bool:
+        """Whether searches for keyword are ordered by BM25 rank rather than by recency."""
+        return bool(self.fts_enabled) and search_index.can_use_index(keyword)
+
+    def _filter_keyword(self, query, keyword: str, ranked: bool = True):
+        """Restricts a notes query to notes whose title or content contains keyword.
+
+        Uses the FTS5 trigram index ranked by BM25 when possible, otherwise a
+        LIKE scan ordered by most recently updated. ranked=False leaves the
+        order to the caller."""
+        if self.ranks_by_relevance(keyword):
+            query = query.join(
+                search_index.notes_fts, search_index.notes_fts.c.rowid == Note.id
+            ).filter(
+                search_index.match_clause(keyword)
+            )
+            return query.order_by(search_index.rank_order(), Note.updated_at.desc()) if ranked else query
+        query = query.filter(
             Note.title.like(f'%{keyword}%') | 
-            Note.content.like(f'%{keyword}%')
+            func.note_plaintext(Note.content).like(f'%{keyword}%') # Body may be compressed
         )
-        if category_id:
-            query = query.filter(Note.category_id == category_id)
-        return query.order_by(Note.updated_at.desc()).all()
+        return query.order_by(Note.updated_at.desc()) if ranked else query
 
+    @timed
+    def search_notes(self, keyword: str, category_id: Optional[int] = None) -> List[NoteDetail]:
+        """Searches notes by keyword, optionally within a specific category."""
+        with self.unit_of_work() as session:
+            query = self._filter_keyword(self._detail_query(session), keyword)
+            if category_id:
+                query = query.filter(Note.category_id == category_id)
+            return [NoteDetail(*row) for row in query.all()]
+
+    @timed
     def update_note(self, note_id: int, new_title: str, new_content: str, new_category_id: Optional[int] = None) -> bool:
         """Updates a note's title, content, and optionally category."""
-        note = self.find_note_by_id(note_id)
-        if note:
+        with self.unit_of_work() as session:
+            note = session.query(Note).options(undefer(Note.content)).filter(Note.id == note_id).first()
+            if note is None:
+                return False
+            old_category_id = note.category_id
+            moving = new_category_id and new_category_id != note.category_id
+            # Check if new category exists
+            if moving and new_category_id not in self._category_names():
+                return False # Cannot move to non-existent category
+            now = datetime.now()
+            # Before touching note: the history queries would autoflush a pending
+            # change, stamping updated_at (onupdate) later than this revision
+            self._record_revision(note, new_title, new_content, now)
+            indexed = (note.id, note.title, note.content or '')
+            if moving:
+                note.category_id = new_category_id
             note.title = new_title
             note.content = new_content
-            if new_category_id and new_category_id != note.category_id:
-                # Check if new category exists
-                new_category = self.get_category_by_id(new_category_id)
-                if not new_category:
-                    return False # Cannot move to non-existent category
-                note.category_id = new_category_id
-            note.updated_at = datetime.now() # Manually update timestamp
-            self.session.commit()
-            return True
-        return False
+            note.updated_at = now # Manually update timestamp
+            if (new_title, new_content or '') != indexed[1:]:
+                self._update_index(removed=[indexed], added=[(note.id, new_title, new_content or '')])
+            self._commit()
+            summary = self._summary_of(note)
+        self.cache.invalidate(('note', note_id))
+        self._invalidate_note_lists(old_category_id, summary.category_id)
+        self._emit_saved(summary, old_category_id)
+        return True
 
-    def get_all_notes(self) -> List[Note]:
+    @timed
+    def get_all_notes(self) -> List[NoteDetail]:
         """Gets all notes across all categories."""
-        return self.session.query(Note).order_by(Note.updated_at.desc()).all()
-        
-    def get_notes_by_category(self, category_id: int) -> List[Note]:
+        with self.unit_of_work() as session:
+            rows = self._detail_query(session).order_by(Note.updated_at.desc()).all()
+        return [NoteDetail(*row) for row in rows]
+
+    @timed
+    def get_notes_by_category(self, category_id: int) -> List[NoteDetail]:
         """Gets all notes for a specific category ID."""
-        return self.session.query(Note).filter(Note.category_id == category_id).order_by(Note.updated_at.desc()).all()
+        with self.unit_of_work() as session:
+            rows = self._detail_query(session).filter(
+                Note.category_id == category_id
+            ).order_by(Note.updated_at.desc()).all()
+        return [NoteDetail(*row) for row in rows]
+
+    def _seek_page(self, query, cursor: Optional[str], limit: int, make_item) -> Page:
+        """Runs query as one keyset page, newest first (see pagination.py).
+
+        One row beyond limit is fetched to tell whether another page follows."""
+        if cursor:
+            last_updated_at, last_id = decode_cursor(cursor)
+            # The <= bound alone is what SQLite turns into an index range; with
+            # only the OR below it would scan the index from the top each time
+            query = query.filter(Note.updated_at <= last_updated_at, or_(
+                Note.updated_at < last_updated_at,
+                and_(Note.updated_at == last_updated_at, Note.id < last_id)
+            ))
+        rows = query.order_by(Note.updated_at.desc(), Note.id.desc()).limit(limit + 1).all()
+        items = [make_item(*row) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1].updated_at, items[-1].id) if len(rows) > limit else None
+        return Page(items, next_cursor)
+
+    @timed
+    def get_notes_page(self, category_id: Optional[int] = None, cursor: Optional[str] = None,
+                       limit: int = DEFAULT_PAGE_SIZE) -> Page:
+        """One page of get_all_notes (or of get_notes_by_category), bodies included.
+
+        Pass the previous page's next_cursor to continue; an invalid cursor
+        raises ValueError."""
+        with self.unit_of_work() as session:
+            query = self._detail_query(session)
+            if category_id:
+                query = query.filter(Note.category_id == category_id)
+            return self._seek_page(query, cursor, limit, NoteDetail)
+
+    @timed
+    def search_notes_page(self, keyword: str, category_id: Optional[int] = None,
+                          cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Page:
+        """One page of search_notes / search_all_notes.
+
+        Pages are ordered by recency rather than relevance: a rank has no
+        stable position to continue from."""
+        if not keyword:
+            return Page([], None)
+        with self.unit_of_work() as session:
+            query = self._filter_keyword(self._detail_query(session), keyword, ranked=False)
+            if category_id:
+                query = query.filter(Note.category_id == category_id)
+            return self._seek_page(query, cursor, limit, NoteDetail)
 
-    def search_all_notes(self, keyword: str) -> List[Note]:
+    @timed
+    def search_all_notes(self, keyword: str) -> List[NoteDetail]:
         """Searches notes by keyword across ALL categories."""
         if not keyword:
             return [] # Return empty list if keyword is empty
-        query = self.session.query(Note).filter(
-            Note.title.like(f'%{keyword}%') | 
-            Note.content.like(f'%{keyword}%')
-        )
-        return query.order_by(Note.updated_at.desc()).all()
+        with self.unit_of_work() as session:
+            rows = self._filter_keyword(self._detail_query(session), keyword).all()
+        return [NoteDetail(*row) for row in rows]
+
+    # --- Note Summaries (list views; bodies are not loaded) ---
+    @timed
+    def get_all_note_summaries(self) -> List[NoteSummary]:
+        """Like get_all_notes, without note bodies."""
+        def load():
+            with self.unit_of_work() as session:
+                rows = self._summary_query(session).order_by(Note.updated_at.desc()).all()
+            return [NoteSummary(*row) for row in rows]
+        return self._cached_list(('summaries', None), load)
+
+    @timed
+    def get_note_summaries_by_category(self, category_id: int) -> List[NoteSummary]:
+        """Like get_notes_by_category, without note bodies."""
+        def load():
+            with self.unit_of_work() as session:
+                rows = self._summary_query(session).filter(
+                    Note.category_id == category_id
+                ).order_by(Note.updated_at.desc()).all()
+            return [NoteSummary(*row) for row in rows]
+        return self._cached_list(('summaries', category_id), load)
+
+    @timed
+    def search_note_summaries(self, keyword: str, category_id: Optional[int] = None) -> List[NoteSummary]:
+        """Like search_notes, without note bodies."""
+        with self.unit_of_work() as session:
+            query = self._filter_keyword(self._summary_query(session), keyword)
+            if category_id:
+                query = query.filter(Note.category_id == category_id)
+            return [NoteSummary(*row) for row in query.all()]
+
+    @timed
+    def search_all_note_summaries(self, keyword: str) -> List[NoteSummary]:
+        """Like search_all_notes, without note bodies."""
+        if not keyword:
+            return []
+        with self.unit_of_work() as session:
+            rows = self._filter_keyword(self._summary_query(session), keyword).all()
+        return [NoteSummary(*row) for row in rows]
+
+    @timed
+    def get_note_summaries_page(self, category_id: Optional[int] = None, cursor: Optional[str] = None,
+                                limit: int = DEFAULT_PAGE_SIZE) -> Page:
+        """Like get_notes_page, without note bodies; what the note list scrolls through."""
+        category_id = category_id or None
+        key = ('page', category_id, cursor, limit)
+        page = self.cache.get(key)
+        if page is None:
+            with self.unit_of_work() as session:
+                query = self._summary_query(session)
+                if category_id:
+                    query = query.filter(Note.category_id == category_id)
+                page = self._seek_page(query, cursor, limit, NoteSummary)
+            self.cache.put(key, page)
+        return Page(list(page.items), page.next_cursor) # Callers may modify their copy
+
+    @timed
+    def search_note_summaries_page(self, keyword: str, category_id: Optional[int] = None,
+                                   cursor: Optional[str] = None,
+                                   limit: int = DEFAULT_PAGE_SIZE) -> Page:
+        """Like search_notes_page, without note bodies."""
+        if not keyword:
+            return Page([], None)
+        with self.unit_of_work() as session:
+            query = self._filter_keyword(self._summary_query(session), keyword, ranked=False)
+            if category_id:
+                query = query.filter(Note.category_id == category_id)
+            return self._seek_page(query, cursor, limit, NoteSummary)
+
+    # --- Title Index (quick switcher) ---
+    @timed
+    def get_title_index(self) -> TitleIndex:
+        """The in-memory index of all note titles, least recently updated first.
+
+        Built from one query the first time; after that the write methods
+        keep it current, so it is cheap to ask for again."""
+        if self._title_index is None:
+            with self.unit_of_work() as session:
+                query = session.query(Note.id, Note.title).order_by(Note.updated_at, Note.id)
+                self._title_index = TitleIndex(query.yield_per(TEXT_QUERY_CHUNK))
+        return self._title_index
+
+    def _update_title_index(self, event: ChangeEvent):
+        """Subscriber: applies a change to the title index, if it is built."""
+        if self._title_index is None:
+            return
+        if isinstance(event, (NoteAdded, NoteUpdated, NoteMoved)):
+            self._title_index.add(event.summary.id, event.summary.title) # Now the most recent
+        elif isinstance(event, NotesDeleted):
+            for note_id in event.note_ids:
+                self._title_index.remove(note_id)
+        elif isinstance(event, DataReset):
+            self._title_index = None
+
+    @timed
+    def get_note_summaries(self, note_ids: Iterable[int]) -> Dict[int, NoteSummary]:
+        """Maps note ids to summaries; ids of missing notes are left out."""
+        note_ids = list(note_ids)
+        summaries = {}
+        with self.unit_of_work() as session:
+            for start in range(0, len(note_ids), TEXT_QUERY_CHUNK):
+                rows = self._summary_query(session).filter(
+                    Note.id.in_(note_ids[start:start + TEXT_QUERY_CHUNK])).all()
+                summaries.update((row[0], NoteSummary(*row)) for row in rows)
+        return summaries
+
+    @timed
+    def get_note_texts(self, note_ids: Iterable[int]) -> Dict[int, Tuple[str, str]]:
+        """Maps note ids to (title, content), for matching keywords in memory."""
+        note_ids = list(note_ids)
+        texts = {}
+        with self.unit_of_work() as session:
+            for start in range(0, len(note_ids), TEXT_QUERY_CHUNK):
+                rows = session.query(Note.id, Note.title, Note.content).filter(
+                    Note.id.in_(note_ids[start:start + TEXT_QUERY_CHUNK])
+                ).all()
+                texts.update((note_id, (title, content or '')) for note_id, title, content in rows)
+        return texts
+
+    @timed
+    def get_search_index_totals(self) -> Optional[search_index.IndexTotals]:
+        """Row and token counts of the search index, for ranking in memory (search_session.py)."""
+        if not self.fts_enabled:
+            return None
+        with self.unit_of_work() as session:
+            return search_index.read_index_totals(session)
+
+    # --- Revision History ---
+    # The private helpers below run inside the caller's unit of work
+    def _revision_chain(self, note_id: int, upto: Optional[int] = None) -> List[NoteRevision]:
+        """Revisions from the newest snapshot at or before `upto` up to `upto`."""
+        bounds = [NoteRevision.note_id == note_id]
+        if upto is not None:
+            bounds.append(NoteRevision.revision <= upto)
+        latest_snapshot = self._session.query(func.max(NoteRevision.revision)).filter(
+            *bounds, NoteRevision.is_snapshot.is_(True)).scalar_subquery()
+        return self._session.query(NoteRevision).filter(
+            *bounds, NoteRevision.revision >= latest_snapshot
+        ).order_by(NoteRevision.revision).all()
+
+    @staticmethod
+    def _replay(chain: List[NoteRevision]) -> List[str]:
+        """Content of every revision in a chain that starts with a snapshot."""
+        texts = [chain[0].data]
+        for revision in chain[1:]:
+            texts.append(revision.data if revision.is_snapshot else
+                         history.apply_delta(texts[-1], history.decode_delta(revision.data)))
+        return texts
+
+    def _record_revision(self, note: Note, title: str, content: str, now: datetime):
+        """Adds the new version of a note to its history, in the current transaction."""
+        content = content or ''
+        if title == note.title and content == (note.content or ''):
+            return
+        settings = self.history_settings
+        chain = self._revision_chain(note.id)
+        if not chain:
+            # History starts with the version before the first change
+            chain = [NoteRevision(note_id=note.id, revision=1, created_at=note.updated_at or now,
+                                  title=note.title, is_snapshot=True, data=note.content or '')]
+            self._session.add(chain[0])
+        texts = self._replay(chain)
+        last = chain[-1]
+        if last.revision > 1 and (now - last.created_at).total_seconds() < settings.merge_seconds:
+            # Part of a burst of edits: fold into the previous revision
+            last.title = title
+            last.data = content if last.is_snapshot else \
+                history.encode_delta(history.make_delta(texts[-2], content))
+            last.created_at = now
+            return
+        revision = last.revision + 1
+        data, is_snapshot = content, True
+        if (revision - 1) % settings.snapshot_interval:
+            delta = history.encode_delta(history.make_delta(texts[-1], content))
+            if len(delta) < len(content):
+                data, is_snapshot = delta, False
+        self._session.add(NoteRevision(note_id=note.id, revision=revision, created_at=now,
+                                      title=title, is_snapshot=is_snapshot, data=data))
+        oldest = self._session.query(func.min(NoteRevision.revision)).filter(
+            NoteRevision.note_id == note.id).scalar()
+        # Pruning rewrites a snapshot, so only do it once per snapshot interval
+        if revision - oldest + 1 >= settings.max_revisions + settings.snapshot_interval:
+            self._prune_note_history(note.id, revision - settings.max_revisions + 1)
+
+    def _prune_note_history(self, note_id: int, first_kept: int) -> int:
+        """Deletes revisions before first_kept, which becomes a snapshot."""
+        self._session.flush()
+        chain = self._revision_chain(note_id, first_kept)
+        if not chain or chain[-1].revision != first_kept:
+            return 0
+        kept = chain[-1]
+        if not kept.is_snapshot:
+            kept.data = self._replay(chain)[-1]
+            kept.is_snapshot = True
+        return self._session.query(NoteRevision).filter(
+            NoteRevision.note_id == note_id, NoteRevision.revision < first_kept
+        ).delete(synchronize_session='evaluate')
+
+    @timed
+    def get_history(self, note_id: int) -> List[RevisionInfo]:
+        """Revisions of a note, newest first, without their text."""
+        with self.unit_of_work() as session:
+            rows = session.query(
+                NoteRevision.revision, NoteRevision.created_at, NoteRevision.title, NoteRevision.is_snapshot
+            ).filter(NoteRevision.note_id == note_id).order_by(NoteRevision.revision.desc()).all()
+        return [RevisionInfo(*row) for row in rows]
+
+    @timed
+    def get_revision(self, note_id: int, revision: int) -> Optional[Tuple[str, str]]:
+        """(title, content) of a note as of the given revision."""
+        with self.unit_of_work():
+            chain = self._revision_chain(note_id, revision)
+            if not chain or chain[-1].revision != revision:
+                return None
+            return chain[-1].title, self._replay(chain)[-1]
+
+    @timed
+    def restore_revision(self, note_id: int, revision: int) -> bool:
+        """Makes an old revision current again; this is itself a new revision."""
+        old = self.get_revision(note_id, revision)
+        if old is None:
+            return False
+        return self.update_note(note_id, *old)
+
+    @timed
+    def prune_history(self, max_revisions: Optional[int] = None) -> int:
+        """Keeps at most max_revisions per note; returns the number deleted."""
+        keep = max_revisions or self.history_settings.max_revisions
+        with self.unit_of_work() as session:
+            rows = session.query(
+                NoteRevision.note_id, func.max(NoteRevision.revision)
+            ).group_by(NoteRevision.note_id).having(
+                func.max(NoteRevision.revision) - func.min(NoteRevision.revision) + 1 > keep
+            ).all()
+            deleted = 0
+            for note_id, last in rows:
+                deleted += self._prune_note_history(note_id, last - keep + 1)
+            self._commit()
+        return deleted
+
+    # --- Export ---
+    def iter_export_records(self, batch_size: int = 1000) -> Iterator[dict]:
+        """Streams every note as an import-compatible record, body included.
 
-    def __del__(self):
-        self.session.close() 
\ No newline at end of file
+        Rows are fetched batch_size at a time and never collected into a
+        list, so memory use does not grow with the number of notes. Notes are
+        grouped by category name, oldest first within each category; that
+        order is read straight off ix_notes_category_updated, with no sort.
+        The unit of work lasts until the iteration ends."""
+        with self.unit_of_work() as session:
+            categories = session.query(Category.id, Category.name).order_by(Category.name).all()
+            for category_id, category_name in categories:
+                query = session.query(
+                    Note.id, Note.title, Note.content, Note.created_at, Note.updated_at
+                ).filter(Note.category_id == category_id).order_by(Note.updated_at, Note.id)
+                for note_id, title, content, created_at, updated_at in query.yield_per(batch_size):
+                    yield {
+                        'id': note_id,
+                        'title': title,
+                        'content': content or '',
+                        'category': category_name,
+                        'created_at': created_at.isoformat() if created_at else None,
+                        'updated_at': updated_at.isoformat() if updated_at else None,
+                    } 
@@ -0,0 +1,269 @@
+"""Scriptable note operations: the CLI subcommands and `python main.py batch`.
+
+Each operation takes a NoteManager and a dict of arguments (one line of
+batch input, or a subcommand's options) and returns JSON-ready data in the
+shapes of serializers.py, the same as the HTTP API. OperationError is a
+failure of that one operation (a bad argument, an unknown id); anything
+else raised is a database error.
+
+Batch input is NDJSON, one operation per line:
+
+    {"op": "add", "title": "...", "content": "...", "category": "Work"}
+    {"op": "get", "id": 12}
+    {"op": "update", "id": 12, "content": "..."}
+    {"op": "delete", "id": 12}
+    {"op": "search", "query": "...", "category_id": 3, "limit": 20}
+    {"op": "list", "category_id": 3, "limit": 20, "cursor": "..."}
+    {"op": "categories"}
+    {"op": "add_category", "name": "Work"}
+    {"op": "rename_category", "id": 3, "name": "Home"}
+    {"op": "delete_category", "id": 3}
+
+search and list return one page, newest first: {"items", "next_cursor"};
+pass next_cursor back as "cursor" for the next page (see pagination.py).
+
+run_batch() executes the lines chunk_size at a time, each chunk in one
+transaction (NoteManager.batch()), so a large batch pays for one commit
+per chunk instead of one per note.
+"""
+import json
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from note_manager import DEFAULT_CATEGORY_NAME, NoteManager
+from pagination import Page, decode_cursor
+from serializers import category_dict, category_summary_dict, note_dict, summary_dict
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_LIMIT = 50
+
+_TYPE_NAMES = {int: "an integer", str: "a string"}
+
+
+class OperationError(Exception):
+    """One operation failed; the others in its batch are not affected."""
+
+
+OPERATIONS: Dict[str, Callable[[NoteManager, dict], object]] = {}
+
+
+def operation(name: str):
+    def register(func):
+        OPERATIONS[name] = func
+        return func
+    return register
+
+
+def _field(args: dict, name: str, type_, required: bool = False, default=None):
+    value = args.get(name)
+    if value is None:
+        if required:
+            raise OperationError(f"missing field: {name}")
+        return default
+    # bool is an int subclass; true is not a note id
+    if not isinstance(value, type_) or (type_ is int and isinstance(value, bool)):
+        raise OperationError(f"{name} must be {_TYPE_NAMES[type_]}")
+    return value
+
+
+def _text(args: dict, name: str, required: bool = False) -> Optional[str]:
+    """A string field that must not be blank; returned stripped."""
+    value = _field(args, name, str, required)
+    if value is not None and not value.strip():
+        raise OperationError(f"{name} must not be empty")
+    return value.strip() if value is not None else None
+
+
+def _limit(args: dict) -> int:
+    limit = _field(args, 'limit', int, default=DEFAULT_LIMIT)
+    if limit < 1:
+        raise OperationError("limit must be positive")
+    return limit
+
+
+def _cursor(args: dict) -> Optional[str]:
+    cursor = _field(args, 'cursor', str)
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise OperationError("invalid cursor")
+    return cursor or None
+
+
+def _page_dict(page: Page) -> dict:
+    return {'items': [summary_dict(s) for s in page.items], 'next_cursor': page.next_cursor}
+
+
+def _category_id(manager: NoteManager, args: dict, create: bool = False) -> Optional[int]:
+    """The category given as category_id or by name (category); None if neither.
+
+    With create=True an unknown name is created, as import does."""
+    category_id = _field(args, 'category_id', int)
+    if category_id is not None:
+        if manager.get_category_by_id(category_id) is None:
+            raise OperationError(f"category not found: {category_id}")
+        return category_id
+    name = _text(args, 'category')
+    if name is None:
+        return None
+    for category in manager.get_all_categories():
+        if category.name == name:
+            return category.id
+    if not create:
+        raise OperationError(f"category not found: {name}")
+    category = manager.add_category(name)
+    if category is None:
+        raise OperationError(f"could not create category: {name}")
+    return category.id
+
+
+def _existing_note(manager: NoteManager, args: dict):
+    note_id = _field(args, 'id', int, required=True)
+    note = manager.find_note_by_id(note_id)
+    if note is None:
+        raise OperationError(f"note not found: {note_id}")
+    return note
+
+
+@operation('add')
+def add(manager: NoteManager, args: dict) -> dict:
+    title = _text(args, 'title', required=True)
+    content = _field(args, 'content', str, default='')
+    category_id = _category_id(manager, args, create=True)
+    if category_id is None:
+        category_id = _category_id(manager, {'category': DEFAULT_CATEGORY_NAME}, create=True)
+    return note_dict(manager.add_note(title, content, category_id))
+
+
+@operation('get')
+def get(manager: NoteManager, args: dict) -> dict:
+    return note_dict(_existing_note(manager, args))
+
+
+@operation('update')
+def update(manager: NoteManager, args: dict) -> dict:
+    """Changes the fields given (title, content, category_id or category); keeps the rest."""
+    note = _existing_note(manager, args)
+    title = _text(args, 'title')
+    content = _field(args, 'content', str)
+    category_id = _category_id(manager, args)
+    if title is None and content is None and category_id is None:
+        raise OperationError("nothing to update: give title, content or a category")
+    manager.update_note(note.id,
+                        title if title is not None else note.title,
+                        content if content is not None else note.content,
+                        category_id)
+    return note_dict(manager.find_note_by_id(note.id)) # note is the copy read before the update
+
+
+@operation('delete')
+def delete(manager: NoteManager, args: dict) -> dict:
+    note_id = _field(args, 'id', int, required=True)
+    if not manager.delete_note(note_id):
+        raise OperationError(f"note not found: {note_id}")
+    return {'id': note_id}
+
+
+@operation('search')
+def search(manager: NoteManager, args: dict) -> dict:
+    """Notes containing query, most recently updated first."""
+    keyword = _text(args, 'query', required=True)
+    return _page_dict(manager.search_note_summaries_page(
+        keyword, _category_id(manager, args), _cursor(args), _limit(args)))
+
+
+@operation('list')
+def list_notes(manager: NoteManager, args: dict) -> dict:
+    """The most recently updated notes, optionally of one category."""
+    return _page_dict(manager.get_note_summaries_page(
+        _category_id(manager, args), _cursor(args), _limit(args)))
+
+
+@operation('categories')
+def categories(manager: NoteManager, args: dict) -> list:
+    return [category_summary_dict(c) for c in manager.get_category_summaries()]
+
+
+@operation('add_category')
+def add_category(manager: NoteManager, args: dict) -> dict:
+    name = _text(args, 'name', required=True)
+    category = manager.add_category(name)
+    if category is None:
+        raise OperationError(f"category already exists: {name}")
+    return category_dict(category)
+
+
+@operation('rename_category')
+def rename_category(manager: NoteManager, args: dict) -> dict:
+    category_id = _category_id(manager, {'category_id': _field(args, 'id', int, required=True)})
+    name = _text(args, 'name', required=True)
+    if not manager.update_category_name(category_id, name):
+        raise OperationError(f"category already exists: {name}")
+    return {'id': category_id, 'name': name}
+
+
+@operation('delete_category')
+def delete_category(manager: NoteManager, args: dict) -> dict:
+    """Deletes the category and every note in it."""
+    category_id = _field(args, 'id', int, required=True)
+    if not manager.delete_category(category_id):
+        raise OperationError(f"category not found: {category_id}")
+    return {'id': category_id}
+
+
+def run_operation(manager: NoteManager, args: dict):
+    """Runs args['op'] with the other fields of args; returns its result."""
+    if not isinstance(args, dict):
+        raise OperationError("expected a JSON object")
+    handler = OPERATIONS.get(args.get('op'))
+    if handler is None:
+        raise OperationError(f"unknown op: {args.get('op')!r} (one of {', '.join(OPERATIONS)})")
+    return handler(manager, args)
+
+
+def _run_line(manager: NoteManager, number: int, line: str) -> dict:
+    try:
+        args = json.loads(line)
+    except ValueError as e:
+        return {'line': number, 'ok': False, 'error': f"invalid JSON: {e}"}
+    try:
+        return {'line': number, 'ok': True, 'result': run_operation(manager, args)}
+    except OperationError as e:
+        return {'line': number, 'ok': False, 'error': str(e)}
+
+
+def run_batch(manager: NoteManager, lines: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE,
+              keep_going: bool = False) -> Iterator[List[dict]]:
+    """Runs NDJSON operations; yields the results of each chunk once it has committed.
+
+    There is one result per non-blank line, in input order, with its line
+    number: {"line", "ok": true, "result"} or {"line", "ok": false, "error"}.
+    A failed operation does not affect the rest of its chunk. A database
+    error rolls the whole chunk back: every operation in it is reported
+    failed, and the run stops there unless keep_going is set (later lines
+    may depend on the lost writes)."""
+    numbered = ((number, line) for number, line in enumerate(lines, 1) if line.strip())
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        results = []
+        try:
+            with manager.batch():
+                for number, line in chunk:
+                    results.append(_run_line(manager, number, line))
+        except Exception as e:
+            message = str(e).splitlines()[0] if str(e) else '' # SQLAlchemy appends the SQL
+            reason = f"{type(e).__name__}: {message}"
+            failed = [{'line': r['line'], 'ok': False, 'error': f"rolled back ({reason})"}
+                      if r['ok'] else r for r in results]
+            if len(results) < len(chunk): # The operation that raised
+                failed.append({'line': chunk[len(results)][0], 'ok': False, 'error': reason})
+            failed.extend({'line': number, 'ok': False, 'error': f"rolled back ({reason})"}
+                          for number, _ in chunk[len(failed):])
+            yield failed
+            if not keep_going:
+                return
+            continue
+        yield results
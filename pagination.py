@@ -0,0 +1,39 @@
+"""Keyset pagination over notes ordered newest first.
+
+A page ends with a cursor: the (updated_at, id) of its last row, encoded as
+an opaque URL-safe string. The next page is read with a seek predicate,
+WHERE (updated_at, id) < cursor, walking the (updated_at, id) indexes from
+that point, so page 500 costs what page 1 does, unlike OFFSET. Rows written
+between two requests do not shift later pages: nothing is skipped or
+repeated, and new notes show up at the start of the order.
+"""
+import base64
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 200
+
+Position = Tuple[datetime, int] # (updated_at, id) of a row
+
+
+class Page(NamedTuple):
+    items: List # Note or NoteSummary rows, newest first
+    next_cursor: Optional[str] # None on the last page
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def encode_cursor(updated_at: datetime, note_id: int) -> str:
+    raw = f"{updated_at.isoformat()}|{note_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Position:
+    """Raises ValueError for anything encode_cursor did not produce."""
+    try:
+        updated_at, note_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(updated_at), int(note_id)
+    except (ValueError, UnicodeError, TypeError, AttributeError):
+        raise ValueError(f"invalid cursor: {cursor!r}") from None
@@ -0,0 +1,67 @@
+"""Quick switcher (Ctrl+P): jump to a note by typing part of its title."""
+from PyQt5.QtCore import QEvent, Qt
+from PyQt5.QtWidgets import QDialog, QLabel, QLineEdit, QListWidget, QListWidgetItem, QVBoxLayout
+
+RESULT_LIMIT = 50
+
+# Keys typed into the query box that move the selection in the list instead
+_NAVIGATION_KEYS = {Qt.Key_Up, Qt.Key_Down, Qt.Key_PageUp, Qt.Key_PageDown}
+
+
+class QuickSwitcher(QDialog):
+    """Lists the notes whose titles match the query as it is typed; accepting sets selected_note_id.
+
+    Matches come from the in-memory title index (title_index.py), by title
+    or by pinyin initials, so typing does not query the database."""
+
+    def __init__(self, title_index, parent=None):
+        super().__init__(parent)
+        self.title_index = title_index
+        self.selected_note_id = None
+        self.setWindowTitle('快速打开')
+        self.resize(700, 520)
+
+        layout = QVBoxLayout(self)
+        self.query_input = QLineEdit()
+        self.query_input.setPlaceholderText('输入标题或拼音首字母，回车打开...')
+        self.query_input.textChanged.connect(self.update_results)
+        self.query_input.returnPressed.connect(self.open_selected)
+        self.query_input.installEventFilter(self)
+        self.result_list = QListWidget()
+        self.result_list.setUniformItemSizes(True)
+        self.result_list.itemActivated.connect(self.open_selected)
+        self.status_label = QLabel()
+        layout.addWidget(self.query_input)
+        layout.addWidget(self.result_list)
+        layout.addWidget(self.status_label)
+
+        self.update_results('')
+
+    def update_results(self, query: str):
+        matches = (self.title_index.search(query, RESULT_LIMIT) if query.strip()
+                   else self.title_index.recent(RESULT_LIMIT))
+        self.result_list.clear()
+        for match in matches:
+            item = QListWidgetItem(match.title)
+            item.setData(Qt.UserRole, match.note_id)
+            self.result_list.addItem(item)
+        if matches:
+            self.result_list.setCurrentRow(0)
+        if not query.strip():
+            self.status_label.setText(f'最近修改的笔记（共 {len(self.title_index)} 条）')
+        else:
+            self.status_label.setText(f'前 {RESULT_LIMIT} 条匹配' if len(matches) >= RESULT_LIMIT
+                                      else f'{len(matches)} 条匹配' if matches else '没有匹配的笔记')
+
+    def eventFilter(self, watched, event):
+        if watched is self.query_input and event.type() == QEvent.KeyPress and event.key() in _NAVIGATION_KEYS:
+            self.result_list.keyPressEvent(event)
+            return True
+        return super().eventFilter(watched, event)
+
+    def open_selected(self, item: QListWidgetItem = None):
+        item = item or self.result_list.currentItem()
+        if item is None:
+            return
+        self.selected_note_id = item.data(Qt.UserRole)
+        self.accept()
@@ -0,0 +1,216 @@
+"""SQLite FTS5 full-text index over notes.title / notes.content.
+
+The index is a contentless FTS5 table (content='') using the ``trigram``
+tokenizer, so that Chinese text (which has no whitespace word boundaries)
+can be matched by substring. When the SQLite build lacks FTS5 or the
+trigram tokenizer, search falls back to LIKE.
+
+Bodies may be stored compressed (see compression.py), so the index is not
+kept by triggers on notes: NoteManager adds and removes rows itself, in the
+transaction of each write, with the plaintext it already has in hand. The
+database therefore stays writable by any SQLite client; notes written
+outside the application are only searchable after rebuild_search_index
+(`python main.py reindex`). A contentless table stores no text, so rows
+are removed with the FTS5 'delete' command, which needs the values that
+were indexed.
+"""
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text, table, column, literal_column, func
+
+from compression import decompress_text
+
+FTS_TABLE = 'notes_fts'
+
+# Trigram tokens are three characters long, so shorter keywords cannot be
+# answered by the index and must use LIKE instead.
+MIN_KEYWORD_LENGTH = 3
+
+# bm25() weights for (title, content): a hit in the title counts more.
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+# The parameters of FTS5's bm25() (fts5_aux.c)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Notes read and indexed per statement by rebuild_search_index
+BACKFILL_BATCH = 500
+
+notes_fts = table(FTS_TABLE, column('rowid'))
+
+_CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+    title, content,
+    content='',
+    tokenize='trigram'
+)
+"""
+
+# Kept the index up to date before version 7 of the schema (see migrations.py)
+_LEGACY_TRIGGER_NAMES = ['notes_fts_ai', 'notes_fts_ad', 'notes_fts_au']
+
+_INSERT = text(f"INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (:id, :title, :content)")
+_DELETE = text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) "
+               f"VALUES ('delete', :id, :title, :content)")
+
+# (note id, title, body plaintext)
+IndexedText = Tuple[int, str, str]
+
+
+def _table_exists(conn, name: str) -> bool:
+    row = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': name}
+    ).first()
+    return row is not None
+
+
+def index_exists(conn) -> bool:
+    """Whether the FTS table has been created (read-only check for start-up)."""
+    return _table_exists(conn, FTS_TABLE)
+
+
+def _params(notes: Iterable[IndexedText]) -> list:
+    return [{'id': note_id, 'title': title, 'content': content or ''}
+            for note_id, title, content in notes]
+
+
+def add_to_index(conn, notes: Iterable[IndexedText]):
+    """Indexes new or rewritten notes; conn may be a Connection or a Session."""
+    params = _params(notes)
+    if params:
+        conn.execute(_INSERT, params)
+
+
+def remove_from_index(conn, notes: Iterable[IndexedText]):
+    """Unindexes notes, given the title and body they were indexed with."""
+    params = _params(notes)
+    if params:
+        conn.execute(_DELETE, params)
+
+
+def _backfill(conn):
+    """Indexes every note, BACKFILL_BATCH at a time in id order."""
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, title, content FROM notes WHERE id > :last ORDER BY id LIMIT :limit"
+        ), {'last': last_id, 'limit': BACKFILL_BATCH}).fetchall()
+        if not rows:
+            break
+        add_to_index(conn, [(note_id, title, decompress_text(stored))
+                            for note_id, title, stored in rows])
+        last_id = rows[-1][0]
+
+
+def rebuild_search_index(conn) -> bool:
+    """Recreates the FTS table from the notes, in the caller's transaction.
+
+    Also drops the triggers that maintained the index in older schema
+    versions. Returns False if SQLite lacks FTS5/trigram."""
+    for name in _LEGACY_TRIGGER_NAMES:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    try:
+        conn.execute(text(_CREATE_TABLE))
+    except Exception:
+        return False # FTS5 or the trigram tokenizer is not compiled in
+    _backfill(conn)
+    return True
+
+
+def ensure_search_index(engine) -> bool:
+    """Creates the FTS table if needed.
+
+    The first time the table is created, existing notes are backfilled into
+    it, so older notes.db files become searchable without manual steps.
+    Returns True if the index is usable, False if SQLite lacks FTS5/trigram."""
+    with engine.begin() as conn:
+        if _table_exists(conn, FTS_TABLE):
+            return True
+        return rebuild_search_index(conn)
+
+
+class IndexTotals(NamedTuple):
+    """What bm25() knows about the whole index: the average note length."""
+    rows: int
+    tokens: int # Over all columns
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    # SQLite's varint: 7 bits per byte, high bit set on all but the last;
+    # a ninth byte contributes all 8 bits
+    value = 0
+    for i in range(9):
+        byte = data[pos]
+        pos += 1
+        if i == 8:
+            return (value << 8) | byte, pos
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return value, pos
+
+
+def read_index_totals(conn) -> Optional[IndexTotals]:
+    """Row and token counts of the index, as bm25() reads them; None if unknown."""
+    # FTS5's "averages" record, row 1 of its data table: the number of rows,
+    # then the number of tokens in each column
+    block = conn.execute(text(f"SELECT block FROM {FTS_TABLE}_data WHERE id = 1")).scalar()
+    if not block:
+        return None
+    rows, pos = _read_varint(block, 0)
+    tokens = 0
+    while pos < len(block):
+        count, pos = _read_varint(block, pos)
+        tokens += count
+    return IndexTotals(rows, tokens) if rows else None
+
+
+def token_count(value: str) -> int:
+    """Number of trigram tokens the index holds for a column value."""
+    return max(0, len(value) - 2)
+
+
+def _occurrences(folded_text: str, folded_keyword: str) -> int:
+    # Every position the phrase matches at, overlapping ones included
+    count = 0
+    pos = folded_text.find(folded_keyword)
+    while pos >= 0:
+        count += 1
+        pos = folded_text.find(folded_keyword, pos + 1)
+    return count
+
+
+def bm25_score(folded_keyword: str, folded_title: str, folded_content: str,
+               tokens: int, totals: IndexTotals) -> float:
+    """rank_order() of one note, computed in memory (smaller is more relevant).
+
+    Texts are case-folded; tokens is token_count() of the title plus that
+    of the content. bm25() also multiplies by the keyword's IDF, a positive
+    factor common to every note, so the order of notes is the same."""
+    frequency = (TITLE_WEIGHT * _occurrences(folded_title, folded_keyword)
+                 + CONTENT_WEIGHT * _occurrences(folded_content, folded_keyword))
+    average = totals.tokens / totals.rows
+    return -1.0 * (frequency * (BM25_K1 + 1.0)) / (
+        frequency + BM25_K1 * (1 - BM25_B + BM25_B * tokens / average))
+
+
+def can_use_index(keyword: str) -> bool:
+    """Whether the keyword is long enough to be answered by the trigram index."""
+    return len(keyword) >= MIN_KEYWORD_LENGTH
+
+
+def match_expression(keyword: str) -> str:
+    """Quotes the keyword as a single FTS5 phrase (a plain substring match)."""
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def match_clause(keyword: str):
+    """WHERE clause restricting notes_fts to rows containing the keyword."""
+    return literal_column(FTS_TABLE).op('MATCH')(match_expression(keyword))
+
+
+def rank_order():
+    """BM25 relevance for ORDER BY (smaller is more relevant)."""
+    return func.bm25(literal_column(FTS_TABLE), TITLE_WEIGHT, CONTENT_WEIGHT)
@@ -0,0 +1,125 @@
+"""Incremental search: narrows earlier result sets in memory as the query grows.
+
+Keyword search is a substring match, so every note containing "项目计"
+also contains "项目". SearchSession remembers recent result sets together
+with the text of their notes; when a new keyword contains an earlier one
+(same category, or an earlier all-categories search) the earlier set is
+filtered in memory and SQLite is not queried at all. Deleting characters
+goes back to a keyword already in the bounded history. Result sets larger
+than max_candidates are not remembered, since those searches are cheap to
+rerun compared to holding every note body in memory.
+
+Results do not depend on how the query was typed: a refined set is ordered
+as a fresh search would be. A keyword the database ranks by relevance is
+scored in memory with the same BM25 formula (search_index.bm25_score),
+which needs the index totals remembered with the last result set; other
+keywords are ordered newest first. The session holds copies of note text,
+so it must be reset after any write.
+"""
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import search_index
+from models import NoteSummary
+from search_index import IndexTotals
+
+MAX_CANDIDATES = 2000
+HISTORY_SIZE = 16
+
+
+def _searchable(keyword: str) -> bool:
+    # % and _ are wildcards in the LIKE fallback, so not plain substrings
+    return bool(keyword) and '%' not in keyword and '_' not in keyword
+
+
+def _fold(text: str) -> str:
+    # SQLite's LIKE and the trigram tokenizer both match case-insensitively
+    return text.casefold()
+
+
+class _NoteText(NamedTuple):
+    title: str # Folded
+    content: str # Folded
+    tokens: int # Index tokens of title and content, for BM25
+
+
+@dataclass
+class _ResultSet:
+    keyword: str
+    category_id: Optional[int]
+    summaries: List[NoteSummary]
+    texts: Dict[int, _NoteText]
+
+
+class SearchSession:
+    """Bounded history of searches that later searches can be answered from."""
+
+    def __init__(self, max_candidates: int = MAX_CANDIDATES, history_size: int = HISTORY_SIZE,
+                 ranked: Optional[Callable[[str], bool]] = None):
+        self.max_candidates = max_candidates
+        # ranked(keyword): whether the database orders its results by relevance
+        # (NoteManager.ranks_by_relevance); by default every keyword is assumed to be
+        self.ranked = ranked or (lambda keyword: True)
+        self.index_totals: Optional[IndexTotals] = None # Needed to rank in memory
+        self._history = deque(maxlen=history_size)
+        self.hits = 0
+        self.misses = 0
+
+    def wants_texts(self, keyword: str, summaries: List[NoteSummary]) -> bool:
+        """Whether remember() would keep this result set, and so needs its texts."""
+        return _searchable(keyword) and len(summaries) <= self.max_candidates
+
+    def lookup(self, keyword: str, category_id: Optional[int] = None) -> Optional[List[NoteSummary]]:
+        """Results answered from memory, or None if the database must be searched."""
+        if not _searchable(keyword):
+            return None
+        folded = _fold(keyword)
+        ranked = self.ranked(keyword)
+        for entry in reversed(self._history):
+            if entry.category_id not in (None, category_id) or entry.keyword not in folded:
+                continue
+            if ranked and entry.keyword != folded and self.index_totals is None:
+                continue # Cannot be ranked in memory
+            self.hits += 1
+            if entry.keyword == folded and entry.category_id == category_id:
+                self._history.remove(entry)
+                self._history.append(entry) # Most recently used last
+                return list(entry.summaries)
+            summaries = [s for s in entry.summaries
+                         if (category_id is None or s.category_id == category_id)
+                         and (folded in entry.texts[s.id].title or folded in entry.texts[s.id].content)]
+            if entry.keyword != folded:
+                # Newest first, like the LIKE search for this keyword ...
+                summaries.sort(key=lambda s: (s.updated_at, s.id), reverse=True)
+                if ranked:
+                    # ... or by rank, ties newest first (a stable sort keeps them so)
+                    summaries.sort(key=lambda s: search_index.bm25_score(
+                        folded, *entry.texts[s.id], self.index_totals))
+            self._history.append(_ResultSet(
+                folded, category_id, summaries, {s.id: entry.texts[s.id] for s in summaries}))
+            return list(summaries)
+        self.misses += 1
+        return None
+
+    def remember(self, keyword: str, category_id: Optional[int], summaries: List[NoteSummary],
+                 texts: Dict[int, tuple], index_totals: Optional[IndexTotals] = None):
+        """Records a database result; texts maps note id to (title, content).
+
+        index_totals (NoteManager.get_search_index_totals) lets later
+        keywords that are ranked by relevance be answered from this set."""
+        if not self.wants_texts(keyword, summaries):
+            return
+        if index_totals is not None:
+            self.index_totals = index_totals
+        note_texts = {}
+        for s in summaries:
+            title, content = texts.get(s.id, ('', ''))
+            note_texts[s.id] = _NoteText(_fold(title), _fold(content),
+                                         search_index.token_count(title) + search_index.token_count(content))
+        self._history.append(_ResultSet(_fold(keyword), category_id, list(summaries), note_texts))
+
+    def reset(self):
+        """Forgets all result sets, e.g. after notes were added, edited or deleted."""
+        self._history.clear()
+        self.index_totals = None
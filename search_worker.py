@@ -0,0 +1,214 @@
+"""Debounced background search for the GUI search boxes.
+
+Keystrokes are collected by SearchScheduler; once the user pauses for the
+debounce window the query runs on a worker thread with its own DB session.
+Every new request cancels the one in flight (the SQLite query is interrupted
+through a progress handler) and only the newest result is delivered.
+Searches that narrow an earlier one are answered by the scheduler's
+SearchSession without a worker or a query; the note text it needs for that
+is read after the results are delivered, so it adds nothing to the time a
+search takes to show. A search that fails (rather than
+being cancelled) is logged and reported through search_failed, so that an
+error does not look like "no matches".
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from models import ScopedSession
+from note_manager import NoteManager
+from search_session import SearchSession
+
+DEBOUNCE_MS = 250
+# Number of SQLite VM instructions between two cancellation checks.
+PROGRESS_INTERVAL = 1000
+
+logger = logging.getLogger('noteapp.search')
+
+_local = threading.local()
+
+
+def _thread_manager() -> NoteManager:
+    """The NoteManager of this pool thread, over its thread-local ScopedSession.
+
+    Built once per thread rather than per search: the constructor checks
+    for the default category, a query no keystroke should pay for. Search
+    reads are not cached, so a long-lived manager never serves stale ones."""
+    manager = getattr(_local, 'manager', None)
+    if manager is None:
+        manager = _local.manager = NoteManager(ScopedSession)
+    return manager
+
+
+@dataclass(frozen=True)
+class SearchRequest:
+    keyword: str
+    category_id: Optional[int] = None # None means search all categories
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class _SearchTask(QRunnable):
+    def __init__(self, request: SearchRequest, generation: int, epoch: int,
+                 cancelled: threading.Event, done_signal, failed_signal, texts_signal, wants_texts):
+        super().__init__()
+        self.request = request
+        self.wants_texts = wants_texts
+        self.generation = generation
+        self.epoch = epoch
+        self.cancelled = cancelled
+        self.done_signal = done_signal
+        self.failed_signal = failed_signal
+        self.texts_signal = texts_signal
+
+    def run(self):
+        if self.cancelled.is_set():
+            return
+        manager = _thread_manager() # Never shared with the GUI thread
+        try:
+            # One unit of work: the queries run on the connection that has the handler
+            with manager.unit_of_work() as session:
+                dbapi_conn = session.connection().connection
+                dbapi_conn.set_progress_handler(
+                    lambda: 1 if self.cancelled.is_set() else 0, PROGRESS_INTERVAL)
+                try:
+                    results = self._search(manager)
+                finally:
+                    dbapi_conn.set_progress_handler(None, 0)
+                if self.cancelled.is_set():
+                    raise SearchCancelled()
+                self.done_signal.emit(self.generation, results)
+                self._load_texts(manager, results)
+        except Exception as e:
+            if self.cancelled.is_set():
+                return # Interrupted by the progress handler; a newer request owns the list now
+            logger.exception("search for %r failed", self.request.keyword)
+            # The DBAPI error, without the SQL that SQLAlchemy appends
+            self.failed_signal.emit(self.generation, str(getattr(e, 'orig', None) or e))
+        finally:
+            ScopedSession.remove()
+
+    def _load_texts(self, manager: NoteManager, results):
+        """Note text for the session to refine these results from as typing continues.
+
+        Not interrupted by the next keystroke, which is when it is needed;
+        a failure only costs the session this result set."""
+        if not self.wants_texts(self.request.keyword, results):
+            return
+        try:
+            texts = manager.get_note_texts(s.id for s in results)
+            totals = manager.get_search_index_totals()
+        except Exception:
+            logger.exception("reading note text for %r failed", self.request.keyword)
+            return
+        self.texts_signal.emit(self.request, self.epoch, results, texts, totals)
+
+    def _search(self, manager: NoteManager):
+        if self.request.category_id is None:
+            return manager.search_all_note_summaries(self.request.keyword)
+        return manager.search_note_summaries(self.request.keyword, self.request.category_id)
+
+
+class SearchScheduler(QObject):
+    """Runs at most one search at a time and only reports the latest one."""
+
+    results_ready = pyqtSignal(object, object) # (SearchRequest, List[NoteSummary])
+    search_failed = pyqtSignal(object, str) # (SearchRequest, error message)
+    _task_done = pyqtSignal(int, object)
+    _task_failed = pyqtSignal(int, str)
+    _texts_loaded = pyqtSignal(object, int, object, object, object)
+
+    def __init__(self, parent=None, debounce_ms: int = DEBOUNCE_MS, ranked=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self._start_pending)
+        self._task_done.connect(self._on_task_done)
+        self._task_failed.connect(self._on_task_failed)
+        self._texts_loaded.connect(self._on_texts_loaded)
+        self._generation = 0
+        self._epoch = 0 # Counts invalidate() calls: older note text is stale
+        self._pending: Optional[SearchRequest] = None
+        self._requests = {}
+        self._cancel_event: Optional[threading.Event] = None
+        # ranked: NoteManager.ranks_by_relevance, so remembered results are ordered as fresh ones
+        self.session = SearchSession(ranked=ranked)
+
+    def schedule(self, request: SearchRequest):
+        """Queues a search to start once typing pauses."""
+        self.cancel()
+        if self._answer_from_session(request):
+            return
+        self._pending = request
+        self._timer.start()
+
+    def run_now(self, request: SearchRequest):
+        """Starts a search immediately, skipping the debounce window."""
+        self.cancel()
+        if self._answer_from_session(request):
+            return
+        self._pending = request
+        self._start_pending()
+
+    def invalidate(self):
+        """Forgets remembered results; call after notes change."""
+        self._epoch += 1
+        self.session.reset()
+
+    def _answer_from_session(self, request: SearchRequest) -> bool:
+        results = self.session.lookup(request.keyword, request.category_id)
+        if results is None:
+            return False
+        self.results_ready.emit(request, results)
+        return True
+
+    def cancel(self):
+        """Drops the pending search and interrupts the one in flight."""
+        self._timer.stop()
+        self._pending = None
+        self._generation += 1
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+            self._cancel_event = None
+        self._requests.clear()
+
+    def shutdown(self):
+        self.cancel()
+        self._pool.waitForDone()
+
+    def _start_pending(self):
+        if self._pending is None:
+            return
+        request, self._pending = self._pending, None
+        self._cancel_event = threading.Event()
+        self._requests[self._generation] = request
+        self._pool.start(_SearchTask(request, self._generation, self._epoch, self._cancel_event,
+                                     self._task_done, self._task_failed, self._texts_loaded,
+                                     self.session.wants_texts))
+
+    def _on_task_done(self, generation: int, results):
+        request = self._requests.pop(generation, None)
+        if request is None or generation != self._generation:
+            return # Superseded by a newer request
+        self._cancel_event = None
+        self.results_ready.emit(request, results)
+
+    def _on_texts_loaded(self, request: SearchRequest, epoch: int, results, texts, totals):
+        # Even if superseded: a newer keyword may still be refined from these results
+        if epoch == self._epoch:
+            self.session.remember(request.keyword, request.category_id, results, texts, totals)
+
+    def _on_task_failed(self, generation: int, message: str):
+        request = self._requests.pop(generation, None)
+        if request is None or generation != self._generation:
+            return # Superseded by a newer request
+        self._cancel_event = None
+        self.search_failed.emit(request, message)
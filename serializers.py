@@ -0,0 +1,42 @@
+"""JSON shapes of notes and categories, shared by the HTTP API and the CLI's --json output.
+
+Only attributes are read, so ORM objects and NoteSummary rows both work.
+"""
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def summary_dict(summary) -> dict:
+    return {
+        'id': summary.id,
+        'title': summary.title,
+        'updated_at': _isoformat(summary.updated_at),
+        'category_id': summary.category_id,
+        'category_name': summary.category_name,
+    }
+
+
+def note_dict(note) -> dict:
+    return {
+        'id': note.id,
+        'title': note.title,
+        'content': note.content,
+        'created_at': _isoformat(note.created_at),
+        'updated_at': _isoformat(note.updated_at),
+        'category_id': note.category_id,
+    }
+
+
+def category_dict(category) -> dict:
+    return {'id': category.id, 'name': category.name}
+
+
+def category_summary_dict(summary) -> dict:
+    return {
+        'id': summary.id,
+        'name': summary.name,
+        'note_count': summary.note_count,
+        'last_updated_at': _isoformat(summary.last_updated_at),
+    }
@@ -0,0 +1,476 @@
+"""Headless HTTP/JSON API over NoteManager for local tools.
+
+    python main.py serve --port 8765
+
+A small asyncio HTTP/1.1 server (standard library only). Connections are
+kept alive and may pipeline requests: requests on one connection are read
+ahead, and their responses are written back in request order. Consecutive
+safe requests (GET) of a connection are handled concurrently; any other
+request waits for those before it, and those after it wait for it, so a
+pipelined read sees the writes sent ahead of it (RFC 7230, 6.3.2).
+Database work runs on a bounded thread pool; each worker
+thread keeps one NoteManager whose session is closed after every request,
+so connections go back to the engine pool and no state (identity map,
+read cache) outlives a request.
+
+Endpoints (JSON bodies and responses):
+    GET    /health
+    GET    /categories                 -> [{"id", "name", "note_count", "last_updated_at"}]
+    POST   /categories                 {"name"}
+    PATCH  /categories/<id>            {"name"}
+    DELETE /categories/<id>
+    GET    /notes?category_id=&limit=&cursor=     -> {"items", "next_cursor"}
+    POST   /notes                      {"title", "content", "category_id"}
+    GET    /notes/<id>
+    PUT    /notes/<id>                 {"title", "content", "category_id"?}
+    DELETE /notes/<id>
+    GET    /search?q=&category_id=&limit=&cursor= -> {"items", "next_cursor"}
+    GET    /notes/<id>/history
+    GET    /notes/<id>/revisions/<n>
+    POST   /notes/<id>/revisions/<n>/restore
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Callable, List, NamedTuple, Optional, Pattern
+from urllib.parse import parse_qs, urlsplit
+
+import instrumentation
+from bootstrap import init_database
+from models import Session
+from note_manager import NoteManager
+from pagination import Page, decode_cursor
+from serializers import category_dict, category_summary_dict, note_dict, summary_dict
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+# Requests queued for the thread pool beyond the running ones
+QUEUE_PER_WORKER = 8
+# Requests read ahead on one connection while earlier ones are being answered
+MAX_PIPELINE_DEPTH = 16
+# Methods whose requests may run alongside each other (RFC 7231, 4.2.1)
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+logger = logging.getLogger('noteapp.server')
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# Body of a request whose JSON did not parse; only handlers that read the body fail
+INVALID_BODY = object()
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: dict
+    body: Optional[object]
+    keep_alive: bool
+
+
+# --- Routing ---
+
+class Route(NamedTuple):
+    method: str
+    pattern: Pattern
+    handler: Callable # handler(manager, request, *path_ints) -> (status, payload)
+
+
+ROUTES: List[Route] = []
+
+
+def route(method: str, pattern: str):
+    """Registers a handler for method and a path regex (groups become int arguments)."""
+    def register(func):
+        ROUTES.append(Route(method, re.compile(f"^{pattern}$"), func))
+        return func
+    return register
+
+
+def _query_int(request: Request, name: str, default: Optional[int] = None,
+               maximum: Optional[int] = None) -> Optional[int]:
+    values = request.query.get(name)
+    if not values or values[0] == '':
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+    if value < 0:
+        raise HttpError(400, f"{name} must not be negative")
+    return min(value, maximum) if maximum else value
+
+
+def _body_field(request: Request, name: str, required: bool = True):
+    if request.body is INVALID_BODY:
+        raise HttpError(400, "body is not valid JSON")
+    if not isinstance(request.body, dict):
+        raise HttpError(400, "expected a JSON object")
+    if required and name not in request.body:
+        raise HttpError(400, f"missing field: {name}")
+    return request.body.get(name)
+
+
+def _body_id(request: Request, name: str, required: bool = True) -> Optional[int]:
+    value = _body_field(request, name, required)
+    if value is None and not required:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool): # JSON true is an int to Python
+        raise HttpError(400, f"{name} must be an integer")
+    return value
+
+
+def _query_cursor(request: Request) -> Optional[str]:
+    cursor = request.query.get('cursor', [None])[0]
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise HttpError(400, "invalid cursor")
+    return cursor
+
+
+def _page_dict(page: Page) -> dict:
+    return {'items': [summary_dict(s) for s in page.items], 'next_cursor': page.next_cursor}
+
+
+@route('GET', r'/health')
+def _health(manager, request):
+    return 200, {'status': 'ok'}
+
+
+@route('GET', r'/categories')
+def _list_categories(manager, request):
+    return 200, [category_summary_dict(c) for c in manager.get_category_summaries()]
+
+
+@route('POST', r'/categories')
+def _add_category(manager, request):
+    name = _body_field(request, 'name')
+    if not isinstance(name, str) or not name.strip():
+        raise HttpError(400, "name must be a non-empty string")
+    category = manager.add_category(name.strip())
+    if category is None:
+        raise HttpError(409, f"category already exists: {name}")
+    return 201, category_dict(category)
+
+
+@route('PATCH', r'/categories/(\d+)')
+def _rename_category(manager, request, category_id):
+    name = _body_field(request, 'name')
+    if not isinstance(name, str) or not name.strip():
+        raise HttpError(400, "name must be a non-empty string")
+    if manager.get_category_by_id(category_id) is None:
+        raise HttpError(404, "category not found")
+    if not manager.update_category_name(category_id, name.strip()):
+        raise HttpError(409, f"category already exists: {name}")
+    return 200, {'id': category_id, 'name': name.strip()}
+
+
+@route('DELETE', r'/categories/(\d+)')
+def _delete_category(manager, request, category_id):
+    if not manager.delete_category(category_id):
+        raise HttpError(404, "category not found")
+    return 204, None
+
+
+@route('GET', r'/notes')
+def _list_notes(manager, request):
+    category_id = _query_int(request, 'category_id')
+    limit = _query_int(request, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+    page = manager.get_note_summaries_page(category_id, _query_cursor(request), limit)
+    return 200, _page_dict(page)
+
+
+@route('POST', r'/notes')
+def _add_note(manager, request):
+    title = _body_field(request, 'title')
+    content = _body_field(request, 'content', required=False) or ''
+    category_id = _body_id(request, 'category_id')
+    if not isinstance(title, str) or not title.strip():
+        raise HttpError(400, "title must be a non-empty string")
+    note = manager.add_note(title.strip(), content, category_id)
+    if note is None:
+        raise HttpError(404, "category not found")
+    return 201, note_dict(note)
+
+
+@route('GET', r'/notes/(\d+)')
+def _get_note(manager, request, note_id):
+    note = manager.find_note_by_id(note_id)
+    if note is None:
+        raise HttpError(404, "note not found")
+    return 200, note_dict(note)
+
+
+@route('PUT', r'/notes/(\d+)')
+def _update_note(manager, request, note_id):
+    title = _body_field(request, 'title')
+    content = _body_field(request, 'content')
+    category_id = _body_id(request, 'category_id', required=False)
+    if not isinstance(title, str) or not title.strip():
+        raise HttpError(400, "title must be a non-empty string")
+    if manager.find_note_by_id(note_id) is None:
+        raise HttpError(404, "note not found")
+    if not manager.update_note(note_id, title.strip(), content or '', category_id):
+        raise HttpError(404, "category not found")
+    return 200, note_dict(manager.find_note_by_id(note_id))
+
+
+@route('DELETE', r'/notes/(\d+)')
+def _delete_note(manager, request, note_id):
+    if not manager.delete_note(note_id):
+        raise HttpError(404, "note not found")
+    return 204, None
+
+
+@route('GET', r'/search')
+def _search(manager, request):
+    keyword = request.query.get('q', [''])[0].strip()
+    if not keyword:
+        raise HttpError(400, "missing query parameter: q")
+    category_id = _query_int(request, 'category_id')
+    limit = _query_int(request, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+    page = manager.search_note_summaries_page(keyword, category_id, _query_cursor(request), limit)
+    return 200, _page_dict(page)
+
+
+@route('GET', r'/notes/(\d+)/history')
+def _history(manager, request, note_id):
+    return 200, [{'revision': r.revision, 'created_at': r.created_at.isoformat(),
+                  'title': r.title, 'is_snapshot': r.is_snapshot}
+                 for r in manager.get_history(note_id)]
+
+
+@route('GET', r'/notes/(\d+)/revisions/(\d+)')
+def _get_revision(manager, request, note_id, revision):
+    found = manager.get_revision(note_id, revision)
+    if found is None:
+        raise HttpError(404, "revision not found")
+    return 200, {'revision': revision, 'title': found[0], 'content': found[1]}
+
+
+@route('POST', r'/notes/(\d+)/revisions/(\d+)/restore')
+def _restore_revision(manager, request, note_id, revision):
+    if not manager.restore_revision(note_id, revision):
+        raise HttpError(404, "revision not found")
+    return 200, note_dict(manager.find_note_by_id(note_id))
+
+
+def dispatch(manager: NoteManager, request: Request):
+    """Runs the matching handler; returns (status, payload)."""
+    allowed = False
+    for r in ROUTES:
+        match = r.pattern.match(request.path)
+        if not match:
+            continue
+        if r.method != request.method:
+            allowed = True
+            continue
+        return r.handler(manager, request, *(int(g) for g in match.groups()))
+    if allowed:
+        raise HttpError(405, "method not allowed")
+    raise HttpError(404, "no such endpoint")
+
+
+# --- Database workers ---
+
+class Workers:
+    """Bounded thread pool; each thread reuses one NoteManager."""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='noteapp-db')
+        self._slots = asyncio.Semaphore(max_workers * (1 + QUEUE_PER_WORKER))
+        self._local = threading.local()
+
+    def _manager(self) -> NoteManager:
+        manager = getattr(self._local, 'manager', None)
+        if manager is None:
+            manager = self._local.manager = NoteManager(Session)
+        return manager
+
+    def _run(self, request: Request):
+        manager = self._manager()
+        try:
+            return dispatch(manager, request)
+        finally:
+            # Other clients (and the GUI) write too: start every request fresh
+            manager.clear_cache()
+
+    async def run(self, request: Request):
+        async with self._slots: # Backpressure instead of an unbounded queue
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._run, request)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+# --- HTTP ---
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Parses one request; None when the client closed the connection."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise HttpError(400, "incomplete request")
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, "request header too large")
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HttpError(400, "invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "request body too large")
+    body = None
+    if length:
+        raw = await reader.readexactly(length)
+        try:
+            body = json.loads(raw.decode('utf-8'))
+        except ValueError:
+            body = INVALID_BODY
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    url = urlsplit(target)
+    return Request(method.upper(), url.path.rstrip('/') or '/', parse_qs(url.query), body, keep_alive)
+
+
+def _response(status: int, payload, keep_alive: bool) -> bytes:
+    body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    return ("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body
+
+
+class Server:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 workers: int = DEFAULT_WORKERS):
+        self.host = host
+        self.port = port
+        self.max_workers = workers
+        self.workers: Optional[Workers] = None
+        self._server = None
+
+    async def _answer(self, request: Request, after=()) -> bytes:
+        """The response to request, once the answers in after are done."""
+        if after:
+            await asyncio.wait(after) # They never raise: errors become responses
+        try:
+            status, payload = await self.workers.run(request)
+        except HttpError as e:
+            status, payload = e.status, {'error': str(e)}
+        except Exception:
+            logger.exception("%s %s failed", request.method, request.path)
+            status, payload = 500, {'error': "internal server error"}
+        return _response(status, payload, request.keep_alive)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Responses are queued in request order; their tasks run concurrently
+        responses: asyncio.Queue = asyncio.Queue(MAX_PIPELINE_DEPTH)
+
+        async def write_responses():
+            connected = True
+            while True:
+                pending = await responses.get()
+                if pending is None:
+                    return
+                data = await pending
+                if not connected:
+                    continue # Keep draining so the reader never blocks on a full queue
+                try:
+                    writer.write(data)
+                    await writer.drain()
+                except ConnectionError:
+                    connected = False
+
+        writer_task = asyncio.ensure_future(write_responses())
+        # The last write of this connection, and the reads started after it
+        last_write = None
+        reads = []
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HttpError as e:
+                    # The stream position is unknown after a bad request
+                    error = asyncio.get_running_loop().create_future()
+                    error.set_result(_response(e.status, {'error': str(e)}, False))
+                    await responses.put(error)
+                    break
+                if request is None:
+                    break
+                # Only answers still being worked on need waiting for
+                reads = [read for read in reads if not read.done()]
+                running_write = [last_write] if last_write and not last_write.done() else []
+                if request.method in SAFE_METHODS:
+                    answer = asyncio.ensure_future(self._answer(request, running_write))
+                    reads.append(answer)
+                else:
+                    answer = asyncio.ensure_future(self._answer(request, running_write + reads))
+                    last_write, reads = answer, []
+                await responses.put(answer)
+                if not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            await responses.put(None)
+            try:
+                await writer_task
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self):
+        init_database() # Binds Session before the workers open their sessions
+        self.workers = Workers(self.max_workers)
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES)
+        if not self.port:
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self.workers.shutdown()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = DEFAULT_WORKERS):
+    """Runs the server until interrupted."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    logger.info("Serving notes on http://%s:%s with %d database workers", host, port, workers)
+    instrumentation.save_stats_at_exit()
+    try:
+        asyncio.run(Server(host, port, workers).serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,138 @@
+"""SQLite storage configuration: database location, pragmas and engine.
+
+Settings come from, in increasing priority:
+  1. the defaults below,
+  2. the [storage] section of the config file (NOTEAPP_CONFIG, or
+     noteapp.ini in the working directory if it exists),
+  3. the NOTEAPP_DB environment variable for the database path.
+
+Example noteapp.ini:
+
+    [storage]
+    path = D:/notes/notes.db
+    journal_mode = WAL
+    synchronous = NORMAL
+    cache_size = -65536
+    mmap_size = 268435456
+    temp_store = MEMORY
+    compression = zlib
+    compress_min_bytes = 4096
+"""
+import configparser
+import os
+from dataclasses import dataclass, fields, replace
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+from compression import ALGORITHMS, DEFAULT_MIN_BYTES, install_sql_functions
+
+ENV_DB_PATH = 'NOTEAPP_DB'
+ENV_CONFIG_FILE = 'NOTEAPP_CONFIG'
+DEFAULT_CONFIG_FILE = 'noteapp.ini'
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+TEMP_STORES = {'DEFAULT', 'FILE', 'MEMORY'}
+
+
+@dataclass(frozen=True)
+class StorageConfig:
+    path: str = 'notes.db'
+    # WAL lets readers (search workers) run while one writer commits
+    journal_mode: str = 'WAL'
+    # NORMAL is durable across application crashes in WAL mode and avoids
+    # an fsync on every commit
+    synchronous: str = 'NORMAL'
+    cache_size: int = -65536 # negative means KiB: 64 MiB page cache
+    mmap_size: int = 268435456 # 256 MiB of the file read through mmap
+    temp_store: str = 'MEMORY'
+    # Deleting a category or note relies on ON DELETE CASCADE for its notes
+    # and revisions
+    foreign_keys: bool = True
+    pool_size: int = 5
+    # Note bodies of at least compress_min_bytes are stored compressed
+    # ('zlib', 'lzma' or 'none'); see compression.py
+    compression: str = 'zlib'
+    compress_min_bytes: int = DEFAULT_MIN_BYTES
+
+    def __post_init__(self):
+        if self.journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal_mode: {self.journal_mode}")
+        if self.synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown synchronous mode: {self.synchronous}")
+        if self.temp_store.upper() not in TEMP_STORES:
+            raise ValueError(f"Unknown temp_store: {self.temp_store}")
+        if self.compression != 'none' and self.compression not in ALGORITHMS:
+            raise ValueError(f"Unknown compression: {self.compression}")
+
+    @property
+    def url(self) -> str:
+        return f"sqlite:///{self.path}"
+
+    def pragmas(self):
+        """PRAGMA statements applied to every new connection."""
+        return [
+            f"PRAGMA journal_mode={self.journal_mode.upper()}",
+            f"PRAGMA synchronous={self.synchronous.upper()}",
+            f"PRAGMA cache_size={int(self.cache_size)}",
+            f"PRAGMA mmap_size={int(self.mmap_size)}",
+            f"PRAGMA temp_store={self.temp_store.upper()}",
+            f"PRAGMA foreign_keys={'ON' if self.foreign_keys else 'OFF'}",
+        ]
+
+
+def read_config_section(name: str, config_file: str = None) -> dict:
+    """Returns one section of the config file as a dict (empty if absent)."""
+    config_file = config_file or os.environ.get(ENV_CONFIG_FILE) or DEFAULT_CONFIG_FILE
+    parser = configparser.ConfigParser()
+    if parser.read(config_file, encoding='utf-8') and parser.has_section(name):
+        return dict(parser[name])
+    return {}
+
+
+def load_config(config_file: str = None) -> StorageConfig:
+    """Builds the storage configuration from config file and environment."""
+    config = StorageConfig()
+    section = read_config_section('storage', config_file)
+    if section:
+        parser = configparser.ConfigParser()
+        parser.read_dict({'storage': section})
+        section = parser['storage']
+        overrides = {}
+        for field in fields(StorageConfig):
+            if field.name not in section:
+                continue
+            if field.type is bool:
+                overrides[field.name] = section.getboolean(field.name)
+            elif field.type is int:
+                overrides[field.name] = section.getint(field.name)
+            else:
+                overrides[field.name] = section[field.name]
+        config = replace(config, **overrides)
+    if os.environ.get(ENV_DB_PATH):
+        config = replace(config, path=os.environ[ENV_DB_PATH])
+    return config
+
+
+def create_storage_engine(config: StorageConfig):
+    """Creates the engine; pragmas and SQL functions are set up once per pooled connection."""
+    engine = create_engine(
+        config.url,
+        echo=False,
+        # Pooled connections are shared between the GUI thread and workers,
+        # but each is only used by one thread at a time
+        connect_args={'check_same_thread': False},
+        poolclass=QueuePool,
+        pool_size=config.pool_size,
+    )
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for pragma in config.pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+
+    install_sql_functions(engine)
+    return engine
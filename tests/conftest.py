@@ -0,0 +1,16 @@
+import pytest
+
+from diagnostics import count_queries, scratch_manager
+
+
+@pytest.fixture
+def scratch():
+    """(engine, manager) over a fresh seeded in-memory database."""
+    return scratch_manager()
+
+
+@pytest.fixture
+def query_counter(scratch):
+    """count_queries bound to the scratch engine."""
+    engine, _ = scratch
+    return lambda: count_queries(engine)
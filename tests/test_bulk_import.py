@@ -0,0 +1,30 @@
+import pytest
+
+from events import DataReset
+from importers import read_jsonl
+
+
+def test_import_publishes_one_data_reset(scratch):
+    _, manager = scratch
+    events = []
+    manager.events.subscribe(events.append)
+    records = [{'title': f"导入 {i}", 'content': "正文", 'category': f"导入分类{i % 3}"} for i in range(25)]
+    result = manager.bulk_import(records, batch_size=10)
+    assert result.imported == 25 and result.categories_created == 3
+    assert events == [DataReset()]
+    assert sum(c.note_count for c in manager.get_category_summaries()) == 15 + 25
+
+
+def test_jsonl_lines_that_are_not_objects_name_their_line(tmp_path):
+    path = tmp_path / 'notes.jsonl'
+    path.write_text('{"title": "一"}\n\n[1, 2]\n', encoding='utf-8')
+    records = read_jsonl(str(path))
+    assert next(records)['title'] == "一"
+    with pytest.raises(ValueError, match=r":3: expected a JSON object, got list"):
+        next(records)
+
+
+def test_jsonl_null_category_gets_the_default(tmp_path):
+    path = tmp_path / 'notes.jsonl'
+    path.write_text('{"title": "一", "category": null}\n', encoding='utf-8')
+    assert [r['category'] for r in read_jsonl(str(path), default_category="导入")] == ["导入"]
@@ -0,0 +1,8 @@
+def test_renaming_a_category_renames_it_in_cached_notes(scratch):
+    _, manager = scratch
+    category = next(c for c in manager.get_all_categories() if c.note_count)
+    note = manager.get_notes_by_category(category.id)[0]
+    assert manager.find_note_by_id(note.id).category_name == category.name # Now cached
+    assert manager.update_category_name(category.id, "改名后")
+    assert manager.find_note_by_id(note.id).category_name == "改名后"
+    assert {s.category_name for s in manager.get_note_summaries_by_category(category.id)} == {"改名后"}
@@ -0,0 +1,29 @@
+from note_manager import NoteEdit
+
+
+def _assert_monotonic(manager, note_id):
+    history = manager.get_history(note_id) # Newest first
+    assert len(history) >= 2
+    times = [info.created_at for info in reversed(history)]
+    assert times == sorted(times), times
+
+
+def _two_categories(manager):
+    return [c.id for c in manager.get_all_categories() if c.note_count][:2]
+
+
+def test_update_with_move_keeps_revision_times_monotonic(scratch):
+    _, manager = scratch
+    first, second = _two_categories(manager)
+    note = manager.add_note("标题", "正文", first)
+    assert manager.update_note(note.id, "新标题", "新正文", second)
+    _assert_monotonic(manager, note.id)
+    assert manager.find_note_by_id(note.id).category_id == second
+
+
+def test_save_notes_with_move_keeps_revision_times_monotonic(scratch):
+    _, manager = scratch
+    first, second = _two_categories(manager)
+    note = manager.add_note("标题", "正文", first)
+    assert manager.save_notes([NoteEdit(note.id, "新标题", "新正文", second)]) == 1
+    _assert_monotonic(manager, note.id)
@@ -0,0 +1,37 @@
+import json
+
+from instrumentation import load_saved_stats, save_stats, stats
+
+
+def test_nested_timed_calls_count_once(scratch):
+    _, manager = scratch
+    stats.reset()
+    manager.get_all_categories() # Delegates to get_category_summaries
+    note = manager.add_note("标题", "正文", manager.get_all_categories()[0].id)
+    manager.delete_note(note.id) # Delegates to bulk_delete_notes
+    counts = {name: h.count for name, h in stats.methods.items()}
+    assert counts['NoteManager.get_all_categories'] == 2
+    assert counts['NoteManager.delete_note'] == 1
+    assert 'NoteManager.get_category_summaries' not in counts
+    assert 'NoteManager.bulk_delete_notes' not in counts
+    stats.reset()
+
+
+def test_save_stats_merges_into_the_file(tmp_path):
+    path = str(tmp_path / 'stats.json')
+    for _ in range(2):
+        stats.record_method('NoteManager.get_note', 1.0)
+        save_stats(path)
+    assert load_saved_stats(path).methods['NoteManager.get_note'].count == 2
+    assert [p.name for p in tmp_path.iterdir()] == ['stats.json'] # No temporary file left
+
+
+def test_corrupt_stats_file_is_ignored(tmp_path):
+    path = tmp_path / 'stats.json'
+    for content in ('{"methods": {"x": {"counts"', '[1, 2]', '{"methods": {"x": {}}}'):
+        path.write_text(content, encoding='utf-8')
+        load_saved_stats(str(path)) # Does not raise
+    path.write_text('{"methods": {"NoteManager.get_note"', encoding='utf-8') # Truncated
+    stats.record_method('NoteManager.get_note', 1.0)
+    save_stats(str(path))
+    assert json.loads(path.read_text(encoding='utf-8'))['methods']['NoteManager.get_note']['counts']
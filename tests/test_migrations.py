@@ -0,0 +1,98 @@
+from functools import partial
+
+from sqlalchemy import text
+
+from diagnostics import scratch_engine
+from migrations import get_schema_version, latest_version, run_migrations
+from models import Base, Session
+from note_manager import NoteManager
+from search_index import ensure_search_index
+
+# notes as created before migration 6: nullable timestamps, no cascade
+_OLD_NOTES = """
+    CREATE TABLE notes (
+        id INTEGER NOT NULL,
+        title VARCHAR NOT NULL,
+        content TEXT,
+        created_at DATETIME,
+        updated_at DATETIME,
+        category_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(category_id) REFERENCES categories (id)
+    )
+"""
+
+
+def _version_5_database():
+    """An in-memory database at schema version 5, with notes lacking timestamps."""
+    engine = scratch_engine()
+    run_migrations(engine, Base.metadata)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE notes"))
+        conn.execute(text(_OLD_NOTES))
+        conn.execute(text("INSERT INTO categories (id, name) VALUES (1, '旧分类')"))
+        conn.execute(text("""
+            INSERT INTO notes (id, title, content, created_at, updated_at, category_id) VALUES
+                (1, '有时间', '', '2024-01-02 00:00:00.000000', '2024-01-03 00:00:00.000000', 1),
+                (2, '只有创建时间', '', '2024-01-01 00:00:00.000000', NULL, 1),
+                (3, '没有时间', '', NULL, NULL, 1),
+                (4, '也没有时间', '', NULL, NULL, 1)
+        """))
+        conn.execute(text("PRAGMA user_version = 5"))
+    return engine
+
+
+def test_migration_6_fills_timestamps_and_pages_reach_every_note():
+    engine = _version_5_database()
+    assert run_migrations(engine, Base.metadata) == latest_version()
+    manager = NoteManager(partial(Session, bind=engine), fts_enabled=ensure_search_index(engine))
+    seen, cursor = [], None
+    while True:
+        page = manager.get_note_summaries_page(1, cursor, limit=1)
+        seen.extend(s.id for s in page.items)
+        if not page.has_more:
+            break
+        cursor = page.next_cursor
+    assert seen == [1, 2, 4, 3]
+    summary = manager.get_category_summaries()[-1]
+    assert (summary.name, summary.note_count) == ('旧分类', 4)
+    assert str(summary.last_updated_at) == '2024-01-03 00:00:00'
+
+
+def test_migration_6_deletes_notes_with_their_category():
+    engine = _version_5_database()
+    run_migrations(engine, Base.metadata)
+    manager = NoteManager(partial(Session, bind=engine), fts_enabled=ensure_search_index(engine))
+    assert manager.delete_category(1)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM notes")).scalar() == 0
+        assert get_schema_version(conn) == latest_version()
+
+
+def test_migration_7_replaces_the_index_triggers():
+    engine = scratch_engine()
+    run_migrations(engine, Base.metadata)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS notes_fts"))
+        # The index as kept by triggers up to version 6
+        conn.execute(text("CREATE VIRTUAL TABLE notes_fts USING fts5("
+                          "title, content, content='notes', content_rowid='id', tokenize='trigram')"))
+        conn.execute(text("""
+            CREATE TRIGGER notes_fts_ai AFTER INSERT ON notes BEGIN
+                INSERT INTO notes_fts(rowid, title, content)
+                VALUES (new.id, new.title, note_plaintext(new.content));
+            END
+        """))
+        conn.execute(text("INSERT INTO categories (id, name) VALUES (1, '旧分类')"))
+        conn.execute(text("INSERT INTO notes (id, title, content, created_at, updated_at, category_id) "
+                          "VALUES (1, '旧笔记', '旧的正文', '2024-01-01 00:00:00.000000', "
+                          "'2024-01-01 00:00:00.000000', 1)"))
+        conn.execute(text("PRAGMA user_version = 6"))
+    run_migrations(engine, Base.metadata)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' "
+                                 "AND name LIKE 'notes_fts%'")).scalar() == 0
+    manager = NoteManager(partial(Session, bind=engine), fts_enabled=ensure_search_index(engine))
+    assert [n.id for n in manager.search_all_note_summaries("旧的正文")] == [1]
+    manager.update_note(1, '旧笔记', '新的正文')
+    assert manager.search_all_note_summaries("旧的正文") == []
@@ -0,0 +1,51 @@
+"""Regression guard against N+1 loading: each read is a fixed number of statements.
+
+The read cache is cleared before every call, so the statements counted are
+the ones a cold call issues."""
+import pytest
+
+# (label, call(manager, category_id)); each must run exactly one statement,
+# category names of the results included
+LISTINGS = [
+    ("get_all_notes", lambda m, c: m.get_all_notes()),
+    ("get_notes_by_category", lambda m, c: m.get_notes_by_category(c)),
+    ("get_all_note_summaries", lambda m, c: m.get_all_note_summaries()),
+    ("get_note_summaries_by_category", lambda m, c: m.get_note_summaries_by_category(c)),
+    ("get_notes_page", lambda m, c: m.get_notes_page().items),
+    ("get_note_summaries_page", lambda m, c: m.get_note_summaries_page(c).items),
+    ("search_notes (index)", lambda m, c: m.search_notes("项目计划", c)),
+    ("search_notes (LIKE)", lambda m, c: m.search_notes("ab", c)),
+    ("search_all_notes (index)", lambda m, c: m.search_all_notes("项目计划")),
+    ("search_all_notes (LIKE)", lambda m, c: m.search_all_notes("ab")),
+    ("search_note_summaries", lambda m, c: m.search_note_summaries("项目计划", c)),
+    ("search_all_note_summaries", lambda m, c: m.search_all_note_summaries("项目计划")),
+    ("search_notes_page", lambda m, c: m.search_notes_page("项目计划").items),
+    ("search_note_summaries_page (LIKE)", lambda m, c: m.search_note_summaries_page("ab", c).items),
+]
+
+
+@pytest.mark.parametrize("call", [call for _, call in LISTINGS], ids=[label for label, _ in LISTINGS])
+def test_listing_is_one_statement(scratch, query_counter, call):
+    _, manager = scratch
+    category_id = next(c.id for c in manager.get_all_categories() if c.note_count)
+    manager.clear_cache()
+    with query_counter() as counter:
+        names = [note.category_name for note in call(manager, category_id)]
+    assert names
+    assert counter[0] == 1
+
+
+def test_category_summaries_are_one_statement(scratch, query_counter):
+    _, manager = scratch
+    with query_counter() as counter:
+        summaries = manager.get_category_summaries()
+    assert sum(c.note_count for c in summaries) == 15
+    assert counter[0] == 1
+
+
+def test_cached_listing_runs_no_statement(scratch, query_counter):
+    _, manager = scratch
+    manager.get_all_note_summaries()
+    with query_counter() as counter:
+        manager.get_all_note_summaries()
+    assert counter[0] == 0
@@ -0,0 +1,55 @@
+import sqlite3
+
+from sqlalchemy import create_engine, text
+
+from compression import install_sql_functions
+from migrations import run_migrations
+from models import Base
+from note_manager import NoteEdit
+from search_index import ensure_search_index
+
+# Over compression.DEFAULT_MIN_BYTES, so stored compressed
+_LONG_BODY = "长正文 needle " * 400
+
+
+def _search_matches_text(manager, keywords):
+    notes = manager.get_all_notes()
+    for keyword in keywords:
+        expected = {n.id for n in notes if keyword in n.title or keyword in n.content}
+        assert {s.id for s in manager.search_all_note_summaries(keyword)} == expected, keyword
+
+
+def test_every_write_keeps_the_index_in_step(scratch):
+    _, manager = scratch
+    keywords = ["项目计划", "content", "新标题", "needle", "导入笔记", "改过的"]
+    category_ids = [c.id for c in manager.get_all_categories() if c.note_count]
+    note = manager.add_note("新标题", _LONG_BODY, category_ids[0])
+    manager.bulk_import([{'title': f"导入笔记 {i}", 'content': _LONG_BODY if i % 2 else "短正文",
+                          'category': "导入"} for i in range(7)], batch_size=3)
+    _search_matches_text(manager, keywords)
+    manager.update_note(note.id, "改过的标题", "改过的正文")
+    victim = manager.get_notes_by_category(category_ids[1])[0]
+    manager.save_notes([NoteEdit(victim.id, "改过的", victim.content),
+                        NoteEdit(victim.id, "改过的 again", _LONG_BODY)])
+    _search_matches_text(manager, keywords)
+    manager.restore_revision(note.id, 1)
+    manager.bulk_delete_notes([victim.id] + [s.id for s in manager.search_all_note_summaries("导入笔记")][:3])
+    manager.delete_category(category_ids[2])
+    _search_matches_text(manager, keywords)
+
+
+def test_other_sqlite_clients_can_write_notes(tmp_path):
+    path = tmp_path / 'notes.db'
+    engine = create_engine(f'sqlite:///{path}')
+    install_sql_functions(engine)
+    run_migrations(engine, Base.metadata)
+    assert ensure_search_index(engine)
+    engine.dispose()
+    # No note_plaintext() here: nothing may depend on it
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO categories (id, name, note_count) VALUES (1, '外部', 0)")
+        conn.execute("INSERT INTO notes (id, title, content, created_at, updated_at, category_id) "
+                     "VALUES (1, '外部写入', '', '2024-01-01 00:00:00.000000', '2024-01-01 00:00:00.000000', 1)")
+        conn.execute("UPDATE notes SET title = '外部修改' WHERE id = 1")
+        conn.execute("DELETE FROM notes WHERE id = 1")
+    conn.close()
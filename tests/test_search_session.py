@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from models import NoteSummary
+from search_session import SearchSession
+
+
+def _summary(note_id, day, category_id=1):
+    return NoteSummary(note_id, f"笔记{note_id}", datetime(2024, 1, day), category_id, "分类")
+
+
+def _texts(summaries, text):
+    return {s.id: (s.title, text) for s in summaries}
+
+
+def _trigram_ranked(keyword):
+    return len(keyword) >= 3 # As with the FTS index enabled
+
+
+def test_refined_results_are_newest_first_whatever_the_parent_order():
+    session = SearchSession(ranked=lambda keyword: False) # FTS disabled: everything by recency
+    parent = [_summary(1, 1), _summary(2, 3), _summary(3, 2)] # Not newest first
+    session.remember("ab", None, parent, _texts(parent, "abcd"))
+    assert [s.id for s in session.lookup("abcd")] == [2, 3, 1]
+
+
+def test_ranked_keyword_needs_index_totals_to_be_refined():
+    session = SearchSession(ranked=_trigram_ranked)
+    parent = [_summary(1, 1), _summary(2, 3)]
+    session.remember("abc", None, parent, _texts(parent, "abcd"))
+    assert session.lookup("abcd") is None # Cannot be ranked without them
+
+
+def test_ranked_refinement_matches_the_database(scratch):
+    _, manager = scratch
+    category_id = manager.get_all_categories()[0].id
+    for i, body in enumerate(["数据库 " * 3, "数据库索引", "索引 " * 40 + "数据库", "数据", "数据库数据库"]):
+        manager.add_note(f"笔记 {i}", body, category_id)
+    manager.add_note("数据库设计", "", category_id)
+    session = SearchSession(ranked=manager.ranks_by_relevance)
+    parent = manager.search_all_note_summaries("数据") # Too short for the index: newest first
+    session.remember("数据", None, parent, manager.get_note_texts(s.id for s in parent),
+                     manager.get_search_index_totals())
+    for keyword in ["数据库", "数据库索引"]:
+        assert session.lookup(keyword) == manager.search_all_note_summaries(keyword), keyword
+    assert session.misses == 0
+
+
+def test_unsearchable_keywords_do_not_load_texts():
+    session = SearchSession()
+    assert not session.wants_texts("50%", [_summary(1, 1)])
+    assert not session.wants_texts("abc", [_summary(i, 1) for i in range(session.max_candidates + 1)])
+
+
+def test_same_ranked_keyword_narrowed_to_a_category_keeps_the_rank_order():
+    session = SearchSession(ranked=_trigram_ranked)
+    parent = [_summary(1, 1, 2), _summary(2, 3, 1), _summary(3, 2, 2)]
+    session.remember("abc", None, parent, _texts(parent, "abc"))
+    assert [s.id for s in session.lookup("abc", 2)] == [1, 3]
+
+
+def test_unranked_refinement_matches_a_fresh_search():
+    session = SearchSession(ranked=_trigram_ranked)
+    newest_first = [_summary(2, 3), _summary(3, 2), _summary(1, 1)]
+    texts = {1: ("笔记1", "项目"), 2: ("笔记2", "项目"), 3: ("笔记3", "项")}
+    session.remember("项", None, newest_first, texts)
+    assert [s.id for s in session.lookup("项目")] == [2, 1]
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import bootstrap
+from server import Server
+
+
+async def _exchange(reader, writer, requests):
+    """Sends requests pipelined in one write; returns the decoded responses."""
+    raw = b""
+    for method, path, body in requests:
+        data = json.dumps(body).encode('utf-8') if body is not None else b""
+        raw += (f"{method} {path} HTTP/1.1\r\nHost: test\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n").encode('latin-1') + data
+    writer.write(raw)
+    await writer.drain()
+    responses = []
+    for _ in requests:
+        head = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1')
+        length = int(head.lower().split("content-length:")[1].split("\r\n")[0])
+        body = await reader.readexactly(length)
+        responses.append((int(head.split(" ")[1]), json.loads(body) if body else None))
+    return responses
+
+
+async def _with_server(scenario):
+    server = Server('127.0.0.1', 0)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        await scenario(reader, writer)
+        writer.close()
+        await writer.wait_closed()
+    finally:
+        server._server.close()
+        await server._server.wait_closed()
+        server.workers.shutdown()
+
+
+def _run(scenario, tmp_path, monkeypatch):
+    monkeypatch.setenv('NOTEAPP_DB', str(tmp_path / 'notes.db'))
+    monkeypatch.setattr(bootstrap, '_database', None) # Open the database above, not the default one
+    asyncio.run(_with_server(scenario))
+
+
+async def _pipelined_writes_and_reads(reader, writer):
+    [(_, categories)] = await _exchange(reader, writer, [('GET', '/categories', None)])
+    [(status, note)] = await _exchange(reader, writer, [
+        ('POST', '/notes', {'title': "原标题", 'content': "", 'category_id': categories[0]['id']})])
+    assert status == 201
+    path = f"/notes/{note['id']}"
+    for i in range(20):
+        responses = await _exchange(reader, writer, [
+            ('GET', path, None),
+            ('PUT', path, {'title': f"标题 {i}", 'content': "正文"}),
+            ('GET', path, None),
+            ('GET', path, None),
+        ])
+        assert [status for status, _ in responses] == [200, 200, 200, 200]
+        assert [body['title'] for _, body in responses[1:]] == [f"标题 {i}"] * 3
+
+
+async def _malformed_category_ids(reader, writer):
+    [(_, categories)] = await _exchange(reader, writer, [('GET', '/categories', None)])
+    category_id = categories[0]['id']
+    [(_, note)] = await _exchange(reader, writer, [
+        ('POST', '/notes', {'title': "笔记", 'category_id': category_id})])
+    path = f"/notes/{note['id']}"
+    responses = await _exchange(reader, writer, [
+        ('POST', '/notes', {'title': "笔记", 'category_id': str(category_id)}),
+        ('POST', '/notes', {'title': "笔记", 'category_id': None}),
+        ('PUT', path, {'title': "笔记", 'content': "", 'category_id': float(category_id)}),
+        ('PUT', path, {'title': "笔记", 'content': "", 'category_id': True}),
+        ('PUT', path, {'title': "笔记", 'content': "", 'category_id': None}),
+    ])
+    assert [status for status, _ in responses] == [400, 400, 400, 400, 200]
+
+
+def test_pipelined_read_sees_the_write_before_it(tmp_path, monkeypatch):
+    _run(_pipelined_writes_and_reads, tmp_path, monkeypatch)
+
+
+def test_category_id_must_be_an_integer(tmp_path, monkeypatch):
+    _run(_malformed_category_ids, tmp_path, monkeypatch)
@@ -0,0 +1,270 @@
+"""In-memory index of note titles for the quick switcher (Ctrl+P).
+
+Every title is kept twice: lowercased without whitespace (the key), and as
+its pinyin initials, Chinese characters replaced by the first letter of
+their reading ("项目计划" -> "xmjh"; other characters stay as they are). A
+query matches a title when it is a prefix, a substring or a subsequence of
+either form, and matches are ranked in that order:
+
+  1. the key starts with the query         shortest title, then most recent
+  2. the initials start with the query     shortest title, then most recent
+  3. the query occurs in key or initials   most recent first
+  4. the query is a subsequence of either  most recent first
+
+Titles live in slots, in the order they were added; a title that is added
+again (an edit) takes a new slot, so slot order is recency order. Per slot
+there is the note id in an array, the key and the initials. Two arrays of
+slots sorted by key and by initials answer the prefix tiers with a binary
+search. For the other tiers, each character maps to the slots whose key
+or initials contain it: intersecting those of the query's characters
+leaves only the titles worth checking, and those are checked newest first
+until the result is full, or SCAN_LIMIT of them have been (an old title
+matching a long scattered query can go unlisted; typing on narrows it).
+Common characters keep their slots as a bitset, an int with bit n set for
+slot n: that is no larger than an array of them, intersects with one AND,
+and lists its slots newest first from its binary digits. Removed titles
+leave dead slots behind until they outnumber the live ones and the index
+compacts itself.
+
+Characters are read as initials through their GB2312 position (level 1,
+the 3755 common characters, is sorted by reading); rarer characters count
+as themselves.
+"""
+import bisect
+import heapq
+import re
+from array import array
+from collections import deque
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+DEFAULT_LIMIT = 50
+# Candidates checked in tiers 3 and 4 at most, newest first
+SCAN_LIMIT = 5000
+# A character in at least 1 of this many titles keeps its slots as a bitset
+DENSE_FRACTION = 32
+# Dead slots tolerated before compacting, beyond one per live slot
+COMPACT_MIN_DEAD = 1024
+
+# First GB2312 code of each initial in level 1 (no words start with i, u, v)
+_GB2312_INITIALS = (
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'), (0xB6EA, 'e'),
+    (0xB7A2, 'f'), (0xB8C1, 'g'), (0xB9FE, 'h'), (0xBBF7, 'j'), (0xBFA6, 'k'),
+    (0xC0AC, 'l'), (0xC2E8, 'm'), (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'),
+    (0xC6DA, 'q'), (0xC8BB, 'r'), (0xC8F6, 's'), (0xCBFA, 't'), (0xCDDA, 'w'),
+    (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z'),
+)
+_GB2312_CODES = [code for code, _ in _GB2312_INITIALS]
+_GB2312_LEVEL1_END = 0xD7F9
+
+_LAST_CHAR = '\U0010ffff' # Sorts after anything a prefix can continue with
+
+
+class _InitialsTable(dict):
+    """str.translate() table: code point -> initial, filled on first sight."""
+
+    def __missing__(self, code_point: int) -> str:
+        char = initial = chr(code_point)
+        if char >= '一':
+            try:
+                encoded = char.encode('gb2312')
+            except UnicodeEncodeError:
+                encoded = b''
+            if len(encoded) == 2:
+                code = encoded[0] << 8 | encoded[1]
+                if _GB2312_CODES[0] <= code <= _GB2312_LEVEL1_END:
+                    initial = _GB2312_INITIALS[bisect.bisect_right(_GB2312_CODES, code) - 1][1]
+        self[code_point] = initial
+        return initial
+
+
+_INITIALS = _InitialsTable()
+
+
+def normalize(text: str) -> str:
+    """Lowercase, whitespace removed: how titles and queries are compared."""
+    return ''.join(text.lower().split())
+
+
+def pinyin_initials(text: str) -> str:
+    """text with each common Chinese character replaced by its initial."""
+    return text.translate(_INITIALS)
+
+
+def _bitset(slots: Iterable[int], size: int) -> int:
+    digits = bytearray(b'0' * size)
+    deque(map(digits.__setitem__, slots, repeat(ord('1'))), maxlen=0) # Set them all without a Python loop
+    digits.reverse() # Slot 0 is the lowest bit
+    return int(digits or b'0', 2)
+
+
+def _set_bits(bits: int) -> Iterator[int]:
+    """Positions of the set bits, highest first."""
+    digits = bin(bits)
+    highest = len(digits) - 1
+    position = digits.find('1', 2)
+    while position >= 0:
+        yield highest - position
+        position = digits.find('1', position + 1)
+
+
+class TitleMatch(NamedTuple):
+    note_id: int
+    title: str
+
+
+class TitleIndex:
+    """Note titles, searchable by prefix, substring and subsequence (see above)."""
+
+    def __init__(self, titles: Iterable[Tuple[int, str]] = ()):
+        """titles: (note id, title) pairs, least recently updated first."""
+        self._load(titles)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, note_id: int) -> bool:
+        return note_id in self._slots
+
+    def title(self, note_id: int) -> Optional[str]:
+        slot = self._slots.get(note_id)
+        return self._titles[slot] if slot is not None else None
+
+    def _append(self, note_id: int, title: str) -> int:
+        slot = len(self._ids)
+        key = normalize(title)
+        initials = pinyin_initials(key)
+        self._ids.append(note_id)
+        self._titles.append(title)
+        self._keys.append(key)
+        self._initials.append(initials)
+        self._slots[note_id] = slot
+        postings = self._postings
+        for char in {*key, *initials}:
+            slots = postings.get(char)
+            if slots is None:
+                postings[char] = array('i', (slot,))
+            elif isinstance(slots, int):
+                postings[char] = slots | 1 << slot
+            else:
+                slots.append(slot)
+        return slot
+
+    def _load(self, titles: Iterable[Tuple[int, str]]):
+        self._ids = array('q') # Slot -> note id, 0 once removed
+        self._titles: List[str] = []
+        self._keys: List[str] = []
+        self._initials: List[str] = []
+        self._slots: Dict[int, int] = {} # Note id -> live slot
+        # Character -> its slots: ascending array, or bitset once common
+        self._postings: Dict[str, Union[array, int]] = {}
+        for note_id, title in titles:
+            old = self._slots.get(note_id)
+            if old is not None:
+                self._ids[old] = 0
+            self._append(note_id, title)
+        size = len(self._ids)
+        for char, slots in self._postings.items():
+            if len(slots) * DENSE_FRACTION >= size:
+                self._postings[char] = _bitset(slots, size)
+        live = sorted(self._slots.values())
+        # Live slots sorted by key and by initials
+        self._by_key = array('i', sorted(live, key=self._keys.__getitem__))
+        self._by_initials = array('i', sorted(live, key=self._initials.__getitem__))
+
+    def add(self, note_id: int, title: str):
+        """Adds a note's title as the most recent one, replacing its old title."""
+        self.remove(note_id)
+        slot = self._append(note_id, title)
+        bisect.insort(self._by_key, slot, key=self._keys.__getitem__)
+        bisect.insort(self._by_initials, slot, key=self._initials.__getitem__)
+
+    def remove(self, note_id: int) -> bool:
+        slot = self._slots.pop(note_id, None)
+        if slot is None:
+            return False
+        for order, strings in ((self._by_key, self._keys), (self._by_initials, self._initials)):
+            position = bisect.bisect_left(order, strings[slot], key=strings.__getitem__)
+            while order[position] != slot:
+                position += 1
+            del order[position]
+        self._ids[slot] = 0
+        self._titles[slot] = self._keys[slot] = self._initials[slot] = ''
+        dead = len(self._ids) - len(self._slots)
+        if dead > len(self._slots) + COMPACT_MIN_DEAD:
+            self._compact()
+        return True
+
+    def _compact(self):
+        self._load([(self._ids[slot], self._titles[slot]) for slot in sorted(self._slots.values())])
+
+    def _prefix_matches(self, order: array, strings: List[str], query: str, limit: int) -> List[int]:
+        start = bisect.bisect_left(order, query, key=strings.__getitem__)
+        end = bisect.bisect_left(order, query + _LAST_CHAR, start, key=strings.__getitem__)
+        keys = self._keys
+        return heapq.nsmallest(limit, order[start:end], key=lambda slot: (len(keys[slot]), -slot))
+
+    def _candidates(self, query: str) -> Iterable[int]:
+        """Slots whose key or initials contain every character of query, newest first."""
+        bits = None
+        arrays = []
+        for char in set(query):
+            slots = self._postings.get(char)
+            if slots is None:
+                return ()
+            if isinstance(slots, int):
+                bits = slots if bits is None else bits & slots
+            else:
+                arrays.append(slots)
+        if not arrays:
+            return _set_bits(bits)
+        arrays.sort(key=len)
+        common = set(arrays[0])
+        for slots in arrays[1:]:
+            common.intersection_update(slots)
+        candidates = sorted(common, reverse=True)
+        if bits is not None:
+            digits = bin(bits) # Slot n is digits[-1 - n]
+            candidates = [slot for slot in candidates if slot < len(digits) - 2 and digits[-1 - slot] == '1']
+        return candidates
+
+    def _scan_matches(self, query: str, limit: int, seen: set) -> List[int]:
+        """Tiers 3 and 4, each newest first."""
+        ids, keys, initials = self._ids, self._keys, self._initials
+        is_subsequence = re.compile('.*?'.join(map(re.escape, query))).search
+        substrings, subsequences = [], []
+        for checked, slot in enumerate(self._candidates(query)):
+            if checked >= SCAN_LIMIT or len(substrings) >= limit:
+                break
+            if not ids[slot] or slot in seen:
+                continue
+            key, key_initials = keys[slot], initials[slot]
+            if query in key or query in key_initials:
+                substrings.append(slot)
+            elif len(subsequences) < limit and (is_subsequence(key) or is_subsequence(key_initials)):
+                subsequences.append(slot)
+        return (substrings + subsequences)[:limit]
+
+    def recent(self, limit: int = DEFAULT_LIMIT) -> List[TitleMatch]:
+        """The most recently added titles, newest first: what an empty query lists."""
+        matches = []
+        for slot in range(len(self._ids) - 1, -1, -1):
+            if len(matches) >= limit:
+                break
+            if self._ids[slot]:
+                matches.append(TitleMatch(self._ids[slot], self._titles[slot]))
+        return matches
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[TitleMatch]:
+        """The best matches for query, best first; nothing for a blank query."""
+        query = normalize(query)
+        if not query or limit < 1:
+            return []
+        slots = self._prefix_matches(self._by_key, self._keys, query, limit)
+        if len(slots) < limit:
+            seen = set(slots)
+            slots += [slot for slot in self._prefix_matches(self._by_initials, self._initials, query, limit)
+                      if slot not in seen][:limit - len(slots)]
+        if len(slots) < limit:
+            slots += self._scan_matches(query, limit - len(slots), set(slots))
+        return [TitleMatch(self._ids[slot], self._titles[slot]) for slot in slots]
@@ -1,10 +1,15 @@
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
-from models import Note
+from typing import Optional
+
+# Notes and categories arrive as serializers.py dicts, like the --json output
 
 console = Console()
 
+def _format_time(value: Optional[str]) -> str:
+    return value[:19].replace("T", " ") if value else ""
+
 def display_menu():
     """显示主菜单"""
     menu = """
@@ -20,20 +25,40 @@ def display_menu():
     """
     console.print(Panel(menu, title="菜单", border_style="blue"))
 
-def display_notes(notes: list[Note]):
-    """显示笔记列表"""
-    table = Table(title="笔记列表", show_header=True, header_style="bold magenta")
+def display_notes(notes: "list[dict]", title: str = "笔记列表"):
+    """显示笔记列表（不含正文）"""
+    table = Table(title=title, show_header=True, header_style="bold magenta")
+    table.add_column("ID", style="dim", justify="right")
     table.add_column("标题", style="cyan")
-    table.add_column("内容", style="green")
-    table.add_column("创建时间", style="yellow")
+    table.add_column("分类", style="green")
     table.add_column("更新时间", style="yellow")
 
     for note in notes:
         table.add_row(
-            note.title,
-            note.content,
-            note.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            note.updated_at.strftime("%Y-%m-%d %H:%M:%S")
+            str(note["id"]),
+            note["title"],
+            note.get("category_name", ""),
+            _format_time(note["updated_at"])
         )
 
-    console.print(table) 
\ No newline at end of file
+    console.print(table)
+
+def display_note(note: dict):
+    """显示一条笔记（含正文）"""
+    info = (f"ID {note['id']} · 分类 {note['category_id']} · "
+            f"创建于 {_format_time(note['created_at'])} · 更新于 {_format_time(note['updated_at'])}")
+    console.print(Panel(note["content"] or "", title=note["title"], subtitle=info, border_style="cyan"))
+
+def display_categories(categories: "list[dict]"):
+    """显示分类列表"""
+    table = Table(title="分类列表", show_header=True, header_style="bold magenta")
+    table.add_column("ID", style="dim", justify="right")
+    table.add_column("名称", style="cyan")
+    table.add_column("笔记数", justify="right")
+    table.add_column("最近修改", style="yellow")
+
+    for category in categories:
+        table.add_row(str(category["id"]), category["name"],
+                      str(category["note_count"]), _format_time(category["last_updated_at"]))
+
+    console.print(table)